@@ -1,18 +1,37 @@
+import atexit
+import gzip
 import hashlib
+import itertools
+import json
+import logging
+import math
+import multiprocessing
 import os
+import queue
+import random
+import re
 import shutil
 import sqlite3
 import sys
+import threading
+import time
+import unicodedata
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
+from tkinter import filedialog, messagebox, simpledialog, ttk
 
 import xlwt
 
 # MODELOS Y LOGICA DE DATOS PARA GESTION DE HORARIOS ESCOLARES
 
+logger = logging.getLogger('SistemaEscolar')
+
 
 # Inicialización de la base de datos
 # Detectar si estamos ejecutando desde PyInstaller o desde script Python
@@ -30,25 +49,430 @@ def get_base_path():
 DB_DIR = get_base_path()
 DB_NAME = os.path.join(DB_DIR, 'institucion.db')
 
+# Perfiles de journal/synchronous. 'wal' permite que varias copias de la aplicación
+# lean mientras otra escribe; 'compatible' conserva el journal clásico para bases
+# alojadas en carpetas de red, donde WAL no es seguro.
+PERFILES_DB = {
+	'wal': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+	'compatible': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+}
+
+# Sistemas de archivos de red en /proc/mounts (Linux)
+_FS_DE_RED = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'afs', 'ncpfs', 'fuse.sshfs', '9p')
+
+
+def es_carpeta_de_red(ruta: str) -> bool:
+	"""Indica si `ruta` está en una carpeta compartida (UNC, unidad de red o montaje remoto)."""
+	ruta = os.path.abspath(ruta)
+	if ruta.startswith('\\\\') or ruta.startswith('//'):
+		return True
+	if os.name == 'nt':
+		try:
+			import ctypes
+			unidad = os.path.splitdrive(ruta)[0]
+			# 4 = DRIVE_REMOTE
+			return bool(unidad) and ctypes.windll.kernel32.GetDriveTypeW(unidad + '\\') == 4
+		except Exception:
+			return False
+	try:
+		with open('/proc/mounts', encoding='utf-8') as f:
+			montajes = [linea.split()[1:3] for linea in f if len(linea.split()) >= 3]
+	except OSError:
+		return False
+	# El punto de montaje más largo que contiene la ruta
+	tipo = ''
+	largo = -1
+	for punto, fs in montajes:
+		punto = punto.replace('\\040', ' ')
+		if (ruta == punto or ruta.startswith(punto.rstrip('/') + '/')) and len(punto) > largo:
+			tipo, largo = fs, len(punto)
+	return tipo in _FS_DE_RED or tipo.startswith('smb')
+
+
+def elegir_perfil_db(ruta: str) -> str:
+	"""Perfil pedido en SISTEMA_ESCOLAR_PERFIL_DB; si no se indica, 'compatible' en carpetas de red y 'wal' en discos locales."""
+	perfil = os.environ.get('SISTEMA_ESCOLAR_PERFIL_DB', '').strip().lower()
+	if perfil in PERFILES_DB:
+		return perfil
+	if es_carpeta_de_red(os.path.dirname(ruta)):
+		logger.info('Base en carpeta de red (%s): se usa el perfil compatible', ruta)
+		return 'compatible'
+	return 'wal'
+
+PERFIL_DB = elegir_perfil_db(DB_NAME)
+
+# Segundos sin escrituras tras los cuales se ejecuta un checkpoint del WAL
+CHECKPOINT_INACTIVIDAD_SEG = 30
+CHECKPOINT_INTERVALO_MS = 10000
+# Espera tras la última tecla antes de aplicar los filtros de búsqueda
+FILTRO_DEMORA_MS = 120
+
+# Sentencias que modifican datos y se anotan en el registro de cambios. Además se anota
+# cualquier sentencia que cambie filas (total_changes), como `WITH ... INSERT/UPDATE`.
+_SENTENCIA_ESCRITURA = re.compile(r'^\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+# Verbo y tabla de una sentencia de escritura (también detrás de una CTE)
+_TABLA_ESCRITA = re.compile(r'\b(INSERT|UPDATE|DELETE|REPLACE)(?:\s+OR\s+\w+)?(?:\s+INTO|\s+FROM)?\s+["`\[]?(\w+)',
+							re.IGNORECASE)
+
+
+def _tabla_escrita(sql: str) -> tuple:
+	"""(VERBO, tabla) de una sentencia de escritura; ('?', '?') si no se reconoce."""
+	m = _TABLA_ESCRITA.search(sql)
+	if not m:
+		return ('?', '?')
+	verbo = m.group(1).upper()
+	return ('INSERT' if verbo == 'REPLACE' else verbo, m.group(2).lower())
+
+
+class ConexionSQLite(sqlite3.Connection):
+	"""Conexión con un número de serie único en el proceso (las id() se reutilizan).
+
+	Mientras `registro` sea una lista, cada sentencia de escritura ejecutada con éxito
+	se agrega como `[sql, parámetros]` (o `[sql, [parámetros...], True]` para
+	executemany). Es de escritura si empieza con INSERT/UPDATE/DELETE/REPLACE o si
+	modificó filas (por ejemplo, las que empiezan con una CTE `WITH`).
+	`escrituras` cuenta las sentencias de escritura por (verbo, tabla) desde el
+	último BEGIN de `transaccion()`.
+	"""
+	_series = itertools.count(1)
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.serie = next(self._series)
+		self.registro = None
+		self.escrituras: Dict[tuple, int] = {}
+
+	def _anotar(self, sql, parametros, cambios_previos, varios=False):
+		if self.total_changes == cambios_previos and not _SENTENCIA_ESCRITURA.match(sql):
+			return
+		clave = _tabla_escrita(sql)
+		self.escrituras[clave] = self.escrituras.get(clave, 0) + (len(parametros) if varios else 1)
+		if self.registro is not None:
+			self.registro.append([sql, parametros, True] if varios else [sql, parametros])
+
+	def cursor(self, factory=None):
+		return super().cursor(factory or CursorSQLite)
+
+	def execute(self, sql, parametros=()):
+		cambios_previos = self.total_changes
+		cursor = super().execute(sql, parametros)
+		self._anotar(sql, parametros, cambios_previos)
+		return cursor
+
+	def executemany(self, sql, parametros):
+		parametros = list(parametros)
+		cambios_previos = self.total_changes
+		cursor = super().executemany(sql, parametros)
+		self._anotar(sql, parametros, cambios_previos, varios=True)
+		return cursor
+
+
+class CursorSQLite(sqlite3.Cursor):
+	"""Cursor que informa sus escrituras al registro de su conexión."""
+
+	def execute(self, sql, parametros=()):
+		cambios_previos = self.connection.total_changes
+		resultado = super().execute(sql, parametros)
+		self.connection._anotar(sql, parametros, cambios_previos)
+		return resultado
+
+	def executemany(self, sql, parametros):
+		parametros = list(parametros)
+		cambios_previos = self.connection.total_changes
+		resultado = super().executemany(sql, parametros)
+		self.connection._anotar(sql, parametros, cambios_previos, varios=True)
+		return resultado
+
+
+class GestorConexiones:
+	"""Mantiene conexiones SQLite persistentes por hilo.
+
+	Cada hilo abre una conexión de escritura y otra de sólo lectura una sola vez
+	(con los PRAGMA ya aplicados) y las reutiliza en todas las operaciones. Las
+	escrituras se agrupan con `transaccion()`, que admite anidamiento: sólo el
+	ámbito más externo confirma o revierte los cambios. Con el perfil WAL las
+	lecturas no esperan a que termine una escritura en curso.
+	"""
+
+	def __init__(self, ruta: str, timeout: float = 15, perfil: str = 'wal'):
+		self.ruta = ruta
+		self.timeout = timeout
+		self.perfil = PERFILES_DB[perfil]
+		self._local = threading.local()
+		self._lock = threading.Lock()
+		self._conexiones: List[sqlite3.Connection] = []
+		self._journal_aplicado = False
+		self._ultima_escritura = 0.0
+		self._escrituras_sin_checkpoint = False
+		# Se incrementa con cada transacción confirmada en este proceso
+		self.generacion = 0
+		# RegistroCambios donde se anotan las transacciones (lo activa init_db)
+		self.registro_cambios = None
+		# Se incrementa al reemplazar la base; cada hilo reabre entonces sus conexiones
+		self.epoca = 0
+
+	@property
+	def usa_wal(self) -> bool:
+		return self.perfil['journal_mode'] == 'WAL'
+
+	@property
+	def en_transaccion(self) -> bool:
+		"""True si el hilo actual tiene una transacción abierta."""
+		return bool(getattr(self._local, 'profundidad', 0))
+
+	def _registrar(self, conn: sqlite3.Connection) -> sqlite3.Connection:
+		with self._lock:
+			self._conexiones.append(conn)
+		return conn
+
+	def _abrir(self) -> sqlite3.Connection:
+		# isolation_level=None: las transacciones se abren explícitamente en transaccion()
+		conn = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None,
+							   check_same_thread=False, factory=ConexionSQLite)
+		# Mantener restricciones referenciales y evitar bloqueos por lecturas prolongadas
+		conn.execute('PRAGMA foreign_keys = ON')
+		conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+		if not self._journal_aplicado:
+			# journal_mode es persistente en el archivo: basta con fijarlo una vez
+			conn.execute(f"PRAGMA journal_mode = {self.perfil['journal_mode']}")
+			self._journal_aplicado = True
+		conn.execute(f"PRAGMA synchronous = {self.perfil['synchronous']}")
+		return self._registrar(conn)
+
+	def _abrir_lectura(self) -> sqlite3.Connection:
+		# La conexión de escritura crea el archivo y fija el journal antes que cualquier lector
+		self.conexion()
+		uri = 'file:' + urllib.request.pathname2url(os.path.abspath(self.ruta)) + '?mode=ro'
+		conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, isolation_level=None,
+							   check_same_thread=False, factory=ConexionSQLite)
+		conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+		conn.execute('PRAGMA query_only = ON')
+		return self._registrar(conn)
+
+	def _renovar_si_vencidas(self):
+		# Fuera de una transacción, las conexiones abiertas antes de reiniciar() se reabren
+		if getattr(self._local, 'epoca', self.epoca) != self.epoca and not getattr(self._local, 'profundidad', 0):
+			self.cerrar_hilo()
+		self._local.epoca = self.epoca
+
+	def reiniciar(self):
+		"""Descarta las conexiones tras reemplazar el contenido de la base.
+
+		Las del hilo actual se cierran ya; las de otros hilos se reabren en su
+		próximo uso (cerrarlas desde aquí podría cortar una consulta en curso).
+		"""
+		self.cerrar_hilo()
+		with self._lock:
+			self.epoca += 1
+			self.generacion += 1
+		# El archivo restaurado puede traer otro modo de journal
+		self._journal_aplicado = False
+
+	def conexion(self) -> sqlite3.Connection:
+		"""Devuelve la conexión del hilo actual, abriéndola la primera vez."""
+		self._renovar_si_vencidas()
+		conn = getattr(self._local, 'conn', None)
+		if conn is None:
+			conn = self._abrir()
+			self._local.conn = conn
+			self._local.profundidad = 0
+		return conn
+
+	def conexion_lectura(self) -> sqlite3.Connection:
+		"""Conexión de sólo lectura del hilo actual.
+
+		Dentro de una transacción abierta se devuelve la conexión de escritura,
+		para que las consultas vean los cambios aún no confirmados.
+		"""
+		if getattr(self._local, 'profundidad', 0):
+			return self._local.conn
+		self._renovar_si_vencidas()
+		conn = getattr(self._local, 'conn_lectura', None)
+		if conn is None:
+			conn = self._abrir_lectura()
+			self._local.conn_lectura = conn
+		return conn
+
+	@contextmanager
+	def transaccion(self):
+		"""Ámbito de escritura: BEGIN IMMEDIATE al entrar, COMMIT/ROLLBACK al salir."""
+		conn = self.conexion()
+		if self._local.profundidad:
+			# Transacción anidada: se integra en la del ámbito externo
+			self._local.profundidad += 1
+			try:
+				yield conn
+			finally:
+				self._local.profundidad -= 1
+			return
+		conn.execute('BEGIN IMMEDIATE')
+		self._local.profundidad = 1
+		self._local.al_finalizar = []
+		conn.escrituras = {}
+		if self.registro_cambios is not None:
+			conn.registro = []
+		try:
+			yield conn
+		except BaseException:
+			conn.registro = None
+			conn.rollback()
+			self._notificar_fin(False, self.generacion, self.generacion)
+			raise
+		else:
+			numero = self._anotar_cambios(conn)
+			try:
+				conn.commit()
+			except BaseException:
+				# COMMIT fallido (SQLITE_BUSY, IOERR...): cerrar la transacción para no dejar
+				# la conexión persistente del hilo atascada dentro de ella
+				try:
+					conn.rollback()
+				except sqlite3.Error:
+					pass
+				if numero is not None:
+					self.registro_cambios.anular(numero)
+				self._notificar_fin(False, self.generacion, self.generacion)
+				raise
+			with self._lock:
+				previa = self.generacion
+				self.generacion += 1
+			self._ultima_escritura = time.monotonic()
+			self._escrituras_sin_checkpoint = True
+			self._notificar_fin(True, previa, previa + 1)
+		finally:
+			self._local.profundidad = 0
+
+	def _anotar_cambios(self, conn) -> Optional[int]:
+		"""Pasa las escrituras de la transacción al registro antes del COMMIT.
+
+		Se hace con el bloqueo de escritura tomado, así el orden del registro es el
+		de las transacciones aun con varias instancias sobre la misma base. Un fallo
+		del registro no impide guardar: queda un hueco que la reconstrucción detecta.
+		"""
+		sentencias, conn.registro = conn.registro, None
+		if not sentencias:
+			return None
+		try:
+			return self.registro_cambios.anotar(conn, sentencias)
+		except Exception as e:
+			logger.warning('No se pudo anotar la transacción en el registro de cambios: %s', e)
+			return None
+
+	def sello_datos(self, conn: sqlite3.Connection) -> Optional[tuple]:
+		"""Marca de vigencia para cachés derivadas de la base.
+
+		Cambia con cada transacción confirmada en este proceso (`generacion`) y con
+		los cambios hechos por otras conexiones (`PRAGMA data_version`). Devuelve None
+		dentro de una transacción abierta, donde no conviene reutilizar cachés.
+		"""
+		if self.en_transaccion:
+			return None
+		version = conn.execute('PRAGMA data_version').fetchone()[0]
+		return (self.generacion, conn.serie, version)
+
+	def escrituras_de_transaccion(self) -> Dict[tuple, int]:
+		"""Sentencias de escritura de la transacción del hilo por (verbo, tabla).
+
+		Sigue disponible en los callbacks de `al_finalizar`."""
+		return self.conexion().escrituras
+
+	def al_finalizar(self, callback):
+		"""Registra `callback(confirmada, generacion_previa, generacion_nueva)` para
+		cuando termine la transacción en curso del hilo."""
+		if not getattr(self._local, 'profundidad', 0):
+			raise Exception('No hay una transacción en curso.')
+		if callback not in self._local.al_finalizar:
+			self._local.al_finalizar.append(callback)
+
+	def _notificar_fin(self, confirmada: bool, previa: int, nueva: int):
+		callbacks, self._local.al_finalizar = self._local.al_finalizar, []
+		for callback in callbacks:
+			callback(confirmada, previa, nueva)
+
+	def checkpoint(self, modo: str = 'PASSIVE') -> bool:
+		"""Traslada el contenido del WAL a la base. Devuelve True si se completó."""
+		if not self.usa_wal:
+			return True
+		try:
+			ocupado, _, _ = self.conexion().execute(f'PRAGMA wal_checkpoint({modo})').fetchone()
+		except sqlite3.Error:
+			return False
+		if not ocupado:
+			self._escrituras_sin_checkpoint = False
+		return not ocupado
+
+	def checkpoint_si_inactivo(self, segundos: float = CHECKPOINT_INACTIVIDAD_SEG) -> bool:
+		"""Checkpoint pasivo sólo si hubo escrituras y luego `segundos` de inactividad."""
+		if not self._escrituras_sin_checkpoint:
+			return False
+		if time.monotonic() - self._ultima_escritura < segundos:
+			return False
+		return self.checkpoint('PASSIVE')
+
+	def cerrar_hilo(self):
+		"""Cierra las conexiones del hilo actual (para hilos de trabajo que terminan)."""
+		for atributo in ('conn_lectura', 'conn'):
+			conn = getattr(self._local, atributo, None)
+			if conn is None:
+				continue
+			setattr(self._local, atributo, None)
+			with self._lock:
+				if conn in self._conexiones:
+					self._conexiones.remove(conn)
+			try:
+				conn.close()
+			except sqlite3.Error:
+				pass
+
+	def cerrar_todas(self):
+		"""Cierra todas las conexiones abiertas (al salir de la aplicación)."""
+		conn = getattr(self._local, 'conn', None)
+		if conn is not None:
+			try:
+				# Actualiza estadísticas del planificador sólo si hacen falta
+				conn.execute('PRAGMA optimize')
+			except sqlite3.Error:
+				pass
+			# Dejar el WAL vacío para que la base quede autocontenida al salir
+			self.checkpoint('TRUNCATE')
+		with self._lock:
+			conexiones, self._conexiones = self._conexiones, []
+		# En orden inverso: la primera conexión de escritura se cierra al final y
+		# puede eliminar los archivos -wal/-shm (un lector de sólo lectura no puede)
+		for conn in reversed(conexiones):
+			try:
+				conn.close()
+			except sqlite3.Error:
+				pass
+		self._local = threading.local()
+
+
+_gestor_conexiones = GestorConexiones(DB_NAME, perfil=PERFIL_DB)
+atexit.register(_gestor_conexiones.cerrar_todas)
+
+
 def get_connection():
-	conn = sqlite3.connect(DB_NAME, timeout=15)
-	# Mantener restricciones referenciales y evitar bloqueos por lecturas prolongadas
-	conn.execute('PRAGMA foreign_keys = ON')
-	conn.execute('PRAGMA busy_timeout = 15000')
-	return conn
+	"""Conexión persistente del hilo actual. No debe cerrarse manualmente."""
+	return _gestor_conexiones.conexion()
+
+
+def get_connection_lectura():
+	"""Conexión de sólo lectura del hilo actual, para las consultas obtener_*."""
+	return _gestor_conexiones.conexion_lectura()
+
+
+def transaccion():
+	"""Atajo a `GestorConexiones.transaccion` sobre el gestor global."""
+	return _gestor_conexiones.transaccion()
 
 # Decorador para centralizar manejo de conexión y commit
 def db_operation(func):
 	def wrapper(*args, **kwargs):
-		conn = get_connection()
 		try:
-			result = func(conn, *args, **kwargs)
-			conn.commit()
-			return result
+			with transaccion() as conn:
+				return func(conn, *args, **kwargs)
 		except sqlite3.IntegrityError as e:
 			raise Exception(str(e))
-		finally:
-			conn.close()
 	return wrapper
 
 # Funciones genéricas para CRUD simples
@@ -58,10 +482,10 @@ def crear_entidad(conn, tabla, campos, valores):
 	campos_str = ','.join(campos)
 	conn.execute(f'INSERT INTO {tabla} ({campos_str}) VALUES ({placeholders})', valores)
 
-@db_operation
-def obtener_entidades(conn, tabla, campos):
-	c = conn.cursor()
-	c.execute(f'SELECT {','.join(campos)} FROM {tabla}')
+def obtener_entidades(tabla, campos):
+	campos_str = ','.join(campos)
+	c = get_connection_lectura().cursor()
+	c.execute(f'SELECT {campos_str} FROM {tabla}')
 	return [dict(zip(campos, row)) for row in c.fetchall()]
 
 @db_operation
@@ -89,43 +513,37 @@ _HOJA_CARACTERES_INVALIDOS = set('[]:*?/\\')
 def _obtener_dias_para_export() -> List[str]:
 	"""Obtiene los días en orden para construir las planillas, admitiendo días nuevos."""
 	dias_base = HORARIO_DIAS_BASE.copy()
-	conn = get_connection()
-	try:
-		if not _table_exists(conn, 'horario'):
-			return dias_base
-		c = conn.cursor()
-		c.execute("SELECT DISTINCT dia FROM horario WHERE dia IS NOT NULL AND dia <> ''")
-		extras = []
-		for row in c.fetchall():
-			dia = row[0]
-			if not dia:
-				continue
-			if dia not in dias_base and dia not in extras:
-				extras.append(dia)
-		extras.sort(key=lambda x: x.lower())
-		return dias_base + extras
-	finally:
-		conn.close()
+	conn = get_connection_lectura()
+	if not _table_exists(conn, 'horario'):
+		return dias_base
+	c = conn.cursor()
+	c.execute("SELECT DISTINCT dia FROM horario WHERE dia IS NOT NULL AND dia <> ''")
+	extras = []
+	for row in c.fetchall():
+		dia = row[0]
+		if not dia:
+			continue
+		if dia not in dias_base and dia not in extras:
+			extras.append(dia)
+	extras.sort(key=lambda x: x.lower())
+	return dias_base + extras
 
 
 def _obtener_max_espacios_para_export() -> int:
 	"""Calcula la cantidad máxima de espacios a exportar considerando la base."""
 	max_espacio = ESPACIOS_POR_DEFECTO
-	conn = get_connection()
-	try:
-		c = conn.cursor()
-		if _table_exists(conn, 'horario'):
-			c.execute('SELECT MAX(espacio) FROM horario')
-			row = c.fetchone()
-			if row and row[0]:
-				max_espacio = max(max_espacio, int(row[0]))
-		if _table_exists(conn, 'turno_espacio_hora'):
-			c.execute('SELECT MAX(espacio) FROM turno_espacio_hora')
-			row = c.fetchone()
-			if row and row[0]:
-				max_espacio = max(max_espacio, int(row[0]))
-	finally:
-			conn.close()
+	conn = get_connection_lectura()
+	c = conn.cursor()
+	if _table_exists(conn, 'horario'):
+		c.execute('SELECT MAX(espacio) FROM horario')
+		row = c.fetchone()
+		if row and row[0]:
+			max_espacio = max(max_espacio, int(row[0]))
+	if _table_exists(conn, 'turno_espacio_hora'):
+		c.execute('SELECT MAX(espacio) FROM turno_espacio_hora')
+		row = c.fetchone()
+		if row and row[0]:
+			max_espacio = max(max_espacio, int(row[0]))
 	return max_espacio
 
 
@@ -268,24 +686,65 @@ def _escribir_matriz_en_hoja(hoja: xlwt.Worksheet, dias: List[str], espacios: in
 			hoja.write(row, col, valor, estilos['cell'])
 
 
-def exportar_planillas_horario(hojas: List[Dict[str, Any]], ruta_archivo: str) -> str:
+def _cargar_horarios_hojas(hojas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+	"""Completa 'horarios' de las hojas que sólo indican división o profesor/turno,
+	con una consulta por tipo de hoja en lugar de una por hoja."""
+	divisiones = [h['division_id'] for h in hojas if 'horarios' not in h and h.get('division_id') is not None]
+	combinaciones = [(h['profesor_id'], h['turno_id']) for h in hojas
+					 if 'horarios' not in h and h.get('profesor_id') is not None]
+	por_division = obtener_horarios_divisiones(divisiones) if divisiones else {}
+	por_profesor = obtener_horarios_profesores(combinaciones) if combinaciones else {}
+	completas = []
+	for hoja in hojas:
+		if 'horarios' not in hoja:
+			hoja = dict(hoja)
+			if hoja.get('division_id') is not None:
+				hoja['horarios'] = por_division.get(hoja['division_id'], [])
+			elif hoja.get('profesor_id') is not None:
+				hoja['horarios'] = por_profesor.get((hoja['profesor_id'], hoja['turno_id']), [])
+		completas.append(hoja)
+	return completas
+
+
+class ExportacionCancelada(Exception):
+	"""La exportación se canceló antes de guardar el archivo."""
+
+
+def exportar_planillas_horario(hojas: List[Dict[str, Any]], ruta_archivo: str,
+							   progreso=None, cancelado: Optional[threading.Event] = None) -> str:
 	"""Genera un archivo XLS con múltiples hojas de horarios.
 
 	Args:
-		hojas: Lista de dicts con claves 'nombre', 'horarios' y 'construir_texto'.
+		hojas: Lista de dicts con claves 'nombre', 'construir_texto' y los datos de la
+			hoja: 'horarios' ya cargados, o bien 'division_id' / 'profesor_id' + 'turno_id'
+			para que se carguen todas juntas en una sola consulta.
 		ruta_archivo: Ruta destino (se forzará extensión .xls).
+		progreso: Callback opcional `progreso(hechas, total, descripcion)` por cada hoja.
+		cancelado: Evento opcional; si se activa se lanza ExportacionCancelada sin
+			escribir el archivo.
 	"""
+	def verificar_cancelacion():
+		if cancelado is not None and cancelado.is_set():
+			raise ExportacionCancelada('Exportación cancelada.')
+
 	if not hojas:
 		raise Exception('No hay horarios para exportar.')
 	ruta_final = _normalizar_ruta_xls(ruta_archivo)
 	if not ruta_final:
 		raise Exception('Ruta de exportación inválida.')
+	total = len(hojas)
+	if progreso:
+		progreso(0, total, 'Cargando horarios')
+	hojas = _cargar_horarios_hojas(hojas)
 	dias_default = _obtener_dias_para_export()
 	espacios_default = _obtener_max_espacios_para_export()
 	estilos = _crear_estilos_xls()
 	workbook = xlwt.Workbook()
 	nombres_hojas = set()
-	for hoja in hojas:
+	for hechas, hoja in enumerate(hojas):
+		verificar_cancelacion()
+		if progreso:
+			progreso(hechas, total, hoja.get('nombre', 'Hoja'))
 		nombre = _sanear_nombre_hoja(hoja.get('nombre', 'Hoja'))
 		nombre = _asegurar_nombre_unico(nombre, nombres_hojas)
 		ws = workbook.add_sheet(nombre, cell_overwrite_ok=True)
@@ -298,6 +757,9 @@ def exportar_planillas_horario(hojas: List[Dict[str, Any]], ruta_archivo: str) -
 		matriz = _construir_matriz_horario(dias, espacios, horarios, formateador)
 		_escribir_matriz_en_hoja(ws, dias, espacios, matriz, estilos)
 
+	verificar_cancelacion()
+	if progreso:
+		progreso(total, total, 'Guardando archivo')
 	directorio = os.path.dirname(ruta_final)
 	if directorio and not os.path.exists(directorio):
 		os.makedirs(directorio, exist_ok=True)
@@ -305,81 +767,78 @@ def exportar_planillas_horario(hojas: List[Dict[str, Any]], ruta_archivo: str) -
 	return ruta_final
 
 
-def _ensure_ciclo_schema(conn):
-	"""Garantiza que la tabla ciclo soporte asociación multi-plan."""
-	c = conn.cursor()
-	info = []
-	if _table_exists(conn, 'ciclo'):
-		c.execute('PRAGMA table_info(ciclo)')
-		info = c.fetchall()
-	else:
-		c.execute('''CREATE TABLE ciclo (
-			id INTEGER PRIMARY KEY AUTOINCREMENT,
-			nombre TEXT UNIQUE NOT NULL
-		)''')
-
-	has_plan_column = any(col[1] == 'plan_id' for col in info)
-	if has_plan_column:
-		_migrar_ciclos_multi_plan(conn)
-
-	# Tabla puente plan-ciclo
-	c.execute('''CREATE TABLE IF NOT EXISTS plan_ciclo (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		plan_id INTEGER NOT NULL,
-		ciclo_id INTEGER NOT NULL,
-		FOREIGN KEY(plan_id) REFERENCES plan_estudio(id) ON DELETE CASCADE,
-		FOREIGN KEY(ciclo_id) REFERENCES ciclo(id) ON DELETE CASCADE,
-		UNIQUE(plan_id, ciclo_id)
-	)''')
-
-
-def _migrar_ciclos_multi_plan(conn):
-	"""Migra la tabla ciclo antigua (con plan_id) al nuevo esquema multi-plan."""
-	c = conn.cursor()
-	conn.execute('PRAGMA foreign_keys = OFF')
-	c.execute('ALTER TABLE ciclo RENAME TO ciclo_old')
-	c.execute('''CREATE TABLE ciclo (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		nombre TEXT UNIQUE NOT NULL
-	)''')
-	# Asegurar que la tabla puente exista antes de poblarla
-	c.execute('''CREATE TABLE IF NOT EXISTS plan_ciclo (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		plan_id INTEGER NOT NULL,
-		ciclo_id INTEGER NOT NULL,
-		FOREIGN KEY(plan_id) REFERENCES plan_estudio(id) ON DELETE CASCADE,
-		FOREIGN KEY(ciclo_id) REFERENCES ciclo(id) ON DELETE CASCADE,
-		UNIQUE(plan_id, ciclo_id)
-	)''')
-	old_rows = c.execute('SELECT id, nombre, plan_id FROM ciclo_old').fetchall()
-	nombre_to_new_id = {}
-	id_map = {}
-	for old_id, nombre, plan_id in old_rows:
-		if nombre not in nombre_to_new_id:
-			c.execute('INSERT INTO ciclo (nombre) VALUES (?)', (nombre,))
-			nombre_to_new_id[nombre] = c.lastrowid
-		new_id = nombre_to_new_id[nombre]
-		id_map[old_id] = new_id
-		if plan_id is not None:
-			c.execute('INSERT OR IGNORE INTO plan_ciclo (plan_id, ciclo_id) VALUES (?, ?)', (plan_id, new_id))
-
-	for table_name in ('division', 'ciclo_materia'):
-		if not _table_exists(conn, table_name):
-			continue
-		for old_id, new_id in id_map.items():
-			c.execute(f'UPDATE {table_name} SET ciclo_id=? WHERE ciclo_id=?', (new_id, old_id))
-		if table_name == 'ciclo_materia':
-			c.execute('''DELETE FROM ciclo_materia WHERE rowid NOT IN (
-				SELECT MIN(rowid) FROM ciclo_materia GROUP BY ciclo_id, materia_id
-			)''')
+class ColaExportaciones:
+	"""Ejecuta exportaciones XLS de a una en un hilo de trabajo.
 
-	c.execute('DROP TABLE ciclo_old')
-	conn.execute('PRAGMA foreign_keys = ON')
+	Los trabajos se encolan con `encolar()` y pueden cancelarse con `cancelar()`.
+	El avance se publica en `eventos` como tuplas para que la interfaz las lea
+	desde su bucle (con after), nunca desde el hilo de trabajo:
+	('progreso', id, hechas, total, descripcion), ('completado', id, ruta),
+	('cancelado', id) y ('error', id, mensaje).
+	"""
 
-def init_db():
-	conn = get_connection()
+	def __init__(self):
+		self.eventos = queue.Queue()
+		self._trabajos = queue.Queue()
+		self._cancelaciones: Dict[int, threading.Event] = {}
+		self._ids = itertools.count(1)
+		self._lock = threading.Lock()
+		self._hilo: Optional[threading.Thread] = None
+
+	def encolar(self, hojas: List[Dict[str, Any]], ruta_archivo: str) -> int:
+		trabajo_id = next(self._ids)
+		cancelado = threading.Event()
+		with self._lock:
+			self._cancelaciones[trabajo_id] = cancelado
+			if self._hilo is None or not self._hilo.is_alive():
+				self._hilo = threading.Thread(target=self._procesar, name='exportaciones', daemon=True)
+				self._hilo.start()
+		self._trabajos.put((trabajo_id, hojas, ruta_archivo, cancelado))
+		return trabajo_id
+
+	def cancelar(self, trabajo_id: int):
+		with self._lock:
+			cancelado = self._cancelaciones.get(trabajo_id)
+		if cancelado is not None:
+			cancelado.set()
+
+	def pendientes(self) -> int:
+		with self._lock:
+			return len(self._cancelaciones)
+
+	def _procesar(self):
+		while True:
+			trabajo_id, hojas, ruta_archivo, cancelado = self._trabajos.get()
+			try:
+				if cancelado.is_set():
+					raise ExportacionCancelada('Exportación cancelada.')
+				destino = exportar_planillas_horario(
+					hojas, ruta_archivo,
+					progreso=lambda hechas, total, desc, t=trabajo_id: self.eventos.put(('progreso', t, hechas, total, desc)),
+					cancelado=cancelado)
+				self.eventos.put(('completado', trabajo_id, destino))
+			except ExportacionCancelada:
+				self.eventos.put(('cancelado', trabajo_id))
+			except Exception as e:
+				self.eventos.put(('error', trabajo_id, str(e)))
+			finally:
+				with self._lock:
+					self._cancelaciones.pop(trabajo_id, None)
+
+
+# ==== Migraciones de esquema ====
+#
+# Cada migración es un paso numerado que se ejecuta una sola vez, dentro de una
+# transacción, y deja `PRAGMA user_version` en su número. Un inicio sin migraciones
+# pendientes lee user_version, recorre sqlite_master para recrear los índices de
+# INDICES_DB que falten (ANALYZE sólo si creó alguno) y ejecuta EXPLAIN QUERY PLAN
+# de las CONSULTAS_CRITICAS; no reescribe tablas. Los pasos deben tolerar bases
+# creadas antes del control de versiones (user_version = 0 pero con tablas
+# existentes). Para agregar cambios de esquema, sumar un paso al final de
+# MIGRACIONES; nunca modificar uno ya publicado.
+
+def _migracion_esquema_base(conn):
 	c = conn.cursor()
-	
 	# Tabla de usuarios para login
 	c.execute('''CREATE TABLE IF NOT EXISTS usuarios (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -388,16 +847,25 @@ def init_db():
 		es_admin INTEGER NOT NULL DEFAULT 0,
 		fecha_creacion TEXT DEFAULT CURRENT_TIMESTAMP
 	)''')
-	
 	# Plan de estudios
 	c.execute('''CREATE TABLE IF NOT EXISTS plan_estudio (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
 		nombre TEXT UNIQUE NOT NULL
 	)''')
-
-	# Ciclos multi-plan
-	_ensure_ciclo_schema(conn)
-
+	# Ciclos (multi-plan: la relación con los planes está en plan_ciclo)
+	c.execute('''CREATE TABLE IF NOT EXISTS ciclo (
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		nombre TEXT UNIQUE NOT NULL
+	)''')
+	# Tabla puente plan-ciclo
+	c.execute('''CREATE TABLE IF NOT EXISTS plan_ciclo (
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		plan_id INTEGER NOT NULL,
+		ciclo_id INTEGER NOT NULL,
+		FOREIGN KEY(plan_id) REFERENCES plan_estudio(id) ON DELETE CASCADE,
+		FOREIGN KEY(ciclo_id) REFERENCES ciclo(id) ON DELETE CASCADE,
+		UNIQUE(plan_id, ciclo_id)
+	)''')
 	# Obligaciones por ciclo
 	c.execute('''CREATE TABLE IF NOT EXISTS ciclo_materia (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -472,11 +940,6 @@ def init_db():
 		FOREIGN KEY(turno_id) REFERENCES turno(id),
 		UNIQUE(profesor_id, turno_id)
 	)''')
-	# Divisiones
-	c.execute('''CREATE TABLE IF NOT EXISTS division (
-		id INTEGER PRIMARY KEY AUTOINCREMENT,
-		nombre TEXT UNIQUE NOT NULL
-	)''')
 	# Horarios: un espacio por día, hora, división
 	c.execute('''CREATE TABLE IF NOT EXISTS horario (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -494,12 +957,6 @@ def init_db():
 		FOREIGN KEY(turno_id) REFERENCES turno(id),
 		UNIQUE(division_id, dia, espacio)
 	)''')
-	
-	# Agregar columna turno_id a registros existentes si no existe
-	try:
-		c.execute('ALTER TABLE horario ADD COLUMN turno_id INTEGER REFERENCES turno(id)')
-	except sqlite3.OperationalError:
-		pass  # La columna ya existe
 	# Horas por espacio/turno (valores por defecto para cada turno y espacio)
 	c.execute('''CREATE TABLE IF NOT EXISTS turno_espacio_hora (
 		id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -510,8 +967,246 @@ def init_db():
 		FOREIGN KEY(turno_id) REFERENCES turno(id),
 		UNIQUE(turno_id, espacio)
 	)''')
-	conn.commit()
-	conn.close()
+
+
+def _columnas(conn, tabla: str) -> List[str]:
+	return [col[1] for col in conn.execute(f'PRAGMA table_info({tabla})')]
+
+
+def _migracion_ciclos_multi_plan(conn):
+	"""Migra la tabla ciclo antigua (con plan_id) al esquema multi-plan."""
+	if 'plan_id' not in _columnas(conn, 'ciclo'):
+		return
+	c = conn.cursor()
+	# Sin legacy_alter_table, el RENAME reescribiría las FK de division y
+	# ciclo_materia para que apunten a ciclo_old (ver _migracion_reparar_fk_ciclo_old)
+	c.execute('PRAGMA legacy_alter_table = ON')
+	try:
+		c.execute('ALTER TABLE ciclo RENAME TO ciclo_old')
+	finally:
+		c.execute('PRAGMA legacy_alter_table = OFF')
+	c.execute('''CREATE TABLE ciclo (
+		id INTEGER PRIMARY KEY AUTOINCREMENT,
+		nombre TEXT UNIQUE NOT NULL
+	)''')
+	old_rows = c.execute('SELECT id, nombre, plan_id FROM ciclo_old').fetchall()
+	nombre_to_new_id = {}
+	id_map = {}
+	for old_id, nombre, plan_id in old_rows:
+		if nombre not in nombre_to_new_id:
+			c.execute('INSERT INTO ciclo (nombre) VALUES (?)', (nombre,))
+			nombre_to_new_id[nombre] = c.lastrowid
+		new_id = nombre_to_new_id[nombre]
+		id_map[old_id] = new_id
+		if plan_id is not None:
+			c.execute('INSERT OR IGNORE INTO plan_ciclo (plan_id, ciclo_id) VALUES (?, ?)', (plan_id, new_id))
+
+	for table_name in ('division', 'ciclo_materia'):
+		if not _table_exists(conn, table_name):
+			continue
+		for old_id, new_id in id_map.items():
+			c.execute(f'UPDATE {table_name} SET ciclo_id=? WHERE ciclo_id=?', (new_id, old_id))
+		if table_name == 'ciclo_materia':
+			c.execute('''DELETE FROM ciclo_materia WHERE rowid NOT IN (
+				SELECT MIN(rowid) FROM ciclo_materia GROUP BY ciclo_id, materia_id
+			)''')
+
+	c.execute('DROP TABLE ciclo_old')
+
+
+def _migracion_horario_turno(conn):
+	# Bases anteriores a la columna turno_id en horario
+	if 'turno_id' not in _columnas(conn, 'horario'):
+		conn.execute('ALTER TABLE horario ADD COLUMN turno_id INTEGER REFERENCES turno(id)')
+
+
+def _migracion_reparar_fk_ciclo_old(conn):
+	"""Reconstruye las tablas cuyas FK quedaron apuntando a la tabla inexistente ciclo_old.
+
+	La migración multi-plan original renombraba ciclo sin legacy_alter_table, y SQLite
+	reescribía las referencias de division y ciclo_materia; con foreign_keys activas
+	cualquier INSERT en esas tablas fallaba con "no such table: main.ciclo_old".
+	"""
+	c = conn.cursor()
+	dañadas = c.execute('''SELECT name, sql FROM sqlite_master
+			 WHERE type='table' AND name != 'ciclo_old' AND sql LIKE '%ciclo_old%' ''').fetchall()
+	for tabla, sql in dañadas:
+		temporal = f'{tabla}_reparada'
+		cuerpo = sql[sql.index('('):].replace('"ciclo_old"', 'ciclo').replace('ciclo_old', 'ciclo')
+		c.execute(f'CREATE TABLE {temporal} {cuerpo}')
+		c.execute(f'INSERT INTO {temporal} SELECT * FROM "{tabla}"')
+		c.execute(f'DROP TABLE "{tabla}"')
+		c.execute(f'ALTER TABLE {temporal} RENAME TO {tabla}')
+
+
+def _migracion_indices(conn):
+	_asegurar_indices(conn)
+
+
+def _migracion_registro_cambios(conn):
+	# Número de la última transacción del registro de cambios incluida en la base;
+	# viaja dentro de cada backup e indica desde dónde reaplicar el registro
+	conn.execute('''CREATE TABLE IF NOT EXISTS registro_cambios (
+		id INTEGER PRIMARY KEY CHECK (id = 1),
+		ultimo INTEGER NOT NULL
+	)''')
+	conn.execute('INSERT OR IGNORE INTO registro_cambios (id, ultimo) VALUES (1, 0)')
+
+
+# (número, descripción, función, requiere foreign_keys desactivadas)
+MIGRACIONES = [
+	(1, 'esquema base', _migracion_esquema_base, False),
+	(2, 'ciclos multi-plan', _migracion_ciclos_multi_plan, True),
+	(3, 'columna horario.turno_id', _migracion_horario_turno, False),
+	(4, 'reparar FK a ciclo_old', _migracion_reparar_fk_ciclo_old, True),
+	(5, 'índices de consultas frecuentes', _migracion_indices, False),
+	(6, 'contador del registro de cambios', _migracion_registro_cambios, False),
+]
+
+
+def migrar_esquema(conn) -> List[int]:
+	"""Aplica las migraciones pendientes según `PRAGMA user_version`.
+
+	Devuelve los números de las migraciones aplicadas (vacío en un inicio normal).
+	"""
+	version = conn.execute('PRAGMA user_version').fetchone()[0]
+	aplicadas = []
+	for numero, descripcion, funcion, sin_fk in MIGRACIONES:
+		if numero <= version:
+			continue
+		# foreign_keys sólo puede cambiarse fuera de una transacción
+		if sin_fk:
+			conn.execute('PRAGMA foreign_keys = OFF')
+		try:
+			with transaccion():
+				funcion(conn)
+				conn.execute(f'PRAGMA user_version = {int(numero)}')
+		finally:
+			if sin_fk:
+				conn.execute('PRAGMA foreign_keys = ON')
+		logger.info('Migración %d aplicada: %s', numero, descripcion)
+		aplicadas.append(numero)
+	return aplicadas
+
+
+def init_db():
+	conn = get_connection()
+	aplicadas = migrar_esquema(conn)
+	# En cada inicio: recrear índices faltantes y revisar los planes de las consultas críticas
+	_asegurar_indices(conn)
+	verificar_planes_consulta(conn)
+	# Las migraciones no se anotan: el backup posterior al arranque ya las incluye
+	_gestor_conexiones.registro_cambios = _registro_cambios
+	if not aplicadas:
+		return
+	# Las migraciones pueden haber cambiado los catálogos en memoria
+	_catalogo_referencia.invalidar()
+	_indice_materias.invalidar()
+	_indice_profesores.invalidar()
+
+
+# Índices de las consultas frecuentes: (nombre, tabla, columnas).
+# La búsqueda por división/día/espacio ya la cubre el UNIQUE de horario.
+INDICES_DB = [
+	# Conflictos de profesor en un mismo día/espacio (_validar_profesor_para_slot)
+	('idx_horario_profesor_slot', 'horario', 'profesor_id, dia, espacio'),
+	# Grilla y limpieza por profesor/turno (obtener_horarios_profesor)
+	('idx_horario_profesor_turno', 'horario', 'profesor_id, turno_id'),
+	# Claves foráneas: evitan recorrer horario al borrar materias o turnos
+	('idx_horario_materia', 'horario', 'materia_id'),
+	('idx_horario_turno', 'horario', 'turno_id'),
+	('idx_division_turno', 'division', 'turno_id'),
+	# Divisiones de un ciclo (eliminar_ciclo)
+	('idx_division_ciclo', 'division', 'ciclo_id'),
+	('idx_profesor_turno_turno', 'profesor_turno', 'turno_id'),
+	('idx_profesor_materia_materia', 'profesor_materia', 'materia_id'),
+]
+
+# Sentencias de los caminos frecuentes. Las funciones las ejecutan desde estas
+# constantes, así que la verificación de planes revisa exactamente el mismo SQL.
+SQL_HORARIOS_DIVISION = '''SELECT h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin, m.nombre, p.nombre FROM horario h
+				 LEFT JOIN materia m ON h.materia_id = m.id
+				 LEFT JOIN profesor p ON h.profesor_id = p.id
+				 WHERE h.division_id=?'''
+SQL_HORARIOS_PROFESOR = '''SELECT h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin, 
+				 m.nombre as materia, d.nombre as division
+				 FROM horario h
+				 LEFT JOIN materia m ON h.materia_id = m.id
+				 LEFT JOIN division d ON h.division_id = d.id
+				 WHERE h.profesor_id=? AND h.turno_id=?'''
+# Horarios que sólo tienen horas, sin materia ni profesor (o sin división ni materia)
+SQL_LIMPIAR_VACIOS_DIVISION = '''DELETE FROM horario 
+							WHERE division_id = ? 
+							AND (materia_id IS NULL OR materia_id = '') 
+							AND (profesor_id IS NULL OR profesor_id = '')
+							AND (hora_inicio IS NOT NULL OR hora_fin IS NOT NULL)'''
+SQL_LIMPIAR_VACIOS_PROFESOR = '''DELETE FROM horario 
+							WHERE profesor_id = ? 
+							AND turno_id = ?
+							AND (division_id IS NULL OR division_id = '') 
+							AND (materia_id IS NULL OR materia_id = '')
+							AND (hora_inicio IS NOT NULL OR hora_fin IS NOT NULL)'''
+# Se ejecuta por cada división del ciclo: con IN (SELECT ...) y un ciclo que tiene
+# buena parte de las divisiones, el planificador recorre toda la tabla horario
+SQL_BORRAR_HORARIOS_DIVISION = 'DELETE FROM horario WHERE division_id=?'
+# Generador y reparación de horarios
+SQL_CLASES_TURNO = '''SELECT h.id, h.division_id, h.dia, h.espacio, h.materia_id, h.profesor_id
+			   FROM horario h JOIN division d ON d.id = h.division_id
+			   WHERE d.turno_id = ? AND h.materia_id IS NOT NULL'''
+SQL_CLASES_CON_PROFESOR_TURNO = '''SELECT h.id, h.division_id, h.dia, h.espacio, h.materia_id, h.profesor_id
+							FROM horario h JOIN division d ON d.id = h.division_id
+							WHERE d.turno_id = ? AND h.profesor_id IS NOT NULL
+							ORDER BY h.division_id, h.dia, h.espacio'''
+SQL_PROFESOR_DE_MATERIA_EN_DIVISION = ('SELECT profesor_id FROM horario WHERE division_id=? AND materia_id=? '
+									   'AND profesor_id IS NOT NULL LIMIT 1')
+
+# Consultas críticas cuyo plan se verifica al iniciar: (descripción, SQL, parámetros).
+# Los conflictos de profesor y los slots de división se resuelven en memoria (IndiceOcupacion).
+CONSULTAS_CRITICAS = [
+	('grilla por división', SQL_HORARIOS_DIVISION, (0,)),
+	('grilla por profesor', SQL_HORARIOS_PROFESOR, (0, 0)),
+	('limpieza por división', SQL_LIMPIAR_VACIOS_DIVISION, (0,)),
+	('limpieza por profesor', SQL_LIMPIAR_VACIOS_PROFESOR, (0, 0)),
+	('borrado de horarios de una división', SQL_BORRAR_HORARIOS_DIVISION, (0,)),
+	('clases de un turno', SQL_CLASES_TURNO, (0,)),
+	('clases con profesor de un turno', SQL_CLASES_CON_PROFESOR_TURNO, (0,)),
+	('profesor de una materia en una división', SQL_PROFESOR_DE_MATERIA_EN_DIVISION, (0, 0)),
+]
+
+
+def _asegurar_indices(conn):
+	"""Crea los índices de INDICES_DB que falten y actualiza las estadísticas si hubo cambios."""
+	c = conn.cursor()
+	existentes = {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+	creados = False
+	for nombre, tabla, columnas in INDICES_DB:
+		if nombre in existentes or not _table_exists(conn, tabla):
+			continue
+		c.execute(f'CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columnas})')
+		creados = True
+	if creados:
+		c.execute('ANALYZE')
+
+
+def verificar_planes_consulta(conn) -> List[str]:
+	"""Revisa con EXPLAIN QUERY PLAN que las consultas críticas usen índices.
+
+	Devuelve (y registra como advertencia) las consultas que recorren una tabla completa.
+	"""
+	c = conn.cursor()
+	advertencias = []
+	for descripcion, sql, params in CONSULTAS_CRITICAS:
+		try:
+			plan = c.execute(f'EXPLAIN QUERY PLAN {sql}', params).fetchall()
+		except sqlite3.Error:
+			continue  # Esquema incompleto: se verificará en el próximo inicio
+		for fila in plan:
+			detalle = fila[-1]
+			if detalle.startswith('SCAN '):
+				advertencias.append(f'{descripcion}: {detalle}')
+	for advertencia in advertencias:
+		logger.warning('Consulta sin índice (recorrido completo) – %s', advertencia)
+	return advertencias
 
 
 # CRUD Materia simplificado
@@ -520,15 +1215,18 @@ def crear_materia(nombre: str, horas: int):
 		crear_entidad('materia', ['nombre', 'horas_semanales'], [nombre, horas])
 	except Exception:
 		raise Exception('Ya existe una materia con ese nombre.')
+	_indice_materias.marcar_cambio()
 
 def obtener_materias() -> List[Dict[str, Any]]:
 	return obtener_entidades('materia', ['id', 'nombre', 'horas_semanales'])
 
 def actualizar_materia(id_: int, nombre: str, horas: int):
 	actualizar_entidad('materia', ['nombre', 'horas_semanales'], [nombre, horas], 'id', id_)
+	_indice_materias.marcar_cambio()
 
 def eliminar_materia(id_: int):
 	eliminar_entidad('materia', 'id', id_)
+	_indice_materias.marcar_cambio()
 
 
 # CRUD Profesor simplificado
@@ -537,12 +1235,14 @@ def crear_profesor(nombre: str):
 		crear_entidad('profesor', ['nombre'], [nombre])
 	except Exception:
 		raise Exception('Ya existe un profesor con ese nombre.')
+	_indice_profesores.marcar_cambio()
 
 def obtener_profesores() -> List[Dict[str, Any]]:
 	return obtener_entidades('profesor', ['id', 'nombre'])
 
 def actualizar_profesor(id_: int, nombre: str):
 	actualizar_entidad('profesor', ['nombre'], [nombre], 'id', id_)
+	_indice_profesores.marcar_cambio()
 
 def eliminar_profesor(id_: int):
 	# Elimina también los turnos asignados
@@ -551,46 +1251,42 @@ def eliminar_profesor(id_: int):
 		conn.execute('DELETE FROM profesor_turno WHERE profesor_id=?', (id_,))
 		conn.execute('DELETE FROM profesor WHERE id=?', (id_,))
 	_eliminar_profesor(id_)
+	_indice_profesores.marcar_cambio()
 
 # CRUD Turnos de profesor
 def asignar_turno_a_profesor(profesor_id: int, turno_id: int):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO profesor_turno (profesor_id, turno_id) VALUES (?, ?)', (profesor_id, turno_id))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO profesor_turno (profesor_id, turno_id) VALUES (?, ?)', (profesor_id, turno_id))
+			_indice_profesores.marcar_cambio()
 	except sqlite3.IntegrityError:
 		raise Exception('El profesor ya tiene asignado ese turno.')
-	finally:
-		conn.close()
 
 def quitar_turno_a_profesor(profesor_id: int, turno_id: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM profesor_turno WHERE profesor_id=? AND turno_id=?', (profesor_id, turno_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM profesor_turno WHERE profesor_id=? AND turno_id=?', (profesor_id, turno_id))
+		_indice_profesores.marcar_cambio()
 
 def obtener_turnos_de_profesor(profesor_id: int):
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT t.id, t.nombre FROM profesor_turno pt JOIN turno t ON pt.turno_id = t.id WHERE pt.profesor_id=?''', (profesor_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 def obtener_profesores_por_turno(turno_id: int):
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT p.id, p.nombre FROM profesor p JOIN profesor_turno pt ON p.id = pt.profesor_id WHERE pt.turno_id=?''', (turno_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 
 def obtener_profesor_turnos() -> List[Dict[str, Any]]:
 	"""Devuelve todas las combinaciones profesor-turno disponibles."""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT p.id, p.nombre, t.id, t.nombre
 			 FROM profesor_turno pt
@@ -598,7 +1294,6 @@ def obtener_profesor_turnos() -> List[Dict[str, Any]]:
 			 JOIN turno t ON t.id = pt.turno_id
 			 ORDER BY p.nombre, t.nombre''')
 	rows = c.fetchall()
-	conn.close()
 	return [
 		{'profesor_id': r[0], 'profesor': r[1], 'turno_id': r[2], 'turno': r[3]}
 		for r in rows
@@ -607,36 +1302,28 @@ def obtener_profesor_turnos() -> List[Dict[str, Any]]:
 # CRUD Banca de horas por materia para profesor
 def asignar_banca_profesor(profesor_id: int, materia_id: int, banca_horas: int):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO profesor_materia (profesor_id, materia_id, banca_horas) VALUES (?, ?, ?)', (profesor_id, materia_id, banca_horas))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO profesor_materia (profesor_id, materia_id, banca_horas) VALUES (?, ?, ?)', (profesor_id, materia_id, banca_horas))
 	except sqlite3.IntegrityError:
 		raise Exception('El profesor ya tiene esa materia asignada.')
-	finally:
-		conn.close()
 
 def obtener_banca_profesor(profesor_id: int) -> List[Dict[str, Any]]:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT pm.id, m.nombre, pm.banca_horas FROM profesor_materia pm JOIN materia m ON pm.materia_id = m.id WHERE pm.profesor_id=?''', (profesor_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'materia': r[1], 'banca_horas': r[2]} for r in rows]
 
 def actualizar_banca_profesor(pm_id: int, banca_horas: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('UPDATE profesor_materia SET banca_horas=? WHERE id=?', (banca_horas, pm_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('UPDATE profesor_materia SET banca_horas=? WHERE id=?', (banca_horas, pm_id))
 
 def eliminar_banca_profesor(pm_id: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM profesor_materia WHERE id=?', (pm_id,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM profesor_materia WHERE id=?', (pm_id,))
 
 # CRUD División
 
@@ -644,27 +1331,25 @@ def eliminar_banca_profesor(pm_id: int):
 def crear_ciclo(nombre: str, plan_ids: List[int]) -> int:
 	if not plan_ids:
 		raise Exception('Debe seleccionar al menos un plan de estudio.')
-	conn = get_connection()
 	try:
-		c = conn.cursor()
-		c.execute('INSERT INTO ciclo (nombre) VALUES (?)', (nombre,))
-		ciclo_id = c.lastrowid
-		for plan_id in plan_ids:
-			c.execute('INSERT INTO plan_ciclo (plan_id, ciclo_id) VALUES (?, ?)', (plan_id, ciclo_id))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO ciclo (nombre) VALUES (?)', (nombre,))
+			ciclo_id = c.lastrowid
+			_catalogo_referencia.marcar_cambio()
+			for plan_id in plan_ids:
+				c.execute('INSERT INTO plan_ciclo (plan_id, ciclo_id) VALUES (?, ?)', (plan_id, ciclo_id))
 		return ciclo_id
 	except sqlite3.IntegrityError:
 		raise Exception('Ya existe un ciclo con ese nombre.')
-	finally:
-		conn.close()
 
 
 def actualizar_ciclo(id_: int, nombre: str, plan_ids: List[int]):
 	if not plan_ids:
 		raise Exception('Debe seleccionar al menos un plan de estudio.')
-	conn = get_connection()
-	try:
+	with transaccion() as conn:
 		c = conn.cursor()
+		_catalogo_referencia.marcar_cambio()
 		try:
 			c.execute('UPDATE ciclo SET nombre=? WHERE id=?', (nombre, id_))
 		except sqlite3.IntegrityError:
@@ -682,25 +1367,14 @@ def actualizar_ciclo(id_: int, nombre: str, plan_ids: List[int]):
 			c.execute('DELETE FROM plan_ciclo WHERE ciclo_id=? AND plan_id=?', (id_, plan_id))
 		for plan_id in to_add:
 			c.execute('INSERT INTO plan_ciclo (plan_id, ciclo_id) VALUES (?, ?)', (plan_id, id_))
-		conn.commit()
-	finally:
-		conn.close()
 
 
 def obtener_ciclos(plan_id: int) -> list:
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('''SELECT c.id, c.nombre FROM ciclo c
-			 JOIN plan_ciclo pc ON pc.ciclo_id = c.id
-			 WHERE pc.plan_id=?
-			 ORDER BY c.nombre''', (plan_id,))
-	rows = c.fetchall()
-	conn.close()
-	return [{'id': r[0], 'nombre': r[1]} for r in rows]
+	return _catalogo_referencia.ciclos_de_plan(plan_id)
 
 
 def obtener_ciclos_con_planes() -> List[Dict[str, Any]]:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT c.id, c.nombre, p.id, p.nombre
 			 FROM ciclo c
@@ -708,7 +1382,6 @@ def obtener_ciclos_con_planes() -> List[Dict[str, Any]]:
 			 LEFT JOIN plan_estudio p ON p.id = pc.plan_id
 			 ORDER BY c.nombre, p.nombre''')
 	rows = c.fetchall()
-	conn.close()
 	result: Dict[int, Dict[str, Any]] = {}
 	for ciclo_id, ciclo_nombre, plan_id, plan_nombre in rows:
 		if ciclo_id not in result:
@@ -719,19 +1392,18 @@ def obtener_ciclos_con_planes() -> List[Dict[str, Any]]:
 
 
 def obtener_planes_de_ciclo(ciclo_id: int) -> List[Dict[str, Any]]:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT p.id, p.nombre FROM plan_ciclo pc
 			 JOIN plan_estudio p ON p.id = pc.plan_id
 			 WHERE pc.ciclo_id=?
 			 ORDER BY p.nombre''', (ciclo_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 
 def contar_dependencias_ciclo(ciclo_id: int) -> Dict[str, int]:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	divisiones = horarios = 0
 	if _table_exists(conn, 'division'):
@@ -741,175 +1413,133 @@ def contar_dependencias_ciclo(ciclo_id: int) -> Dict[str, int]:
 		c.execute('''SELECT COUNT(*) FROM horario
 				 WHERE division_id IN (SELECT id FROM division WHERE ciclo_id=?)''', (ciclo_id,))
 		horarios = c.fetchone()[0]
-	conn.close()
 	return {'divisiones': divisiones, 'horarios': horarios}
 
 
 def eliminar_ciclo(id_: int, cascade: bool = False):
-	conn = get_connection()
-	try:
+	with transaccion() as conn:
 		c = conn.cursor()
 		deps = contar_dependencias_ciclo(id_)
+		_catalogo_referencia.marcar_cambio()
 		if (deps['divisiones'] or deps['horarios']) and not cascade:
 			raise Exception('El ciclo tiene divisiones y/o horarios asociados.')
 		if cascade and deps['divisiones']:
 			if _table_exists(conn, 'horario'):
-				c.execute('DELETE FROM horario WHERE division_id IN (SELECT id FROM division WHERE ciclo_id=?)', (id_,))
+				division_ids = [r[0] for r in c.execute('SELECT id FROM division WHERE ciclo_id=?', (id_,))]
+				c.executemany(SQL_BORRAR_HORARIOS_DIVISION, [(d,) for d in division_ids])
 			if _table_exists(conn, 'division'):
 				c.execute('DELETE FROM division WHERE ciclo_id=?', (id_,))
 		if _table_exists(conn, 'ciclo_materia'):
 			c.execute('DELETE FROM ciclo_materia WHERE ciclo_id=?', (id_,))
 		c.execute('DELETE FROM plan_ciclo WHERE ciclo_id=?', (id_,))
 		c.execute('DELETE FROM ciclo WHERE id=?', (id_,))
-		conn.commit()
-	finally:
-		conn.close()
 
 # CRUD Obligaciones por ciclo
 def agregar_materia_a_ciclo(ciclo_id: int, materia_id: int):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO ciclo_materia (ciclo_id, materia_id) VALUES (?, ?)', (ciclo_id, materia_id))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO ciclo_materia (ciclo_id, materia_id) VALUES (?, ?)', (ciclo_id, materia_id))
 	except sqlite3.IntegrityError:
 		raise Exception('La materia ya está en el ciclo.')
-	finally:
-		conn.close()
 
 def quitar_materia_de_ciclo(ciclo_id: int, materia_id: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM ciclo_materia WHERE ciclo_id=? AND materia_id=?', (ciclo_id, materia_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM ciclo_materia WHERE ciclo_id=? AND materia_id=?', (ciclo_id, materia_id))
 
 def obtener_materias_de_ciclo(ciclo_id: int) -> list:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT m.id, m.nombre FROM ciclo_materia am JOIN materia m ON am.materia_id = m.id WHERE am.ciclo_id=?''', (ciclo_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 # CRUD Plan de estudio
 def crear_plan(nombre: str):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO plan_estudio (nombre) VALUES (?)', (nombre,))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO plan_estudio (nombre) VALUES (?)', (nombre,))
+			_catalogo_referencia.marcar_cambio()
 	except sqlite3.IntegrityError:
 		raise Exception('Ya existe un plan de estudio con ese nombre.')
-	finally:
-		conn.close()
 
 def obtener_planes() -> list:
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('SELECT id, nombre FROM plan_estudio')
-	rows = c.fetchall()
-	conn.close()
-	return [{'id': r[0], 'nombre': r[1]} for r in rows]
+	return _catalogo_referencia.planes()
 
 def eliminar_plan(id_: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM plan_estudio WHERE id=?', (id_,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM plan_estudio WHERE id=?', (id_,))
+		_catalogo_referencia.marcar_cambio()
 
 def agregar_materia_a_plan(plan_id: int, materia_id: int):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO plan_materia (plan_id, materia_id) VALUES (?, ?)', (plan_id, materia_id))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO plan_materia (plan_id, materia_id) VALUES (?, ?)', (plan_id, materia_id))
 	except sqlite3.IntegrityError:
 		raise Exception('La materia ya está en el plan.')
-	finally:
-		conn.close()
 
 def quitar_materia_de_plan(plan_id: int, materia_id: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM plan_materia WHERE plan_id=? AND materia_id=?', (plan_id, materia_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM plan_materia WHERE plan_id=? AND materia_id=?', (plan_id, materia_id))
 
 def obtener_materias_de_plan(plan_id: int) -> list:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT m.id, m.nombre FROM plan_materia pm JOIN materia m ON pm.materia_id = m.id WHERE pm.plan_id=?''', (plan_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 # CRUD Turno
 def crear_turno(nombre: str):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO turno (nombre) VALUES (?)', (nombre,))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO turno (nombre) VALUES (?)', (nombre,))
+			_catalogo_referencia.marcar_cambio()
 	except sqlite3.IntegrityError:
 		raise Exception('Ya existe un turno con ese nombre.')
-	finally:
-		conn.close()
 
 def obtener_turnos() -> list:
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('SELECT id, nombre FROM turno')
-	rows = c.fetchall()
-	conn.close()
-	return [{'id': r[0], 'nombre': r[1]} for r in rows]
+	return _catalogo_referencia.turnos()
 
 def eliminar_turno(id_: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM turno WHERE id=?', (id_,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM turno WHERE id=?', (id_,))
+		_catalogo_referencia.marcar_cambio()
 
 def agregar_plan_a_turno(turno_id: int, plan_id: int):
 	try:
-		conn = get_connection()
-		c = conn.cursor()
-		c.execute('INSERT INTO turno_plan (turno_id, plan_id) VALUES (?, ?)', (turno_id, plan_id))
-		conn.commit()
+		with transaccion() as conn:
+			c = conn.cursor()
+			c.execute('INSERT INTO turno_plan (turno_id, plan_id) VALUES (?, ?)', (turno_id, plan_id))
+			_catalogo_referencia.marcar_cambio()
 	except sqlite3.IntegrityError:
 		raise Exception('El plan ya está en el turno.')
-	finally:
-		conn.close()
 
 def quitar_plan_de_turno(turno_id: int, plan_id: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM turno_plan WHERE turno_id=? AND plan_id=?', (turno_id, plan_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM turno_plan WHERE turno_id=? AND plan_id=?', (turno_id, plan_id))
+		_catalogo_referencia.marcar_cambio()
 
 def obtener_planes_de_turno(turno_id: int) -> list:
 	"""Obtiene los planes de estudio asociados a un turno (sin duplicados)"""
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('''SELECT DISTINCT p.id, p.nombre FROM plan_estudio p
-				 JOIN turno_plan tp ON tp.plan_id = p.id
-				 WHERE tp.turno_id = ?''', (turno_id,))
-	rows = c.fetchall()
-	conn.close()
-	return [{'id': r[0], 'nombre': r[1]} for r in rows]
+	return _catalogo_referencia.planes_de_turno(turno_id)
 
 def obtener_turnos_de_plan(plan_id: int) -> list:
 	"""Obtiene los turnos asociados a un plan de estudio"""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('''SELECT DISTINCT t.id, t.nombre FROM turno t
 				 JOIN turno_plan tp ON tp.turno_id = t.id
 				 WHERE tp.plan_id = ?''', (plan_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'nombre': r[1]} for r in rows]
 
 # Función helper para autocompletar comboboxes con una sola opción
@@ -947,46 +1577,603 @@ def crear_division(nombre: str):
 	raise Exception('La función crear_division debe ser llamada con turno_id, plan_id y ciclo_id.')
 
 def obtener_divisiones() -> List[Dict[str, Any]]:
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('SELECT id, nombre, turno_id, plan_id, ciclo_id FROM division')
-	rows = c.fetchall()
-	conn.close()
-	return [{'id': r[0], 'nombre': r[1], 'turno_id': r[2], 'plan_id': r[3], 'ciclo_id': r[4]} for r in rows]
+	return _catalogo_referencia.divisiones()
 
 def actualizar_division(id_: int, nombre: str):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('UPDATE division SET nombre=? WHERE id=?', (nombre, id_))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('UPDATE division SET nombre=? WHERE id=?', (nombre, id_))
+		_catalogo_referencia.marcar_cambio()
 
 def eliminar_division(id_: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM division WHERE id=?', (id_,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM division WHERE id=?', (id_,))
+		_catalogo_referencia.marcar_cambio()
+
+# ==== Cachés de datos en memoria ====
+
+class CacheDatos(ABC):
+	"""Base para cachés derivadas de la base de datos.
+
+	Las escrituras del proceso llaman a `marcar_cambio()`; las de otras instancias
+	se detectan con `PRAGMA data_version` de la conexión del hilo. Las subclases
+	implementan `_reconstruir(conn)`.
+	"""
+
+	def __init__(self, gestor: GestorConexiones):
+		self._gestor = gestor
+		self._lock = threading.RLock()
+		self._valido = False
+		self._versiones: Dict[int, int] = {}
+
+	def invalidar(self, *args):
+		with self._lock:
+			self._valido = False
+
+	def marcar_cambio(self):
+		"""Invalida la caché ahora y, dentro de una transacción, también al terminarla."""
+		self.invalidar()
+		if self._gestor.en_transaccion:
+			self._gestor.al_finalizar(self.invalidar)
+
+	def asegurar(self):
+		conn = self._gestor.conexion()
+		version = conn.execute('PRAGMA data_version').fetchone()[0]
+		with self._lock:
+			if self._valido and self._versiones.get(conn.serie) == version:
+				return
+			self._reconstruir(conn)
+			self._versiones = {conn.serie: version}
+			self._valido = True
+
+	@abstractmethod
+	def _reconstruir(self, conn):
+		"""Recarga la caché desde `conn`."""
+
+
+class CatalogoReferencia(CacheDatos):
+	"""Caché en memoria de turnos, planes, ciclos y divisiones.
+
+	Mantiene mapas indexados para los combobox en cascada:
+	- `planes_por_turno[turno_id]` -> planes del turno
+	- `ciclos_por_plan[plan_id]` -> ciclos del plan (ordenados por nombre)
+	- `divisiones_por_grupo[(turno_id, plan_id, ciclo_id)]` -> divisiones
+
+	Los métodos devuelven copias, por lo que los llamadores pueden modificarlas.
+	"""
+
+	def __init__(self, gestor: GestorConexiones):
+		super().__init__(gestor)
+		self._turnos: List[Dict[str, Any]] = []
+		self._planes: List[Dict[str, Any]] = []
+		self._ciclos: List[Dict[str, Any]] = []
+		self._divisiones: List[Dict[str, Any]] = []
+		self.planes_por_turno: Dict[int, List[Dict[str, Any]]] = {}
+		self.ciclos_por_plan: Dict[int, List[Dict[str, Any]]] = {}
+		self.divisiones_por_grupo: Dict[tuple, List[Dict[str, Any]]] = {}
+
+	def _reconstruir(self, conn):
+		c = conn.cursor()
+		self._turnos = [{'id': r[0], 'nombre': r[1]} for r in c.execute('SELECT id, nombre FROM turno ORDER BY id')]
+		self._planes = [{'id': r[0], 'nombre': r[1]} for r in c.execute('SELECT id, nombre FROM plan_estudio ORDER BY id')]
+		self._ciclos = [{'id': r[0], 'nombre': r[1]} for r in c.execute('SELECT id, nombre FROM ciclo ORDER BY nombre')]
+		self.planes_por_turno = {}
+		c.execute('''SELECT DISTINCT tp.turno_id, p.id, p.nombre FROM turno_plan tp
+				 JOIN plan_estudio p ON p.id = tp.plan_id
+				 ORDER BY tp.turno_id, p.id''')
+		for turno_id, plan_id, nombre in c.fetchall():
+			self.planes_por_turno.setdefault(turno_id, []).append({'id': plan_id, 'nombre': nombre})
+		self.ciclos_por_plan = {}
+		c.execute('''SELECT pc.plan_id, c.id, c.nombre FROM ciclo c
+				 JOIN plan_ciclo pc ON pc.ciclo_id = c.id
+				 ORDER BY c.nombre''')
+		for plan_id, ciclo_id, nombre in c.fetchall():
+			self.ciclos_por_plan.setdefault(plan_id, []).append({'id': ciclo_id, 'nombre': nombre})
+		self._divisiones = [{'id': r[0], 'nombre': r[1], 'turno_id': r[2], 'plan_id': r[3], 'ciclo_id': r[4]}
+							for r in c.execute('SELECT id, nombre, turno_id, plan_id, ciclo_id FROM division ORDER BY id')]
+		self.divisiones_por_grupo = {}
+		for d in self._divisiones:
+			self.divisiones_por_grupo.setdefault((d['turno_id'], d['plan_id'], d['ciclo_id']), []).append(d)
+
+	@staticmethod
+	def _copiar(registros: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		return [dict(r) for r in registros]
+
+	def turnos(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self._turnos)
+
+	def planes(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self._planes)
+
+	def planes_de_turno(self, turno_id: int) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self.planes_por_turno.get(turno_id, []))
+
+	def ciclos_de_plan(self, plan_id: int) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self.ciclos_por_plan.get(plan_id, []))
+
+	def divisiones(self) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self._divisiones)
+
+	def divisiones_de(self, turno_id: int, plan_id: int, ciclo_id: int) -> List[Dict[str, Any]]:
+		with self._lock:
+			self.asegurar()
+			return self._copiar(self.divisiones_por_grupo.get((turno_id, plan_id, ciclo_id), []))
+
+	def nombres(self) -> Dict[str, Dict[int, str]]:
+		"""Mapas id -> nombre de turnos, planes y ciclos"""
+		with self._lock:
+			self.asegurar()
+			return {
+				'turno': {t['id']: t['nombre'] for t in self._turnos},
+				'plan': {p['id']: p['nombre'] for p in self._planes},
+				'ciclo': {c['id']: c['nombre'] for c in self._ciclos},
+			}
+
+
+_catalogo_referencia = CatalogoReferencia(_gestor_conexiones)
+
+
+def obtener_divisiones_de(turno_id: int, plan_id: int, ciclo_id: int) -> List[Dict[str, Any]]:
+	"""Divisiones de un turno, plan y ciclo, desde la caché de referencia."""
+	return _catalogo_referencia.divisiones_de(turno_id, plan_id, ciclo_id)
+
+
+def normalizar_busqueda(texto: str) -> str:
+	"""Minúsculas y sin acentos, para comparar nombres en los filtros."""
+	descompuesto = unicodedata.normalize('NFKD', texto or '')
+	return ''.join(ch for ch in descompuesto if not unicodedata.combining(ch)).casefold()
+
+
+class IndiceBusqueda(CacheDatos):
+	"""Índice de trigramas para filtrar un catálogo por subcadena del nombre.
+
+	La búsqueda ignora mayúsculas y acentos. Con tres o más caracteres se
+	intersecan las listas de los trigramas de la consulta y solo se verifican esos
+	candidatos; con menos se recorren los nombres ya normalizados.
+	`consulta_grupos` (opcional) devuelve pares (grupo, id) para restringir
+	resultados, por ejemplo los profesores de un turno.
+	"""
+
+	def __init__(self, gestor: GestorConexiones, consulta: str, campos: List[str],
+				 consulta_grupos: Optional[str] = None):
+		super().__init__(gestor)
+		self._consulta = consulta
+		self._campos = campos
+		self._consulta_grupos = consulta_grupos
+		self._registros: Dict[Any, Dict[str, Any]] = {}
+		self._normalizados: Dict[Any, str] = {}
+		self._posicion: Dict[Any, int] = {}
+		self._trigramas: Dict[str, set] = {}
+		self._grupos: Dict[Any, set] = {}
+
+	def _reconstruir(self, conn):
+		c = conn.cursor()
+		self._registros = {}
+		self._normalizados = {}
+		self._posicion = {}
+		self._trigramas = {}
+		for posicion, fila in enumerate(c.execute(self._consulta).fetchall()):
+			registro = dict(zip(self._campos, fila))
+			id_ = registro['id']
+			normalizado = normalizar_busqueda(registro['nombre'])
+			self._registros[id_] = registro
+			self._normalizados[id_] = normalizado
+			self._posicion[id_] = posicion
+			for i in range(len(normalizado) - 2):
+				self._trigramas.setdefault(normalizado[i:i + 3], set()).add(id_)
+		self._grupos = {}
+		if self._consulta_grupos:
+			for grupo, id_ in c.execute(self._consulta_grupos).fetchall():
+				self._grupos.setdefault(grupo, set()).add(id_)
+
+	def buscar(self, texto: str = '', grupo: Any = None) -> List[Dict[str, Any]]:
+		"""Registros cuyo nombre contiene `texto`, en el orden de la consulta."""
+		consulta = normalizar_busqueda(texto)
+		with self._lock:
+			self.asegurar()
+			if grupo is not None:
+				candidatos = set(self._grupos.get(grupo, ()))
+			else:
+				candidatos = None
+			if len(consulta) >= 3:
+				# Empezar por el trigrama menos frecuente
+				listas = sorted((self._trigramas.get(consulta[i:i + 3], set())
+								 for i in range(len(consulta) - 2)), key=len)
+				por_trigramas = set(listas[0])
+				for lista in listas[1:]:
+					if not por_trigramas:
+						break
+					por_trigramas &= lista
+				candidatos = por_trigramas if candidatos is None else candidatos & por_trigramas
+			elif candidatos is None:
+				candidatos = self._registros.keys()
+			ids = [id_ for id_ in candidatos if consulta in self._normalizados[id_]]
+			ids.sort(key=self._posicion.__getitem__)
+			return [dict(self._registros[id_]) for id_ in ids]
+
+
+_indice_materias = IndiceBusqueda(_gestor_conexiones,
+	'SELECT id, nombre, horas_semanales FROM materia ORDER BY id', ['id', 'nombre', 'horas_semanales'])
+_indice_profesores = IndiceBusqueda(_gestor_conexiones,
+	'SELECT id, nombre FROM profesor ORDER BY id', ['id', 'nombre'],
+	consulta_grupos='SELECT turno_id, profesor_id FROM profesor_turno')
+
+
+def buscar_materias(texto: str = '') -> List[Dict[str, Any]]:
+	return _indice_materias.buscar(texto)
+
+
+def buscar_profesores(texto: str = '', turno_id: Optional[int] = None) -> List[Dict[str, Any]]:
+	return _indice_profesores.buscar(texto, turno_id)
+
+# ==== Índice de ocupación en memoria ====
+
+# ==== Máscaras de disponibilidad ====
+# Cada (día, espacio) es un bit: día * ESPACIOS_POR_MASCARA + (espacio - 1), con los días
+# de HORARIO_DIAS_BASE. Un entero por profesor/división representa su semana completa.
+ESPACIOS_POR_MASCARA = 16
+_INDICE_DIA = {dia: d for d, dia in enumerate(HORARIO_DIAS_BASE)}
+
+if hasattr(int, 'bit_count'):
+	_contar_bits = int.bit_count
+else:  # Python 3.9
+	def _contar_bits(mascara: int) -> int:
+		return bin(mascara).count('1')
+
+
+def _bits(mascara: int) -> List[int]:
+	"""Índices de los bits encendidos, de menor a mayor."""
+	indices = []
+	while mascara:
+		bajo = mascara & -mascara
+		indices.append(bajo.bit_length() - 1)
+		mascara ^= bajo
+	return indices
+
+
+def bit_de_slot(dia: str, espacio: int) -> Optional[int]:
+	"""Bit de un (día, espacio), o None si está fuera de la semana representable."""
+	d = _INDICE_DIA.get(dia)
+	if d is None or not isinstance(espacio, int) or not 1 <= espacio <= ESPACIOS_POR_MASCARA:
+		return None
+	return d * ESPACIOS_POR_MASCARA + espacio - 1
+
+
+def slot_de_bit(bit: int) -> tuple:
+	"""(día, espacio) de un bit de máscara."""
+	return HORARIO_DIAS_BASE[bit // ESPACIOS_POR_MASCARA], bit % ESPACIOS_POR_MASCARA + 1
+
+
+def mascara_semana(espacios=None) -> int:
+	"""Todos los slots de la semana para esos espacios (1..ESPACIOS_POR_DEFECTO si es None)."""
+	espacios = espacios or range(1, ESPACIOS_POR_DEFECTO + 1)
+	dia = sum(1 << (espacio - 1) for espacio in espacios)
+	return sum(dia << (d * ESPACIOS_POR_MASCARA) for d in range(len(HORARIO_DIAS_BASE)))
+
+
+def contar_libres_por_dia(libres: int) -> Dict[str, int]:
+	"""Cantidad de slots libres de una máscara en cada día."""
+	completo_dia = (1 << ESPACIOS_POR_MASCARA) - 1
+	return {dia: _contar_bits((libres >> (d * ESPACIOS_POR_MASCARA)) & completo_dia)
+			for d, dia in enumerate(HORARIO_DIAS_BASE)}
+
+
+class IndiceOcupacion:
+	"""Índice en memoria de la ocupación de horarios.
+
+	Permite validar conflictos de profesor/división sin consultar la base:
+	- `ocupacion[(turno_id, dia, espacio)]` -> {profesor_id: division_id}
+	- `slots[(division_id, dia, espacio)]` -> (horario_id, materia_id, profesor_id)
+	- `mascara_profesor[(turno_id, profesor_id)]` -> slots con clase del profesor en el turno
+	- `mascara_division[division_id]` -> slots de la división con materia o profesor
+	junto con los turnos de cada división y las asignaciones profesor-turno y
+	profesor-materia. Las máscaras (ver `bit_de_slot`) permiten responder con
+	operaciones de bits qué slots tienen libres en común un profesor y una división
+	o qué profesores están libres en un slot.
+
+	Se construye desde la base la primera vez y se actualiza con cada escritura
+	hecha por `_upsert_horario`/`eliminar_horario`. Una transacción confirmada que
+	escribió algo más que esos slots (en este proceso u otra instancia, detectada
+	con `PRAGMA data_version` de cada conexión) obliga a reconstruirlo en la
+	próxima consulta.
+	"""
+
+	# Tablas que lee el índice; escribir en otras no lo afecta
+	TABLAS = ('horario', 'division', 'profesor_turno', 'profesor_materia')
+
+	def __init__(self, gestor: GestorConexiones):
+		self._gestor = gestor
+		self._lock = threading.RLock()
+		self._valido = False
+		self._generacion = -1
+		# PRAGMA data_version de cada conexión cuando el índice estaba al día
+		self._versiones: Dict[int, int] = {}
+		# Escrituras de horario aplicadas al índice en la transacción de cada hilo
+		self._local = threading.local()
+		self.turno_division: Dict[int, Optional[int]] = {}
+		self.slots: Dict[tuple, tuple] = {}
+		self.slot_por_id: Dict[int, tuple] = {}
+		self.ocupacion: Dict[tuple, Dict[int, int]] = {}
+		self.mascara_profesor: Dict[tuple, int] = {}
+		self.mascara_division: Dict[int, int] = {}
+		self.profesor_turno: set = set()
+		self.profesor_materia: set = set()
+		self.profesores_de_turno: Dict[int, set] = {}
+
+	def invalidar(self):
+		with self._lock:
+			self._valido = False
+
+	def _data_version(self, conn) -> int:
+		return conn.execute('PRAGMA data_version').fetchone()[0]
+
+	def asegurar(self, conn=None):
+		"""Reconstruye el índice si hubo cambios que no pasaron por él."""
+		conn = conn or self._gestor.conexion()
+		version = self._data_version(conn)
+		with self._lock:
+			if (self._valido and self._generacion == self._gestor.generacion
+					and self._versiones.get(conn.serie) == version):
+				return
+			self._reconstruir(conn, version)
+
+	def _reconstruir(self, conn, version: int):
+		generacion = self._gestor.generacion
+		c = conn.cursor()
+		self.turno_division = dict(c.execute('SELECT id, turno_id FROM division'))
+		self.slots = {}
+		self.slot_por_id = {}
+		self.ocupacion = {}
+		self.mascara_profesor = {}
+		self.mascara_division = {}
+		c.execute('''SELECT id, division_id, dia, espacio, materia_id, profesor_id
+				 FROM horario WHERE division_id IS NOT NULL''')
+		for horario_id, division_id, dia, espacio, materia_id, profesor_id in c.fetchall():
+			self._poner(division_id, dia, espacio, horario_id, materia_id, profesor_id)
+		self.profesor_turno = set(c.execute('SELECT profesor_id, turno_id FROM profesor_turno'))
+		self.profesor_materia = set(c.execute('SELECT profesor_id, materia_id FROM profesor_materia'))
+		self.profesores_de_turno = {}
+		for profesor_id, turno_id in self.profesor_turno:
+			self.profesores_de_turno.setdefault(turno_id, set()).add(profesor_id)
+		self._generacion = generacion
+		# Las demás conexiones conservan su versión: si no cambió, no vieron otras transacciones
+		self._versiones[conn.serie] = version
+		self._valido = True
+
+	def _poner(self, division_id, dia, espacio, horario_id, materia_id, profesor_id):
+		clave = (division_id, dia, espacio)
+		self._quitar(clave)
+		self.slots[clave] = (horario_id, materia_id, profesor_id)
+		self.slot_por_id[horario_id] = clave
+		bit = bit_de_slot(dia, espacio)
+		if bit is not None and (materia_id is not None or profesor_id is not None):
+			self.mascara_division[division_id] = self.mascara_division.get(division_id, 0) | (1 << bit)
+		if profesor_id is not None:
+			turno_id = self.turno_division.get(division_id)
+			self.ocupacion.setdefault((turno_id, dia, espacio), {})[profesor_id] = division_id
+			if bit is not None:
+				clave_profesor = (turno_id, profesor_id)
+				self.mascara_profesor[clave_profesor] = self.mascara_profesor.get(clave_profesor, 0) | (1 << bit)
+
+	def _quitar(self, clave):
+		anterior = self.slots.pop(clave, None)
+		if anterior is None:
+			return
+		horario_id, _, profesor_id = anterior
+		self.slot_por_id.pop(horario_id, None)
+		division_id, dia, espacio = clave
+		bit = bit_de_slot(dia, espacio)
+		if bit is not None and division_id in self.mascara_division:
+			self.mascara_division[division_id] &= ~(1 << bit)
+		if profesor_id is not None:
+			turno_id = self.turno_division.get(division_id)
+			ocupantes = self.ocupacion.get((turno_id, dia, espacio))
+			if ocupantes and ocupantes.get(profesor_id) == division_id:
+				del ocupantes[profesor_id]
+				if bit is not None and (turno_id, profesor_id) in self.mascara_profesor:
+					self.mascara_profesor[(turno_id, profesor_id)] &= ~(1 << bit)
+
+	def _solo_slots_registrados(self, registradas: int) -> bool:
+		"""True si la transacción sólo escribió los slots aplicados al índice.
+
+		Cada `registrar_*` corresponde a una sentencia sobre horario; los UPDATE de
+		profesor_materia sólo mueven banca_horas, que el índice no guarda.
+		"""
+		en_horario = 0
+		for (verbo, tabla), cantidad in self._gestor.escrituras_de_transaccion().items():
+			if tabla == 'horario':
+				en_horario += cantidad
+			elif tabla in self.TABLAS and not (verbo == 'UPDATE' and tabla == 'profesor_materia'):
+				return False
+			elif tabla == '?':
+				return False
+		return en_horario == registradas
+
+	def _al_finalizar(self, confirmada: bool, previa: int, nueva: int):
+		registradas, self._local.registradas = getattr(self._local, 'registradas', 0), 0
+		with self._lock:
+			if (confirmada and self._valido and self._generacion == previa
+					and self._solo_slots_registrados(registradas)):
+				# Los cambios ya se aplicaron al registrarlos: sólo avanzar la marca
+				self._generacion = nueva
+			else:
+				self._valido = False
+
+	def _registrar(self):
+		self._gestor.al_finalizar(self._al_finalizar)
+		self._local.registradas = getattr(self._local, 'registradas', 0) + 1
+
+	def registrar_slot(self, division_id: int, dia: str, espacio: int, horario_id: int,
+					   materia_id: Optional[int], profesor_id: Optional[int]):
+		"""Aplica una escritura de la transacción en curso (se descarta si se revierte)."""
+		self._registrar()
+		with self._lock:
+			self._poner(division_id, dia, espacio, horario_id, materia_id, profesor_id)
+
+	def registrar_eliminacion(self, horario_id: int):
+		self._registrar()
+		with self._lock:
+			clave = self.slot_por_id.get(horario_id)
+			if clave is not None:
+				self._quitar(clave)
+
+	# --- Consultas (llamar antes a asegurar()) ---
+
+	def turno_de_division(self, division_id: int) -> int:
+		with self._lock:
+			if division_id not in self.turno_division:
+				raise Exception('División no encontrada.')
+			return self.turno_division[division_id]
+
+	def slot(self, division_id: int, dia: str, espacio: int):
+		with self._lock:
+			datos = self.slots.get((division_id, dia, espacio))
+		if datos:
+			return {'id': datos[0], 'materia_id': datos[1], 'profesor_id': datos[2]}
+		return None
+
+	def division_ocupada_por(self, profesor_id: int, turno_id: int, dia: str, espacio: int) -> Optional[int]:
+		"""División en la que el profesor ya dicta en ese turno/día/espacio, o None."""
+		with self._lock:
+			return self._ocupada_por(profesor_id, turno_id, dia, espacio)
+
+	def _ocupada_por(self, profesor_id: int, turno_id: int, dia: str, espacio: int) -> Optional[int]:
+		bit = bit_de_slot(dia, espacio)
+		if bit is not None and not self.mascara_profesor.get((turno_id, profesor_id), 0) >> bit & 1:
+			return None  # Libre según la máscara: no hace falta buscar la división
+		return self.ocupacion.get((turno_id, dia, espacio), {}).get(profesor_id)
+
+	def libres_en_comun(self, turno_id: int, profesor_id: int, division_id: int, semana: Optional[int] = None) -> int:
+		"""Máscara de los slots de `semana` donde el profesor y la división están libres."""
+		semana = mascara_semana() if semana is None else semana
+		with self._lock:
+			return semana & ~(self.mascara_profesor.get((turno_id, profesor_id), 0)
+							  | self.mascara_division.get(division_id, 0))
+
+	def disponibilidad_turno(self, turno_id: int) -> tuple:
+		"""Copia de las máscaras ocupadas de un turno: ({profesor_id: máscara}, {division_id: máscara})."""
+		with self._lock:
+			profesores = {profesor_id: mascara for (turno, profesor_id), mascara in self.mascara_profesor.items()
+						  if turno == turno_id}
+			divisiones = {division_id: self.mascara_division.get(division_id, 0)
+						  for division_id, turno in self.turno_division.items() if turno == turno_id}
+		return profesores, divisiones
+
+	def validar_profesor(self, profesor_id: int, turno_id: int, materia_id: Optional[int],
+						 dia: str, espacio: int, division_id: int):
+		with self._lock:
+			if (profesor_id, turno_id) not in self.profesor_turno:
+				raise Exception('El profesor no está asignado al turno seleccionado.')
+			if materia_id is not None and (profesor_id, materia_id) not in self.profesor_materia:
+				raise Exception('El profesor no tiene asignada la materia seleccionada.')
+			ocupada = self._ocupada_por(profesor_id, turno_id, dia, espacio)
+			if ocupada is not None and ocupada != division_id:
+				raise Exception('El profesor ya está asignado en ese horario en otra división del mismo turno.')
+
+	def profesores_libres(self, turno_id: int, dia: str, espacio: int,
+						  materia_id: Optional[int] = None, division_id: Optional[int] = None) -> set:
+		"""Profesores del turno (y de la materia, si se indica) sin clase en ese día/espacio.
+
+		El profesor que ya ocupa el slot de `division_id` se considera libre.
+		"""
+		with self._lock:
+			candidatos = set(self.profesores_de_turno.get(turno_id, ()))
+			if materia_id is not None:
+				candidatos = {p for p in candidatos if (p, materia_id) in self.profesor_materia}
+			return {p for p in candidatos
+					if self._ocupada_por(p, turno_id, dia, espacio) in (None, division_id)}
+
+
+_indice_ocupacion = IndiceOcupacion(_gestor_conexiones)
+
+
+def obtener_profesores_libres(turno_id: int, dia: str, espacio: int,
+							  materia_id: Optional[int] = None, division_id: Optional[int] = None) -> set:
+	"""IDs de los profesores disponibles para un turno/día/espacio (ver IndiceOcupacion)."""
+	_indice_ocupacion.asegurar()
+	return _indice_ocupacion.profesores_libres(turno_id, dia, espacio, materia_id, division_id)
+
+
+def obtener_slots_libres_en_comun(turno_id: int, profesor_id: int, division_id: int) -> List[tuple]:
+	"""(día, espacio) de los espacios del turno donde el profesor y la división están libres."""
+	_indice_ocupacion.asegurar()
+	espacios = [r[0] for r in get_connection_lectura().execute(
+		'SELECT espacio FROM turno_espacio_hora WHERE turno_id=?', (turno_id,))]
+	libres = _indice_ocupacion.libres_en_comun(turno_id, profesor_id, division_id, mascara_semana(espacios))
+	return [slot_de_bit(bit) for bit in _bits(libres)]
+
+
+def sugerir_profesores(turno_id: int, dia: str, espacio: int, materia_id: int,
+					   division_id: Optional[int] = None) -> List[Dict[str, Any]]:
+	"""Profesores que pueden dictar la materia en ese turno/día/espacio, del más al menos conveniente.
+
+	Sólo incluye a los del turno, con la materia en profesor_materia y libres en el slot
+	según IndiceOcupacion (el que ya ocupa el slot de `division_id` cuenta como libre).
+	Orden: primero el que ya dicta la materia en la división, luego los que tienen
+	clase en el espacio anterior o siguiente de ese día (no les queda una hora libre
+	intermedia) y, por último, los de menos horas asignadas de la materia
+	(banca_horas) y en el turno.
+	"""
+	_indice_ocupacion.asegurar()
+	libres = _indice_ocupacion.profesores_libres(turno_id, dia, espacio, materia_id, division_id)
+	if not libres:
+		return []
+	conn = get_connection_lectura()
+	nombres = dict(conn.execute('SELECT id, nombre FROM profesor'))
+	banca = dict(conn.execute('SELECT profesor_id, banca_horas FROM profesor_materia WHERE materia_id=?', (materia_id,)))
+	actual = None
+	if division_id is not None:
+		fila = conn.execute(SQL_PROFESOR_DE_MATERIA_EN_DIVISION, (division_id, materia_id)).fetchone()
+		actual = fila[0] if fila else None
+	mascaras, _ = _indice_ocupacion.disponibilidad_turno(turno_id)
+	bit = bit_de_slot(dia, espacio)
+	vecinos = 0
+	if bit is not None:
+		if espacio > 1:
+			vecinos |= 1 << (bit - 1)
+		if espacio < ESPACIOS_POR_MASCARA:
+			vecinos |= 1 << (bit + 1)
+	sugeridos = [{'id': profesor_id, 'nombre': nombres.get(profesor_id, ''),
+				  'dicta_en_division': profesor_id == actual,
+				  'contiguo': bool(mascaras.get(profesor_id, 0) & vecinos),
+				  'banca_horas': banca.get(profesor_id, 0),
+				  'horas_turno': _contar_bits(mascaras.get(profesor_id, 0))}
+				 for profesor_id in libres]
+	sugeridos.sort(key=lambda p: (not p['dicta_en_division'], not p['contiguo'], p['banca_horas'],
+								  p['horas_turno'], p['nombre'].lower()))
+	return sugeridos
+
+
+def obtener_divisiones_libres(turno_id: int, dia: str, espacio: int, division_ids: List[int]) -> List[int]:
+	"""Divisiones de `division_ids` sin materia ni profesor en ese día/espacio."""
+	_indice_ocupacion.asegurar()
+	bit = bit_de_slot(dia, espacio)
+	if bit is None:
+		return list(division_ids)
+	_, divisiones = _indice_ocupacion.disponibilidad_turno(turno_id)
+	return [division_id for division_id in division_ids if not divisiones.get(division_id, 0) >> bit & 1]
 
 # ==== Helpers internos para la tabla de horarios ====
 
 def _obtener_turno_de_division(conn, division_id: int) -> int:
-	c = conn.cursor()
-	c.execute('SELECT turno_id FROM division WHERE id=?', (division_id,))
-	row = c.fetchone()
-	if not row:
-		raise Exception('División no encontrada.')
-	return row[0]
+	_indice_ocupacion.asegurar(conn)
+	return _indice_ocupacion.turno_de_division(division_id)
 
 
 def _obtener_slot_horario(conn, division_id: int, dia: str, espacio: int):
-	c = conn.cursor()
-	c.execute('SELECT id, materia_id, profesor_id FROM horario WHERE division_id=? AND dia=? AND espacio=?',
-		  (division_id, dia, espacio))
-	row = c.fetchone()
-	if row:
-		return {'id': row[0], 'materia_id': row[1], 'profesor_id': row[2]}
-	return None
+	_indice_ocupacion.asegurar(conn)
+	return _indice_ocupacion.slot(division_id, dia, espacio)
 
 
 def _ajustar_contadores(conn, old_profesor_id: Optional[int], old_materia_id: Optional[int],
@@ -994,6 +2181,8 @@ def _ajustar_contadores(conn, old_profesor_id: Optional[int], old_materia_id: Op
 	if old_profesor_id == new_profesor_id and old_materia_id == new_materia_id:
 		return  # No hay cambios
 	c = conn.cursor()
+	if old_materia_id != new_materia_id:
+		_indice_materias.marcar_cambio()  # cambia horas_semanales
 	if old_materia_id and old_materia_id != new_materia_id:
 		c.execute('UPDATE materia SET horas_semanales = horas_semanales - 1 WHERE id=?', (old_materia_id,))
 	if new_materia_id and new_materia_id != old_materia_id:
@@ -1009,23 +2198,9 @@ def _ajustar_contadores(conn, old_profesor_id: Optional[int], old_materia_id: Op
 
 def _validar_profesor_para_slot(conn, profesor_id: int, turno_id: int, materia_id: Optional[int],
 								 dia: str, espacio: int, division_id: int, horario_existente_id: Optional[int]):
-	c = conn.cursor()
-	c.execute('SELECT 1 FROM profesor_turno WHERE profesor_id=? AND turno_id=?', (profesor_id, turno_id))
-	if not c.fetchone():
-		raise Exception('El profesor no está asignado al turno seleccionado.')
-
-	if materia_id is not None:
-		c.execute('SELECT 1 FROM profesor_materia WHERE profesor_id=? AND materia_id=?', (profesor_id, materia_id))
-		if not c.fetchone():
-			raise Exception('El profesor no tiene asignada la materia seleccionada.')
-
-	slot_id = horario_existente_id if horario_existente_id is not None else -1
-	c.execute('''SELECT h.id FROM horario h
-			 JOIN division d ON h.division_id = d.id
-			 WHERE h.profesor_id=? AND h.dia=? AND h.espacio=? AND d.turno_id=? AND h.id != ?''',
-		  (profesor_id, dia, espacio, turno_id, slot_id))
-	if c.fetchone():
-		raise Exception('El profesor ya está asignado en ese horario en otra división del mismo turno.')
+	# El propio slot (horario_existente_id) pertenece a division_id, por lo que no cuenta como conflicto
+	_indice_ocupacion.asegurar(conn)
+	_indice_ocupacion.validar_profesor(profesor_id, turno_id, materia_id, dia, espacio, division_id)
 
 
 def _upsert_horario(conn, division_id: int, dia: str, espacio: int,
@@ -1055,82 +2230,182 @@ def _upsert_horario(conn, division_id: int, dia: str, espacio: int,
 		c.execute('''UPDATE horario SET hora_inicio=?, hora_fin=?, materia_id=?, profesor_id=?, turno_id=?
 				  WHERE id=?''',
 			  (hora_inicio_db, hora_fin_db, materia_id, profesor_id, turno_id, horario_id))
-		return horario_id
 	else:
 		c.execute('''INSERT INTO horario (division_id, dia, espacio, hora_inicio, hora_fin, materia_id, profesor_id, turno_id)
 				  VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
 			  (division_id, dia, espacio, hora_inicio_db, hora_fin_db, materia_id, profesor_id, turno_id))
-		return c.lastrowid
+		horario_id = c.lastrowid
+	_indice_ocupacion.registrar_slot(division_id, dia, espacio, horario_id, materia_id, profesor_id)
+	return horario_id
 
 # CRUD Horario
 def crear_horario(division_id: int, dia: str, espacio: int, hora_inicio: str, hora_fin: str, materia_id: int, profesor_id: int, turno_id: int = None):
-	conn = get_connection()
-	try:
+	with transaccion() as conn:
 		_upsert_horario(conn, division_id, dia, espacio, hora_inicio, hora_fin, materia_id, profesor_id, turno_id)
-		conn.commit()
-	except Exception:
-		conn.rollback()
-		raise
-	finally:
-		conn.close()
 
 def obtener_horarios(division_id: int) -> List[Dict[str, Any]]:
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
-	c.execute('''SELECT h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin, m.nombre, p.nombre FROM horario h
-				 LEFT JOIN materia m ON h.materia_id = m.id
-				 LEFT JOIN profesor p ON h.profesor_id = p.id
-				 WHERE h.division_id=?''', (division_id,))
+	c.execute(SQL_HORARIOS_DIVISION, (division_id,))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'dia': r[1], 'espacio': r[2], 'hora_inicio': r[3], 'hora_fin': r[4], 'materia': r[5], 'profesor': r[6]} for r in rows]
 
+# Máximo de parámetros por consulta (límite histórico de SQLite)
+MAX_PARAMETROS_SQL = 900
+
+def obtener_horarios_divisiones(division_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+	"""Horarios de varias divisiones en una sola consulta, agrupados por división.
+
+	Devuelve los mismos registros que obtener_horarios() para cada división.
+	"""
+	resultado: Dict[int, List[Dict[str, Any]]] = {division_id: [] for division_id in division_ids}
+	ids = list(resultado)
+	c = get_connection_lectura().cursor()
+	for inicio in range(0, len(ids), MAX_PARAMETROS_SQL):
+		lote = ids[inicio:inicio + MAX_PARAMETROS_SQL]
+		c.execute(f'''SELECT h.division_id, h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin, m.nombre, p.nombre FROM horario h
+					 LEFT JOIN materia m ON h.materia_id = m.id
+					 LEFT JOIN profesor p ON h.profesor_id = p.id
+					 WHERE h.division_id IN ({','.join('?' * len(lote))})''', lote)
+		for r in c.fetchall():
+			resultado[r[0]].append({'id': r[1], 'dia': r[2], 'espacio': r[3], 'hora_inicio': r[4], 'hora_fin': r[5], 'materia': r[6], 'profesor': r[7]})
+	return resultado
+
 def eliminar_horario(id_: int):
-	conn = get_connection()
-	c = conn.cursor()
-	# Al eliminar, restar horas a materia y profesor
-	c.execute('SELECT materia_id, profesor_id FROM horario WHERE id=?', (id_,))
-	row = c.fetchone()
-	if row:
-		materia_id, profesor_id = row
-		if materia_id is not None:
-			c.execute('UPDATE materia SET horas_semanales = horas_semanales - 1 WHERE id=?', (materia_id,))
-		if profesor_id is not None and materia_id is not None:
-			c.execute('UPDATE profesor_materia SET banca_horas = banca_horas - 1 WHERE profesor_id=? AND materia_id=?', (profesor_id, materia_id))
-	c.execute('DELETE FROM horario WHERE id=?', (id_,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		# Al eliminar, restar horas a materia y profesor
+		c.execute('SELECT materia_id, profesor_id FROM horario WHERE id=?', (id_,))
+		row = c.fetchone()
+		if row:
+			materia_id, profesor_id = row
+			if materia_id is not None:
+				c.execute('UPDATE materia SET horas_semanales = horas_semanales - 1 WHERE id=?', (materia_id,))
+				_indice_materias.marcar_cambio()
+			if profesor_id is not None and materia_id is not None:
+				c.execute('UPDATE profesor_materia SET banca_horas = banca_horas - 1 WHERE profesor_id=? AND materia_id=?', (profesor_id, materia_id))
+		c.execute('DELETE FROM horario WHERE id=?', (id_,))
+		_indice_ocupacion.registrar_eliminacion(id_)
 
 # Helpers para horas por turno/espacio (turno_espacio_hora)
 def obtener_turno_espacio_hora(turno_id: int, espacio: int):
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('SELECT hora_inicio, hora_fin FROM turno_espacio_hora WHERE turno_id=? AND espacio=?', (turno_id, espacio))
 	row = c.fetchone()
-	conn.close()
 	if row:
 		return {'hora_inicio': row[0], 'hora_fin': row[1]}
 	return None
 
 def set_turno_espacio_hora(turno_id: int, espacio: int, hora_inicio: str, hora_fin: str):
-	conn = get_connection()
-	c = conn.cursor()
-	# Si ambos vacíos, eliminar registro existente
-	if not hora_inicio and not hora_fin:
-		c.execute('DELETE FROM turno_espacio_hora WHERE turno_id=? AND espacio=?', (turno_id, espacio))
-	else:
-		# Insertar o actualizar (usamos INSERT OR REPLACE sobre la clave única turno_id+espacio)
-		c.execute('INSERT OR REPLACE INTO turno_espacio_hora (turno_id, espacio, hora_inicio, hora_fin) VALUES (?, ?, ?, ?)',
-				  (turno_id, espacio, hora_inicio if hora_inicio else None, hora_fin if hora_fin else None))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		# Si ambos vacíos, eliminar registro existente
+		if not hora_inicio and not hora_fin:
+			c.execute('DELETE FROM turno_espacio_hora WHERE turno_id=? AND espacio=?', (turno_id, espacio))
+		else:
+			# Insertar o actualizar (usamos INSERT OR REPLACE sobre la clave única turno_id+espacio)
+			c.execute('INSERT OR REPLACE INTO turno_espacio_hora (turno_id, espacio, hora_inicio, hora_fin) VALUES (?, ?, ?, ?)',
+					  (turno_id, espacio, hora_inicio if hora_inicio else None, hora_fin if hora_fin else None))
 
 def eliminar_turno_espacio_hora(turno_id: int, espacio: int):
-	conn = get_connection()
-	c = conn.cursor()
-	c.execute('DELETE FROM turno_espacio_hora WHERE turno_id=? AND espacio=?', (turno_id, espacio))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		c.execute('DELETE FROM turno_espacio_hora WHERE turno_id=? AND espacio=?', (turno_id, espacio))
+
+# Aplicación masiva de horas por turno (plantilla espacio -> hora_inicio/hora_fin)
+def _cte_plantilla_horas(horas: Dict[int, tuple], dias: List[str]):
+	"""Arma la CTE `plantilla(espacio, dia, hora_inicio, hora_fin)` y sus parámetros.
+
+	Se omiten los espacios sin hora de inicio ni de fin.
+	"""
+	filas = []
+	params: List[Any] = []
+	for espacio, (hora_inicio, hora_fin) in sorted(horas.items()):
+		if not hora_inicio and not hora_fin:
+			continue
+		for dia in dias:
+			filas.append('(?, ?, ?, ?)')
+			params.extend([espacio, dia, hora_inicio or None, hora_fin or None])
+	if not filas:
+		return None, []
+	return f'plantilla(espacio, dia, hora_inicio, hora_fin) AS (VALUES {", ".join(filas)})', params
+
+
+def aplicar_horas_turno_a_divisiones(turno_id: int, horas: Dict[int, tuple],
+									 division_ids: Optional[List[int]] = None,
+									 dias: Optional[List[str]] = None) -> int:
+	"""Copia las horas de la plantilla a los horarios de las divisiones indicadas
+	(todas las del turno si `division_ids` es None) con un único upsert.
+
+	Los slots inexistentes se crean sin materia ni profesor. Devuelve la cantidad
+	de filas insertadas o actualizadas.
+	"""
+	plantilla, params = _cte_plantilla_horas(horas, dias or HORARIO_DIAS_BASE)
+	if not plantilla:
+		return 0
+	if division_ids is None:
+		objetivo = 'SELECT id, turno_id FROM division WHERE turno_id = ?'
+		params.append(turno_id)
+	else:
+		if not division_ids:
+			return 0
+		objetivo = f'SELECT id, turno_id FROM division WHERE id IN ({",".join("?" * len(division_ids))})'
+		params.extend(division_ids)
+	with transaccion() as conn:
+		# rowcount no se informa para sentencias que empiezan con WITH: se usa total_changes
+		cambios_previos = conn.total_changes
+		c = conn.cursor()
+		c.execute(f'''WITH {plantilla}, objetivo(division_id, turno_id) AS ({objetivo})
+				 INSERT INTO horario (division_id, dia, espacio, hora_inicio, hora_fin, turno_id)
+				 SELECT o.division_id, p.dia, p.espacio, p.hora_inicio, p.hora_fin, o.turno_id
+				 FROM objetivo o CROSS JOIN plantilla p WHERE 1
+				 ON CONFLICT(division_id, dia, espacio) DO UPDATE SET
+					hora_inicio = excluded.hora_inicio, hora_fin = excluded.hora_fin''', params)
+		return conn.total_changes - cambios_previos
+
+
+def aplicar_horas_turno_a_profesores(turno_id: int, horas: Dict[int, tuple],
+									 profesor_ids: Optional[List[int]] = None,
+									 dias: Optional[List[str]] = None) -> int:
+	"""Copia las horas de la plantilla a los horarios de los profesores indicados
+	(todos los del turno si `profesor_ids` es None).
+
+	horario no tiene clave única por profesor, así que se hace en dos sentencias:
+	UPDATE ... FROM para las filas existentes e INSERT de las que faltan.
+	Devuelve la cantidad de filas insertadas o actualizadas.
+	"""
+	plantilla, params_plantilla = _cte_plantilla_horas(horas, dias or HORARIO_DIAS_BASE)
+	if not plantilla:
+		return 0
+	if profesor_ids is None:
+		objetivo = 'SELECT profesor_id FROM profesor_turno WHERE turno_id = ?'
+		params_objetivo = [turno_id]
+	else:
+		if not profesor_ids:
+			return 0
+		objetivo = f'VALUES {",".join(["(?)"] * len(profesor_ids))}'
+		params_objetivo = list(profesor_ids)
+	cte = f'WITH {plantilla}, objetivo(profesor_id) AS ({objetivo})'
+	with transaccion() as conn:
+		# rowcount no se informa para sentencias que empiezan con WITH: se usa total_changes
+		cambios_previos = conn.total_changes
+		c = conn.cursor()
+		c.execute(f'''{cte}
+				 UPDATE horario SET hora_inicio = p.hora_inicio, hora_fin = p.hora_fin
+				 FROM plantilla p
+				 WHERE horario.turno_id = ? AND horario.espacio = p.espacio AND horario.dia = p.dia
+				   AND horario.profesor_id IN (SELECT profesor_id FROM objetivo)''',
+			  params_plantilla + params_objetivo + [turno_id])
+		c.execute(f'''{cte}
+				 INSERT INTO horario (profesor_id, turno_id, dia, espacio, hora_inicio, hora_fin, division_id, materia_id)
+				 SELECT o.profesor_id, ?, p.dia, p.espacio, p.hora_inicio, p.hora_fin, NULL, NULL
+				 FROM objetivo o CROSS JOIN plantilla p
+				 WHERE NOT EXISTS (SELECT 1 FROM horario h
+						WHERE h.profesor_id = o.profesor_id AND h.turno_id = ?
+						  AND h.espacio = p.espacio AND h.dia = p.dia)''',
+			  params_plantilla + params_objetivo + [turno_id, turno_id])
+		return conn.total_changes - cambios_previos
 
 # CRUD Horario por Profesor (usa la misma tabla 'horario' que la vista por ciclo)
 def crear_horario_profesor(profesor_id: int, turno_id: int, dia: str, espacio: int,
@@ -1142,33 +2417,76 @@ def crear_horario_profesor(profesor_id: int, turno_id: int, dia: str, espacio: i
 	if materia_id is None:
 		raise Exception('Seleccione la materia dictada por el profesor.')
 
-	conn = get_connection()
-	try:
+	with transaccion() as conn:
 		_upsert_horario(conn, division_id, dia, espacio, hora_inicio, hora_fin, materia_id, profesor_id, turno_id)
-		conn.commit()
-	except Exception:
-		conn.rollback()
-		raise
-	finally:
-		conn.close()
 
 def obtener_horarios_profesor(profesor_id: int, turno_id: int) -> List[Dict[str, Any]]:
 	"""
 	Obtiene todos los horarios de un profesor en un turno específico.
 	Lee de la tabla 'horario', por lo que incluye asignaciones hechas desde cualquier vista.
 	"""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
-	c.execute('''SELECT h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin, 
-				 m.nombre as materia, d.nombre as division
-				 FROM horario h
-				 LEFT JOIN materia m ON h.materia_id = m.id
-				 LEFT JOIN division d ON h.division_id = d.id
-				 WHERE h.profesor_id=? AND h.turno_id=?''', (profesor_id, turno_id))
+	c.execute(SQL_HORARIOS_PROFESOR, (profesor_id, turno_id))
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'dia': r[1], 'espacio': r[2], 'hora_inicio': r[3], 'hora_fin': r[4], 'materia': r[5], 'division': r[6]} for r in rows]
 
+def limpiar_horarios_vacios_division(division_id: int) -> int:
+	"""Elimina los horarios de la división que sólo tienen horas (sin materia ni profesor)."""
+	with transaccion() as conn:
+		return conn.execute(SQL_LIMPIAR_VACIOS_DIVISION, (division_id,)).rowcount
+
+def limpiar_horarios_vacios_profesor(profesor_id: int, turno_id: int) -> int:
+	"""Elimina los horarios del profesor en el turno que sólo tienen horas (sin división ni materia)."""
+	with transaccion() as conn:
+		return conn.execute(SQL_LIMPIAR_VACIOS_PROFESOR, (profesor_id, turno_id)).rowcount
+
+# Matrices (dia, espacio) -> horario por (profesor_id, turno_id), válidas mientras no cambie el sello
+_cache_matrices_profesor: Dict[str, Any] = {'sello': None, 'matrices': {}}
+
+def obtener_matriz_horario_profesor(profesor_id: int, turno_id: int) -> Dict[tuple, Dict[str, Any]]:
+	"""
+	Horarios del profesor indexados por (dia, espacio), compartidos por la grilla y el
+	diálogo de edición. Se reutilizan hasta que una escritura cambie el sello de datos.
+	La matriz devuelta no debe modificarse.
+	"""
+	conn = get_connection_lectura()
+	sello = _gestor_conexiones.sello_datos(conn)
+	cache = _cache_matrices_profesor
+	if sello is None or cache['sello'] != sello:
+		cache['sello'] = sello
+		cache['matrices'] = {}
+	clave = (profesor_id, turno_id)
+	matriz = cache['matrices'].get(clave)
+	if matriz is None:
+		matriz = {(h['dia'], h['espacio']): h for h in obtener_horarios_profesor(profesor_id, turno_id)}
+		if sello is not None:
+			cache['matrices'][clave] = matriz
+	return matriz
+
+def obtener_horarios_profesores(combinaciones: List[tuple]) -> Dict[tuple, List[Dict[str, Any]]]:
+	"""Horarios de varias combinaciones (profesor_id, turno_id) en una sola consulta.
+
+	Devuelve los mismos registros que obtener_horarios_profesor(), agrupados por combinación.
+	"""
+	resultado: Dict[tuple, List[Dict[str, Any]]] = {tuple(clave): [] for clave in combinaciones}
+	claves = list(resultado)
+	c = get_connection_lectura().cursor()
+	por_lote = MAX_PARAMETROS_SQL // 2
+	for inicio in range(0, len(claves), por_lote):
+		lote = claves[inicio:inicio + por_lote]
+		params = [valor for clave in lote for valor in clave]
+		c.execute(f'''WITH seleccion(profesor_id, turno_id) AS (VALUES {','.join(['(?, ?)'] * len(lote))})
+					 SELECT h.profesor_id, h.turno_id, h.id, h.dia, h.espacio, h.hora_inicio, h.hora_fin,
+					 m.nombre as materia, d.nombre as division
+					 FROM seleccion s
+					 JOIN horario h ON h.profesor_id = s.profesor_id AND h.turno_id = s.turno_id
+					 LEFT JOIN materia m ON h.materia_id = m.id
+					 LEFT JOIN division d ON h.division_id = d.id''', params)
+		for r in c.fetchall():
+			resultado[(r[0], r[1])].append({'id': r[2], 'dia': r[3], 'espacio': r[4], 'hora_inicio': r[5], 'hora_fin': r[6], 'materia': r[7], 'division': r[8]})
+	return resultado
+
 def eliminar_horario_profesor(id_: int):
 	"""
 	Elimina un horario por su ID. Como usa la tabla 'horario', 
@@ -1177,41 +2495,1327 @@ def eliminar_horario_profesor(id_: int):
 	# Usamos la misma función eliminar_horario que ya existe
 	eliminar_horario(id_)
 
+# ============== GENERADOR AUTOMÁTICO DE HORARIOS ==============
+# Cada slot (día, espacio) de un turno es un bit: slot = índice_día * len(espacios) + índice_espacio.
+# La ocupación de cada división y de cada profesor es un entero usado como máscara de bits.
+
+def _huecos_en(mascara: int) -> int:
+	"""Espacios libres entre la primera y la última hora ocupada de un día."""
+	if not mascara:
+		return 0
+	return mascara.bit_length() - (mascara & -mascara).bit_length() + 1 - _contar_bits(mascara)
+
+
+# Pesos del costo de una solución (menor es mejor)
+PESO_SIN_UBICAR = 100      # hora de una obligación que no se pudo ubicar
+PESO_HUECO_DIVISION = 10   # hora libre entre dos clases de una división
+PESO_REPETICION_DIA = 4    # hora de la misma obligación por encima del máximo diario
+PESO_HUECO_PROFESOR = 1    # hora libre entre dos clases de un profesor
+PESO_MOVIDA = 3            # hora ubicada fuera de sus slots preferidos (reparación)
+# Tiempo por defecto de la búsqueda local, en segundos
+GENERADOR_TIEMPO_LIMITE = 20.0
+# Tiempo por defecto de la reparación de un turno, en segundos
+GENERADOR_TIEMPO_REPARACION = 3.0
+# Procesos para los arranques en paralelo (por defecto, uno por núcleo)
+try:
+	GENERADOR_PROCESOS = max(1, int(os.environ.get('SISTEMA_ESCOLAR_PROCESOS_GENERADOR', os.cpu_count() or 1)))
+except ValueError:
+	GENERADOR_PROCESOS = os.cpu_count() or 1
+
+
+class ProblemaHorario:
+	"""Datos de un turno para el generador de horarios, sin acceso a la base.
+
+	- `cursos[c] = (division, materia_id, horas, candidatos, profesor_fijo)`: horas a
+	  ubicar de una obligación en una división; `division` y los candidatos son
+	  índices en `divisiones`/`profesores`, y `profesor_fijo` es -1 si el profesor
+	  no está determinado por clases ya cargadas.
+	- `ocupado_division[i]`/`ocupado_profesor[j]`: slots que ya tienen clase y no se tocan.
+	- `previas[c]`: horas ya cargadas de la obligación en cada día (para repartirlas).
+	- `preferidos[c]`: slots donde conviene dejar sus horas (en una reparación, los que
+	  ya tenía); ubicarlas en otro slot suma PESO_MOVIDA. Por defecto, todos.
+
+	Sólo contiene tuplas de enteros (la disponibilidad de cada división y profesor es
+	una máscara de bits y la demanda de cada división, la lista de sus cursos), así que
+	se envía una única vez a cada proceso (en el `initializer` del pool) y todos los
+	arranques de ese proceso la comparten sin copiarla.
+	"""
+
+	def __init__(self, turno_id: int, dias, espacios, divisiones, profesores, cursos,
+				 ocupado_division, ocupado_profesor, previas, preferidos=None):
+		self.turno_id = turno_id
+		self.dias = tuple(dias)
+		self.espacios = tuple(espacios)
+		self.divisiones = tuple(divisiones)
+		self.profesores = tuple(profesores)
+		self.cursos = tuple(cursos)
+		self.ocupado_division = tuple(ocupado_division)
+		self.ocupado_profesor = tuple(ocupado_profesor)
+		self.previas = tuple(tuple(p) for p in previas)
+		self.por_dia = len(self.espacios)
+		self.total_slots = len(self.dias) * self.por_dia
+		self.completo = (1 << self.total_slots) - 1
+		self.mascara_dia = tuple(((1 << self.por_dia) - 1) << (d * self.por_dia) for d in range(len(self.dias)))
+		self.preferidos = tuple(preferidos) if preferidos is not None else (self.completo,) * len(self.cursos)
+
+	@property
+	def horas_pedidas(self) -> int:
+		return sum(curso[2] for curso in self.cursos)
+
+	def slot(self, indice: int) -> tuple:
+		"""(día, espacio) de un índice de slot."""
+		return self.dias[indice // self.por_dia], self.espacios[indice % self.por_dia]
+
+
+def _espacios_de_turno(conn, turno_id: int) -> List[int]:
+	espacios = [r[0] for r in conn.execute(
+		'SELECT espacio FROM turno_espacio_hora WHERE turno_id=? ORDER BY espacio', (turno_id,))]
+	return espacios or list(range(1, ESPACIOS_POR_DEFECTO + 1))
+
+
+def _ocupacion_de_turno(turno_id: int, espacios: List[int]) -> tuple:
+	"""Máscaras ocupadas del turno según IndiceOcupacion, con la numeración de slots del generador.
+
+	Devuelve ({profesor_id: máscara}, {division_id: máscara}).
+	"""
+	_indice_ocupacion.asegurar()
+	profesores, divisiones = _indice_ocupacion.disponibilidad_turno(turno_id)
+	por_dia = len(espacios)
+	completo_dia = (1 << ESPACIOS_POR_MASCARA) - 1
+
+	def compactar(mascara: int) -> int:
+		resultado = 0
+		for d in range(len(HORARIO_DIAS_BASE)):
+			dia = (mascara >> (d * ESPACIOS_POR_MASCARA)) & completo_dia
+			if dia:
+				for e, espacio in enumerate(espacios):
+					if dia >> (espacio - 1) & 1:
+						resultado |= 1 << (d * por_dia + e)
+		return resultado
+	return ({profesor_id: compactar(m) for profesor_id, m in profesores.items() if m},
+			{division_id: compactar(m) for division_id, m in divisiones.items() if m})
+
+
+def obtener_obligaciones_division(conn, plan_id: Optional[int], ciclo_id: Optional[int]) -> List[int]:
+	"""Materias que cursa una división: las de su ciclo o, si el ciclo no tiene, las de su plan."""
+	materias = [r[0] for r in conn.execute(
+		'SELECT materia_id FROM ciclo_materia WHERE ciclo_id=? ORDER BY materia_id', (ciclo_id,))]
+	if not materias:
+		materias = [r[0] for r in conn.execute(
+			'SELECT materia_id FROM plan_materia WHERE plan_id=? ORDER BY materia_id', (plan_id,))]
+	return materias
+
+
+def obtener_obligaciones_turno(turno_id: int) -> List[Dict[str, Any]]:
+	"""Obligaciones de las divisiones de un turno, con una carga horaria sugerida.
+
+	La sugerencia reparte los slots semanales del turno entre las obligaciones de la
+	división que más tiene, para que ninguna quede con más horas que slots.
+	"""
+	conn = get_connection_lectura()
+	slots = len(HORARIO_DIAS_BASE) * len(_espacios_de_turno(conn, turno_id))
+	nombres = dict(conn.execute('SELECT id, nombre FROM materia'))
+	divisiones_por_materia: Dict[int, int] = {}
+	maximo = 0
+	for _, plan_id, ciclo_id in conn.execute('SELECT id, plan_id, ciclo_id FROM division WHERE turno_id=?', (turno_id,)).fetchall():
+		materias = obtener_obligaciones_division(conn, plan_id, ciclo_id)
+		maximo = max(maximo, len(materias))
+		for materia_id in materias:
+			divisiones_por_materia[materia_id] = divisiones_por_materia.get(materia_id, 0) + 1
+	sugeridas = max(1, slots // maximo) if maximo else 0
+	obligaciones = [{'materia_id': materia_id, 'nombre': nombres.get(materia_id, ''), 'divisiones': cantidad,
+					 'horas_sugeridas': sugeridas}
+					for materia_id, cantidad in divisiones_por_materia.items()]
+	return sorted(obligaciones, key=lambda o: o['nombre'])
+
+
+def cargar_problema_horario(turno_id: int, horas_por_materia: Dict[int, int],
+							division_ids: Optional[List[int]] = None) -> ProblemaHorario:
+	"""Arma el problema de un turno desde la base.
+
+	Args:
+		turno_id: Turno a completar.
+		horas_por_materia: Horas semanales que cada división debe tener de cada obligación.
+		division_ids: Divisiones a completar (todas las del turno si es None). Las clases
+			de las demás divisiones del turno sólo cuentan como ocupación de sus profesores.
+
+	Las clases ya cargadas (con materia o profesor) se respetan: descuentan horas de la
+	obligación y, si tienen profesor, fijan al profesor de esa obligación en la división.
+	"""
+	conn = get_connection_lectura()
+	dias = list(HORARIO_DIAS_BASE)
+	espacios = _espacios_de_turno(conn, turno_id)
+	por_dia = len(espacios)
+	indice_slot = {(dia, espacio): d * por_dia + e
+				   for d, dia in enumerate(dias) for e, espacio in enumerate(espacios)}
+
+	filas_division = conn.execute('SELECT id, plan_id, ciclo_id FROM division WHERE turno_id=? ORDER BY id',
+								  (turno_id,)).fetchall()
+	if division_ids is not None:
+		elegidas = set(division_ids)
+		filas_division = [f for f in filas_division if f[0] in elegidas]
+	divisiones = [f[0] for f in filas_division]
+	indice_division = {division_id: i for i, division_id in enumerate(divisiones)}
+
+	profesores = [r[0] for r in conn.execute(
+		'SELECT profesor_id FROM profesor_turno WHERE turno_id=? ORDER BY profesor_id', (turno_id,))]
+	indice_profesor = {profesor_id: j for j, profesor_id in enumerate(profesores)}
+	habilitados: Dict[int, List[int]] = {}
+	for profesor_id, materia_id in conn.execute('SELECT profesor_id, materia_id FROM profesor_materia ORDER BY profesor_id'):
+		if profesor_id in indice_profesor:
+			habilitados.setdefault(materia_id, []).append(indice_profesor[profesor_id])
+
+	ocupados_profesor, ocupados_division = _ocupacion_de_turno(turno_id, espacios)
+	ocupado_division = [ocupados_division.get(division_id, 0) for division_id in divisiones]
+	ocupado_profesor = [ocupados_profesor.get(profesor_id, 0) for profesor_id in profesores]
+	cargadas: Dict[tuple, List[int]] = {}      # (división, materia) -> slots ya cargados
+	profesor_cargado: Dict[tuple, int] = {}    # (división, materia) -> profesor ya cargado
+	for _, division_id, dia, espacio, materia_id, profesor_id in conn.execute(SQL_CLASES_TURNO, (turno_id,)):
+		slot = indice_slot.get((dia, espacio))
+		i = indice_division.get(division_id)
+		if slot is None or i is None:
+			continue
+		cargadas.setdefault((i, materia_id), []).append(slot)
+		if profesor_id in indice_profesor:
+			profesor_cargado[(i, materia_id)] = indice_profesor[profesor_id]
+
+	cursos = []
+	previas = []
+	for i, (division_id, plan_id, ciclo_id) in enumerate(filas_division):
+		for materia_id in obtener_obligaciones_division(conn, plan_id, ciclo_id):
+			ya = cargadas.get((i, materia_id), [])
+			horas = int(horas_por_materia.get(materia_id, 0)) - len(ya)
+			if horas <= 0:
+				continue
+			fijo = profesor_cargado.get((i, materia_id), -1)
+			candidatos = (fijo,) if fijo >= 0 else tuple(habilitados.get(materia_id, ()))
+			cursos.append((i, materia_id, horas, candidatos, fijo))
+			por_dia_previas = [0] * len(dias)
+			for slot in ya:
+				por_dia_previas[slot // por_dia] += 1
+			previas.append(por_dia_previas)
+	return ProblemaHorario(turno_id, dias, espacios, divisiones, profesores, cursos,
+						   ocupado_division, ocupado_profesor, previas)
+
+
+class GeneradorHorario:
+	"""Completa un ProblemaHorario sin conflictos de división ni de profesor.
+
+	Primero construye una solución con propagación de restricciones: ubica antes las
+	obligaciones con menos margen (pocos profesores habilitados o pocos slots libres en
+	común) y recalcula ese margen después de cada decisión. Luego mejora la solución
+	con búsqueda local (recocido simulado) hasta agotar el tiempo: mueve horas a otros
+	slots libres, intercambia horas dentro de una división, cambia el profesor de una
+	obligación y, para las horas sin ubicar, desplaza la clase que ocupa su lugar.
+
+	Las restricciones duras (una clase por slot en cada división y cada profesor,
+	profesores del turno y habilitados para la materia, un único profesor por
+	obligación y división) nunca se violan: lo que no cabe queda sin ubicar.
+	"""
+
+	def __init__(self, problema: ProblemaHorario, semilla: Optional[int] = None):
+		self.p = problema
+		self.azar = random.Random(semilla)
+		cursos = problema.cursos
+		# Lecciones: una por hora a ubicar; slot -1 = sin ubicar
+		self.curso_de = [c for c, curso in enumerate(cursos) for _ in range(curso[2])]
+		self.slot_de = [-1] * len(self.curso_de)
+		self.lecciones_de_curso = [[] for _ in cursos]
+		for l, c in enumerate(self.curso_de):
+			self.lecciones_de_curso[c].append(l)
+		self.profesor_de = [curso[4] if curso[4] >= 0 else (curso[3][0] if curso[3] else -1) for curso in cursos]
+		self.mascara_division = list(problema.ocupado_division)
+		self.mascara_profesor = list(problema.ocupado_profesor)
+		# Quién ocupa cada slot (sólo lecciones nuevas; lo cargado no se mueve)
+		self.leccion_division: List[Dict[int, int]] = [{} for _ in problema.divisiones]
+		self.leccion_profesor: List[Dict[int, int]] = [{} for _ in problema.profesores]
+		self.en_dia = [list(previas) for previas in problema.previas]
+		self.mascara_curso = [0] * len(cursos)
+		total_dias = len(problema.dias)
+		self.maximo_dia = [max(2, -(-(curso[2] + sum(problema.previas[c])) // total_dias))
+						   for c, curso in enumerate(cursos)]
+		self.carga = [_contar_bits(m) for m in problema.ocupado_profesor]
+		# Las horas sin ningún profesor habilitado no se pueden ubicar: fijan el costo mínimo
+		self.movibles = [l for l, c in enumerate(self.curso_de) if cursos[c][3]]
+		self.costo_minimo = PESO_SIN_UBICAR * (len(self.curso_de) - len(self.movibles))
+
+	# --- Estado ---
+
+	def _poner(self, l: int, slot: int):
+		c = self.curso_de[l]
+		i, j = self.p.cursos[c][0], self.profesor_de[c]
+		bit = 1 << slot
+		self.slot_de[l] = slot
+		self.mascara_division[i] |= bit
+		self.mascara_profesor[j] |= bit
+		self.leccion_division[i][slot] = l
+		self.leccion_profesor[j][slot] = l
+		self.en_dia[c][slot // self.p.por_dia] += 1
+		self.mascara_curso[c] |= bit
+		self.carga[j] += 1
+
+	def _quitar(self, l: int):
+		slot = self.slot_de[l]
+		c = self.curso_de[l]
+		i, j = self.p.cursos[c][0], self.profesor_de[c]
+		bit = 1 << slot
+		self.slot_de[l] = -1
+		self.mascara_division[i] &= ~bit
+		self.mascara_profesor[j] &= ~bit
+		del self.leccion_division[i][slot]
+		del self.leccion_profesor[j][slot]
+		self.en_dia[c][slot // self.p.por_dia] -= 1
+		self.mascara_curso[c] &= ~bit
+		self.carga[j] -= 1
+
+	def _libres(self, c: int, j: Optional[int] = None) -> int:
+		"""Slots donde la división del curso y el profesor `j` están libres."""
+		j = self.profesor_de[c] if j is None else j
+		if j < 0:
+			return 0
+		return self.p.completo & ~(self.mascara_division[self.p.cursos[c][0]] | self.mascara_profesor[j])
+
+	# --- Costo ---
+
+	def _costo_division_dia(self, i: int, d: int) -> int:
+		return PESO_HUECO_DIVISION * _huecos_en(self.mascara_division[i] & self.p.mascara_dia[d])
+
+	def _costo_profesor_dia(self, j: int, d: int) -> int:
+		return PESO_HUECO_PROFESOR * _huecos_en(self.mascara_profesor[j] & self.p.mascara_dia[d])
+
+	def _costo_curso_dia(self, c: int, d: int) -> int:
+		movidas = _contar_bits(self.mascara_curso[c] & self.p.mascara_dia[d] & ~self.p.preferidos[c])
+		return PESO_REPETICION_DIA * max(0, self.en_dia[c][d] - self.maximo_dia[c]) + PESO_MOVIDA * movidas
+
+	def _costo_zona(self, divisiones_dias, profesores_dias, cursos_dias) -> int:
+		return (sum(self._costo_division_dia(i, d) for i, d in divisiones_dias)
+				+ sum(self._costo_profesor_dia(j, d) for j, d in profesores_dias)
+				+ sum(self._costo_curso_dia(c, d) for c, d in cursos_dias))
+
+	def _zona(self, lecciones_slots) -> tuple:
+		"""Conjuntos (división, día), (profesor, día), (curso, día) afectados por mover lecciones."""
+		por_dia = self.p.por_dia
+		divisiones_dias, profesores_dias, cursos_dias = set(), set(), set()
+		for l, slots in lecciones_slots:
+			c = self.curso_de[l]
+			for slot in slots:
+				if slot < 0:
+					continue
+				d = slot // por_dia
+				divisiones_dias.add((self.p.cursos[c][0], d))
+				profesores_dias.add((self.profesor_de[c], d))
+				cursos_dias.add((c, d))
+		return divisiones_dias, profesores_dias, cursos_dias
+
+	def costo(self) -> int:
+		"""Costo total de la solución actual (ver los pesos PESO_*)."""
+		p = self.p
+		total = PESO_SIN_UBICAR * self.slot_de.count(-1)
+		for d in range(len(p.dias)):
+			total += sum(self._costo_division_dia(i, d) for i in range(len(p.divisiones)))
+			total += sum(self._costo_profesor_dia(j, d) for j in range(len(p.profesores)))
+			total += sum(self._costo_curso_dia(c, d) for c in range(len(p.cursos)))
+		return total
+
+	# --- Construcción con propagación ---
+
+	def _elegir_slot(self, c: int, libres: int) -> int:
+		"""Slot libre preferido que menos repite la obligación en el día y menos huecos deja."""
+		i = self.p.cursos[c][0]
+		por_dia = self.p.por_dia
+		mejor, mejor_puntaje = -1, None
+		libres = libres & self.p.preferidos[c] or libres
+		for slot in _bits(libres):
+			d = slot // por_dia
+			dia_division = self.mascara_division[i] & self.p.mascara_dia[d]
+			puntaje = (self.en_dia[c][d] * 20
+					   + _huecos_en(dia_division | (1 << slot)) * 5
+					   + (0 if dia_division else 2)
+					   + self.azar.random())
+			if mejor_puntaje is None or puntaje < mejor_puntaje:
+				mejor, mejor_puntaje = slot, puntaje
+		return mejor
+
+	def construir(self):
+		"""Solución inicial: obligaciones de menor margen primero."""
+		pendientes = set(range(len(self.p.cursos)))
+		while pendientes:
+			# Margen = slots en común con el mejor profesor menos horas a ubicar; entre los
+			# profesores se prefiere el que está libre en más slots preferidos del curso
+			elegido, elegido_margen, elegido_profesor = None, None, -1
+			for c in pendientes:
+				curso = self.p.cursos[c]
+				mejor_j, mejor_clave, mejor_libres = -1, None, -1
+				for j in curso[3]:
+					libres = self._libres(c, j)
+					clave = (_contar_bits(libres & self.p.preferidos[c]), _contar_bits(libres), -self.carga[j])
+					if mejor_clave is None or clave > mejor_clave:
+						mejor_j, mejor_clave, mejor_libres = j, clave, clave[1]
+				margen = mejor_libres - curso[2]
+				if elegido_margen is None or margen < elegido_margen:
+					elegido, elegido_margen, elegido_profesor = c, margen, mejor_j
+			pendientes.discard(elegido)
+			if elegido_profesor < 0:
+				continue  # Ningún profesor habilitado: sus horas quedan sin ubicar
+			self.profesor_de[elegido] = elegido_profesor
+			for l in self.lecciones_de_curso[elegido]:
+				libres = self._libres(elegido)
+				if not libres:
+					break
+				self._poner(l, self._elegir_slot(elegido, libres))
+
+	# --- Búsqueda local ---
+
+	def _mover(self, l: int) -> Optional[Tuple[int, Callable[[], None]]]:
+		"""Mueve una lección ubicada a otro slot libre. Devuelve (delta, deshacer) o None."""
+		c = self.curso_de[l]
+		libres = self._libres(c)
+		if not libres:
+			return None
+		destino = self.azar.choice(_bits(libres))
+		origen = self.slot_de[l]
+		zona = self._zona([(l, (origen, destino))])
+		antes = self._costo_zona(*zona)
+		self._quitar(l)
+		self._poner(l, destino)
+		return self._costo_zona(*zona) - antes, lambda: (self._quitar(l), self._poner(l, origen))
+
+	def _intercambiar(self, l: int) -> Optional[Tuple[int, Callable[[], None]]]:
+		"""Intercambia los slots de dos lecciones de la misma división."""
+		c = self.curso_de[l]
+		i = self.p.cursos[c][0]
+		otras = self.leccion_division[i]
+		if len(otras) < 2:
+			return None
+		m = self.azar.choice(list(otras.values()))
+		if m == l or self.curso_de[m] == c:
+			return None
+		s1, s2 = self.slot_de[l], self.slot_de[m]
+		j1, j2 = self.profesor_de[c], self.profesor_de[self.curso_de[m]]
+		if j1 != j2 and (self.mascara_profesor[j1] >> s2 & 1 or self.mascara_profesor[j2] >> s1 & 1):
+			return None
+		zona = self._zona([(l, (s1, s2)), (m, (s1, s2))])
+		antes = self._costo_zona(*zona)
+		self._quitar(l)
+		self._quitar(m)
+		self._poner(l, s2)
+		self._poner(m, s1)
+
+		def deshacer():
+			self._quitar(l)
+			self._quitar(m)
+			self._poner(l, s1)
+			self._poner(m, s2)
+		return self._costo_zona(*zona) - antes, deshacer
+
+	def _cambiar_profesor(self, c: int) -> Optional[Tuple[int, Callable[[], None]]]:
+		"""Pasa todas las horas de una obligación a otro profesor habilitado libre en esos slots."""
+		curso = self.p.cursos[c]
+		if curso[4] >= 0 or len(curso[3]) < 2:
+			return None
+		anterior = self.profesor_de[c]
+		nuevo = self.azar.choice(curso[3])
+		if nuevo == anterior:
+			return None
+		ubicadas = [l for l in self.lecciones_de_curso[c] if self.slot_de[l] >= 0]
+		usados = 0
+		for l in ubicadas:
+			usados |= 1 << self.slot_de[l]
+		if self.mascara_profesor[nuevo] & usados:
+			return None
+		slots = [self.slot_de[l] for l in ubicadas]
+		dias = {s // self.p.por_dia for s in slots}
+		zona = (set(), {(anterior, d) for d in dias} | {(nuevo, d) for d in dias}, set())
+		antes = self._costo_zona(*zona)
+
+		def reasignar(j):
+			for l in ubicadas:
+				self._quitar(l)
+			self.profesor_de[c] = j
+			for l, s in zip(ubicadas, slots):
+				self._poner(l, s)
+		reasignar(nuevo)
+		return self._costo_zona(*zona) - antes, lambda: reasignar(anterior)
+
+	def _ubicar(self, l: int) -> Optional[Tuple[int, Callable[[], None]]]:
+		"""Ubica una lección pendiente; si no hay lugar, desplaza a quien ocupa el slot."""
+		c = self.curso_de[l]
+		j = self.profesor_de[c]
+		if j < 0:
+			return None
+		i = self.p.cursos[c][0]
+		libres = self._libres(c)
+		if libres:
+			destino = self.azar.choice(_bits(libres))
+			desplazadas = []
+		else:
+			# Slots sin clases fijas de la división ni del profesor: ahí sólo hay lecciones movibles
+			posibles = self.p.completo & ~(self.p.ocupado_division[i] | self.p.ocupado_profesor[j])
+			if not posibles:
+				return None
+			destino = self.azar.choice(_bits(posibles))
+			desplazadas = list({x for x in (self.leccion_division[i].get(destino),
+											 self.leccion_profesor[j].get(destino)) if x is not None})
+		zona = self._zona([(l, (destino,))] + [(x, (destino,)) for x in desplazadas])
+		antes = self._costo_zona(*zona) + PESO_SIN_UBICAR
+		for x in desplazadas:
+			self._quitar(x)
+		self._poner(l, destino)
+		despues = self._costo_zona(*zona) + PESO_SIN_UBICAR * len(desplazadas)
+
+		def deshacer():
+			self._quitar(l)
+			for x in desplazadas:
+				self._poner(x, destino)
+		return despues - antes, deshacer
+
+	def mejorar(self, tiempo_limite: float, temperatura_inicial: float = 5.0,
+				temperatura_final: float = 0.05) -> int:
+		"""Búsqueda local con recocido simulado; conserva la mejor solución vista."""
+		costo = self.costo()
+		mejor_costo, mejor = costo, self._copiar()
+		if not self.movibles:
+			return costo
+		inicio = time.perf_counter()
+		fin = inicio + tiempo_limite
+		temperatura = temperatura_inicial
+		iteracion = 0
+		while True:
+			iteracion += 1
+			if iteracion % 256 == 0:
+				ahora = time.perf_counter()
+				if ahora >= fin or mejor_costo <= self.costo_minimo:
+					break
+				avance = (ahora - inicio) / tiempo_limite
+				temperatura = temperatura_inicial * (temperatura_final / temperatura_inicial) ** avance
+			l = self.azar.choice(self.movibles)
+			if self.slot_de[l] < 0:
+				movimiento = self._ubicar(l)
+			else:
+				r = self.azar.random()
+				if r < 0.5:
+					movimiento = self._mover(l)
+				elif r < 0.9:
+					movimiento = self._intercambiar(l)
+				else:
+					movimiento = self._cambiar_profesor(self.curso_de[l])
+			if movimiento is None:
+				continue
+			delta, deshacer = movimiento
+			if delta <= 0 or self.azar.random() < math.exp(-delta / temperatura):
+				costo += delta
+				if costo < mejor_costo:
+					mejor_costo, mejor = costo, self._copiar()
+			else:
+				deshacer()
+		self._restaurar(mejor)
+		return mejor_costo
+
+	def _copiar(self) -> tuple:
+		return list(self.slot_de), list(self.profesor_de)
+
+	def _restaurar(self, estado: tuple):
+		slots, profesores = estado
+		for l, slot in enumerate(self.slot_de):
+			if slot >= 0:
+				self._quitar(l)
+		self.profesor_de = list(profesores)
+		for l, slot in enumerate(slots):
+			if slot >= 0:
+				self._poner(l, slot)
+
+	def resolver(self, tiempo_limite: float = GENERADOR_TIEMPO_LIMITE) -> dict:
+		"""Construye y mejora una solución. Ver `resultado()`."""
+		inicio = time.perf_counter()
+		self.construir()
+		self.mejorar(max(0.0, tiempo_limite - (time.perf_counter() - inicio)))
+		return self.resultado(time.perf_counter() - inicio)
+
+	def resultado(self, segundos: float = 0.0) -> dict:
+		"""Asignaciones nuevas y calidad de la solución actual.
+
+		Returns:
+			Dict con 'turno_id', 'asignaciones' [(division_id, dia, espacio, materia_id,
+			profesor_id)], 'costo', 'sin_ubicar', 'sin_profesor' (horas sin ningún profesor
+			habilitado en el turno), 'huecos_division', 'huecos_profesor',
+			'repeticiones', 'horas_pedidas', 'completitud' (porcentaje ubicado) y 'segundos'.
+		"""
+		p = self.p
+		asignaciones = []
+		for l, slot in enumerate(self.slot_de):
+			if slot < 0:
+				continue
+			c = self.curso_de[l]
+			dia, espacio = p.slot(slot)
+			asignaciones.append((p.divisiones[p.cursos[c][0]], dia, espacio,
+								 p.cursos[c][1], p.profesores[self.profesor_de[c]]))
+		dias = range(len(p.dias))
+		sin_ubicar = self.slot_de.count(-1)
+		pedidas = len(self.slot_de)
+		return {
+			'turno_id': p.turno_id,
+			'asignaciones': asignaciones,
+			'costo': self.costo(),
+			'sin_ubicar': sin_ubicar,
+			'sin_profesor': len(self.curso_de) - len(self.movibles),
+			'huecos_division': sum(_huecos_en(m & p.mascara_dia[d]) for m in self.mascara_division for d in dias),
+			'huecos_profesor': sum(_huecos_en(m & p.mascara_dia[d]) for m in self.mascara_profesor for d in dias),
+			'repeticiones': sum(max(0, self.en_dia[c][d] - self.maximo_dia[c]) for c in range(len(p.cursos)) for d in dias),
+			'horas_pedidas': pedidas,
+			'completitud': 100.0 if not pedidas else round(100.0 * (pedidas - sin_ubicar) / pedidas, 1),
+			'segundos': round(segundos, 2),
+		}
+
+
+def _resolver_arranque(problema: ProblemaHorario, semilla: int, tiempo_limite: float) -> dict:
+	return GeneradorHorario(problema, semilla).resolver(tiempo_limite)
+
+
+# Problema del proceso auxiliar, recibido una vez al crearlo (ver resolver_horario_en_paralelo)
+_problema_del_proceso: Optional[ProblemaHorario] = None
+
+
+def _iniciar_proceso_generador(problema: ProblemaHorario):
+	global _problema_del_proceso
+	_problema_del_proceso = problema
+
+
+def _resolver_arranque_en_proceso(semilla: int, tiempo_limite: float) -> dict:
+	# A nivel de módulo para poder ejecutarse en otro proceso
+	return _resolver_arranque(_problema_del_proceso, semilla, tiempo_limite)
+
+
+def resolver_horario_en_paralelo(problema: ProblemaHorario, tiempo_limite: float = GENERADOR_TIEMPO_LIMITE,
+								 arranques: Optional[int] = None, procesos: Optional[int] = None,
+								 semilla: Optional[int] = None) -> dict:
+	"""Corre varios arranques independientes del generador y devuelve el de menor costo.
+
+	Cada arranque usa otra semilla, así que explora otra solución inicial y otro camino
+	de búsqueda local. Los arranques se reparten en un ProcessPoolExecutor de
+	`procesos` procesos (GENERADOR_PROCESOS por defecto); si hay más arranques que
+	procesos, el tiempo límite se divide entre las rondas necesarias. El problema viaja
+	una vez por proceso y cada arranque sólo recibe su semilla. Si el pool falla (no
+	se pueden crear procesos, no se puede serializar el trabajo...) se resuelve con un
+	único arranque en el proceso actual.
+
+	El resultado es el de `GeneradorHorario.resultado()` con 'arranques' (cuántos se
+	compararon) y 'segundos' (tiempo total).
+	"""
+	inicio = time.perf_counter()
+	procesos = procesos or GENERADOR_PROCESOS
+	arranques = arranques or procesos
+	procesos = min(procesos, arranques)
+	azar = random.Random(semilla)
+	semillas = [azar.randrange(2 ** 32) for _ in range(arranques)]
+	tiempo = tiempo_limite / -(-arranques // procesos)
+	if procesos == 1:
+		resultados = [_resolver_arranque(problema, s, tiempo) for s in semillas]
+	else:
+		try:
+			with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso_generador,
+									 initargs=(problema,)) as ejecutor:
+				resultados = list(ejecutor.map(_resolver_arranque_en_proceso, semillas, itertools.repeat(tiempo)))
+		except Exception as e:
+			# OSError, BrokenProcessPool, PicklingError...; un error del propio generador
+			# vuelve a producirse en el arranque local
+			logger.warning('No se pudieron usar varios procesos para generar el horario: %s', e)
+			resultados = [_resolver_arranque(problema, semillas[0], tiempo_limite)]
+	mejor = min(resultados, key=lambda r: r['costo'])
+	mejor['arranques'] = len(resultados)
+	mejor['segundos'] = round(time.perf_counter() - inicio, 2)
+	return mejor
+
+
+def generar_horario_turno(turno_id: int, horas_por_materia: Dict[int, int],
+						  division_ids: Optional[List[int]] = None,
+						  tiempo_limite: float = GENERADOR_TIEMPO_LIMITE,
+						  semilla: Optional[int] = None, arranques: Optional[int] = None) -> dict:
+	"""Propone un horario completo para un turno sin escribir en la base.
+
+	Ver GeneradorHorario y resolver_horario_en_paralelo (`arranques` y `semilla`).
+	"""
+	problema = cargar_problema_horario(turno_id, horas_por_materia, division_ids)
+	return resolver_horario_en_paralelo(problema, tiempo_limite, arranques, semilla=semilla)
+
+
+def _escribir_slots(conn, turno_id: int, escrituras, mensaje: str):
+	"""Escribe (division_id, dia, espacio, esperado, nuevo) con `_upsert_horario`.
+
+	`esperado`/`nuevo` son pares (materia_id, profesor_id). Si un slot ya no tiene lo
+	esperado, lanza una excepción con `mensaje` (y la transacción se revierte).
+	Conserva las horas de inicio/fin ya cargadas en el slot o usa las del turno.
+	"""
+	horas_turno = {espacio: (inicio, fin) for espacio, inicio, fin in conn.execute(
+		'SELECT espacio, hora_inicio, hora_fin FROM turno_espacio_hora WHERE turno_id=?', (turno_id,))}
+	for division_id, dia, espacio, esperado, nuevo in escrituras:
+		fila = conn.execute('SELECT hora_inicio, hora_fin, materia_id, profesor_id FROM horario '
+							'WHERE division_id=? AND dia=? AND espacio=?', (division_id, dia, espacio)).fetchone()
+		actual = (fila[2], fila[3]) if fila else (None, None)
+		if actual != tuple(esperado):
+			raise Exception(mensaje.format(dia=dia, espacio=espacio))
+		hora_inicio, hora_fin = (fila[0], fila[1]) if fila and (fila[0] or fila[1]) else horas_turno.get(espacio, (None, None))
+		_upsert_horario(conn, division_id, dia, espacio, hora_inicio, hora_fin, nuevo[0], nuevo[1], turno_id)
+
+
+def aplicar_solucion_horario(solucion: dict) -> int:
+	"""Guarda las asignaciones de una solución en una sola transacción.
+
+	Cada slot pasa por `_upsert_horario`, que vuelve a validar los conflictos y ajusta
+	los contadores de horas; si algo cambió desde que se generó la solución, no se
+	guarda nada. Devuelve la cantidad de slots escritos.
+	"""
+	escrituras = [(division_id, dia, espacio, (None, None), (materia_id, profesor_id))
+				  for division_id, dia, espacio, materia_id, profesor_id in solucion['asignaciones']]
+	with transaccion() as conn:
+		_escribir_slots(conn, solucion['turno_id'], escrituras,
+						'El slot {dia} {espacio}ª hora de una división ya fue ocupado; genere el horario nuevamente.')
+	return len(escrituras)
+
+
+def obtener_horarios_a_reparar(turno_id: int, profesores_salientes=()) -> List[tuple]:
+	"""Clases de un turno cuyo profesor ya no puede dictarlas.
+
+	Son las de los `profesores_salientes` (por ejemplo, uno que se va a eliminar) y las
+	de profesores que no tienen el turno o no tienen la materia asignada.
+	Devuelve filas (horario_id, division_id, dia, espacio, materia_id, profesor_id).
+	"""
+	conn = get_connection_lectura()
+	salientes = set(profesores_salientes)
+	del_turno = {r[0] for r in conn.execute('SELECT profesor_id FROM profesor_turno WHERE turno_id=?', (turno_id,))}
+	habilitados = set(conn.execute('SELECT profesor_id, materia_id FROM profesor_materia'))
+	filas = conn.execute(SQL_CLASES_CON_PROFESOR_TURNO, (turno_id,)).fetchall()
+	return [f for f in filas
+			if f[5] in salientes or f[5] not in del_turno
+			or (f[4] is not None and (f[5], f[4]) not in habilitados)]
+
+
+def cargar_problema_reparacion(turno_id: int, profesores_salientes=()) -> tuple:
+	"""Arma el problema de reparar un turno partiendo del horario actual.
+
+	Sólo se liberan las clases de `obtener_horarios_a_reparar()`; todas las demás quedan
+	fijas. Cada (división, materia) liberada es un curso con tantas horas como slots
+	perdió, que prefiere volver a esos mismos slots; los profesores salientes no son
+	candidatos. Devuelve (problema, liberadas).
+	"""
+	liberadas = obtener_horarios_a_reparar(turno_id, profesores_salientes)
+	ids_liberados = {f[0] for f in liberadas}
+	conn = get_connection_lectura()
+	dias = list(HORARIO_DIAS_BASE)
+	espacios = _espacios_de_turno(conn, turno_id)
+	por_dia = len(espacios)
+	indice_slot = {(dia, espacio): d * por_dia + e
+				   for d, dia in enumerate(dias) for e, espacio in enumerate(espacios)}
+	salientes = set(profesores_salientes)
+	divisiones = [r[0] for r in conn.execute('SELECT id FROM division WHERE turno_id=? ORDER BY id', (turno_id,))]
+	indice_division = {division_id: i for i, division_id in enumerate(divisiones)}
+	profesores = [r[0] for r in conn.execute(
+		'SELECT profesor_id FROM profesor_turno WHERE turno_id=? ORDER BY profesor_id', (turno_id,)) if r[0] not in salientes]
+	indice_profesor = {profesor_id: j for j, profesor_id in enumerate(profesores)}
+	habilitados: Dict[int, List[int]] = {}
+	for profesor_id, materia_id in conn.execute('SELECT profesor_id, materia_id FROM profesor_materia ORDER BY profesor_id'):
+		if profesor_id in indice_profesor:
+			habilitados.setdefault(materia_id, []).append(indice_profesor[profesor_id])
+
+	# Ocupación actual menos las clases liberadas
+	ocupados_profesor, ocupados_division = _ocupacion_de_turno(turno_id, espacios)
+	ocupado_division = [ocupados_division.get(division_id, 0) for division_id in divisiones]
+	ocupado_profesor = [ocupados_profesor.get(profesor_id, 0) for profesor_id in profesores]
+	for _, division_id, dia, espacio, _, profesor_id in liberadas:
+		slot = indice_slot.get((dia, espacio))
+		if slot is None:
+			continue
+		ocupado_division[indice_division[division_id]] &= ~(1 << slot)
+		if profesor_id in indice_profesor:
+			ocupado_profesor[indice_profesor[profesor_id]] &= ~(1 << slot)
+	profesor_fijo: Dict[tuple, int] = {}
+	previas_por_curso: Dict[tuple, List[int]] = {}
+	for horario_id, division_id, dia, espacio, materia_id, profesor_id in conn.execute(SQL_CLASES_TURNO, (turno_id,)):
+		slot = indice_slot.get((dia, espacio))
+		if slot is None or horario_id in ids_liberados:
+			continue
+		i = indice_division[division_id]
+		if profesor_id in indice_profesor:
+			profesor_fijo[(i, materia_id)] = indice_profesor[profesor_id]
+		previas_por_curso.setdefault((i, materia_id), [0] * len(dias))[slot // por_dia] += 1
+
+	slots_por_curso: Dict[tuple, List[int]] = {}
+	for _, division_id, dia, espacio, materia_id, _ in liberadas:
+		slot = indice_slot.get((dia, espacio))
+		if materia_id is not None and slot is not None:
+			slots_por_curso.setdefault((indice_division[division_id], materia_id), []).append(slot)
+	cursos, previas, preferidos = [], [], []
+	for (i, materia_id), slots in slots_por_curso.items():
+		fijo = profesor_fijo.get((i, materia_id), -1)
+		candidatos = (fijo,) if fijo >= 0 else tuple(habilitados.get(materia_id, ()))
+		cursos.append((i, materia_id, len(slots), candidatos, fijo))
+		previas.append(previas_por_curso.get((i, materia_id), [0] * len(dias)))
+		preferidos.append(sum(1 << slot for slot in slots))
+	problema = ProblemaHorario(turno_id, dias, espacios, divisiones, profesores, cursos,
+							   ocupado_division, ocupado_profesor, previas, preferidos)
+	return problema, liberadas
+
+
+def proponer_reparacion_horario(turno_id: int, profesores_salientes=(),
+								tiempo_limite: float = GENERADOR_TIEMPO_REPARACION,
+								semilla: Optional[int] = None) -> dict:
+	"""Reubica las clases que quedaron inválidas en un turno sin tocar el resto.
+
+	Parte del horario actual: libera sólo las clases de `obtener_horarios_a_reparar()`
+	y vuelve a resolver esas horas con GeneradorHorario, que prefiere dejarlas en sus
+	mismos slots con otro profesor habilitado. No escribe en la base.
+
+	Returns:
+		Dict con 'turno_id', 'cambios' [{'division_id', 'dia', 'espacio', 'antes',
+		'despues'}] (pares materia_id/profesor_id; sólo los slots que cambian),
+		'liberadas', 'reasignadas', 'movidas' (reasignadas en otro slot),
+		'sin_ubicar' y 'segundos'.
+	"""
+	inicio = time.perf_counter()
+	problema, liberadas = cargar_problema_reparacion(turno_id, profesores_salientes)
+	generador = GeneradorHorario(problema, semilla)
+	generador.construir()
+	generador.mejorar(tiempo_limite)
+	antes = {(f[1], f[2], f[3]): (f[4], f[5]) for f in liberadas}
+	despues = {clave: (None, None) for clave in antes}
+	movidas = 0
+	for l, slot in enumerate(generador.slot_de):
+		if slot < 0:
+			continue
+		c = generador.curso_de[l]
+		dia, espacio = problema.slot(slot)
+		clave = (problema.divisiones[problema.cursos[c][0]], dia, espacio)
+		despues[clave] = (problema.cursos[c][1], problema.profesores[generador.profesor_de[c]])
+		if not problema.preferidos[c] >> slot & 1:
+			movidas += 1
+	cambios = [{'division_id': clave[0], 'dia': clave[1], 'espacio': clave[2],
+				'antes': antes.get(clave, (None, None)), 'despues': nuevo}
+			   for clave, nuevo in despues.items() if antes.get(clave, (None, None)) != nuevo]
+	reasignadas = len(generador.slot_de) - generador.slot_de.count(-1)
+	return {
+		'turno_id': turno_id,
+		'cambios': cambios,
+		'liberadas': len(liberadas),
+		'reasignadas': reasignadas,
+		'movidas': movidas,
+		'sin_ubicar': len(generador.slot_de) - reasignadas,
+		'segundos': round(time.perf_counter() - inicio, 2),
+	}
+
+
+def describir_reparacion_horario(reparacion: dict) -> List[Dict[str, Any]]:
+	"""Cambios de una reparación con nombres de división, materia y profesor, para revisarlos."""
+	conn = get_connection_lectura()
+	divisiones = dict(conn.execute('SELECT id, nombre FROM division'))
+	materias = dict(conn.execute('SELECT id, nombre FROM materia'))
+	profesores = dict(conn.execute('SELECT id, nombre FROM profesor'))
+
+	def texto(par):
+		materia_id, profesor_id = par
+		if materia_id is None and profesor_id is None:
+			return '(libre)'
+		return f"{materias.get(materia_id, '')} – {profesores.get(profesor_id, '')}".strip(' –')
+	return [{'division': divisiones.get(c['division_id'], ''), 'dia': c['dia'], 'espacio': c['espacio'],
+			 'antes': texto(c['antes']), 'despues': texto(c['despues'])}
+			for c in reparacion['cambios']]
+
+
+def aplicar_reparacion_horario(reparacion: dict) -> int:
+	"""Aplica los cambios de una reparación en una sola transacción.
+
+	Primero vacía los slots que cambian y después escribe los nuevos, siempre con
+	`_upsert_horario`; si algún slot cambió desde la propuesta no se guarda nada.
+	Devuelve la cantidad de slots modificados.
+	"""
+	cambios = reparacion['cambios']
+	vaciar = [(c['division_id'], c['dia'], c['espacio'], c['antes'], (None, None))
+			  for c in cambios if c['antes'] != (None, None)]
+	ocupar = [(c['division_id'], c['dia'], c['espacio'], (None, None), c['despues'])
+			  for c in cambios if c['despues'] != (None, None)]
+	mensaje = 'El horario del {dia} {espacio}ª hora cambió desde la propuesta; genere la reparación nuevamente.'
+	with transaccion() as conn:
+		_escribir_slots(conn, reparacion['turno_id'], vaciar, mensaje)
+		_escribir_slots(conn, reparacion['turno_id'], ocupar, mensaje)
+	return len(cambios)
+
+
+def aplicar_reparaciones_horario(reparaciones: List[dict]) -> int:
+	"""Aplica las reparaciones de varios turnos en una única transacción (todas o ninguna)."""
+	with transaccion():
+		return sum(aplicar_reparacion_horario(reparacion) for reparacion in reparaciones)
+
+
 # ============== FUNCIONES DE BACKUP ==============
 
-def crear_backup_db(manual=False) -> str:
+# Páginas copiadas por paso de la API de backup; entre pasos otras conexiones pueden escribir
+BACKUP_PAGINAS_POR_PASO = 256
+
+
+def verificar_backup(ruta: str):
+	"""Comprueba con `PRAGMA quick_check` que el archivo sea una base íntegra."""
+	conn = sqlite3.connect(ruta)
+	try:
+		resultado = [r[0] for r in conn.execute('PRAGMA quick_check')]
+	finally:
+		conn.close()
+	if resultado != ['ok']:
+		raise Exception('El backup no superó la verificación de integridad: ' + '; '.join(resultado[:5]))
+
+
+def copiar_base_en_linea(destino: str, progreso=None, paginas: int = BACKUP_PAGINAS_POR_PASO) -> str:
+	"""Copia la base a `destino` con la API de backup de SQLite.
+
+	La copia avanza de a `paginas` páginas, por lo que la aplicación puede seguir
+	usándose mientras tanto; si otra conexión escribe, SQLite retoma la copia para
+	que el resultado sea consistente. `progreso(copiadas, total)` se invoca tras
+	cada paso. El archivo se escribe aparte, se verifica con quick_check y sólo
+	entonces reemplaza a `destino`.
 	"""
-	Crea una copia de seguridad de la base de datos.
+	temporal = destino + '.tmp'
+	if os.path.exists(temporal):
+		os.remove(temporal)
+
+	def avance(_estado, restantes, total):
+		if progreso:
+			progreso(total - restantes, total)
+
+	origen = _gestor_conexiones.conexion_lectura()
+	copia = sqlite3.connect(temporal)
+	try:
+		origen.backup(copia, pages=paginas, progress=avance)
+		# La copia hereda el modo WAL del origen: dejarla autocontenida en un solo archivo
+		copia.execute('PRAGMA journal_mode = DELETE')
+		copia.close()
+		verificar_backup(temporal)
+		os.replace(temporal, destino)
+	except BaseException:
+		copia.close()
+		if os.path.exists(temporal):
+			os.remove(temporal)
+		raise
+	return destino
+
+
+# Almacén de backups comprimidos: carpeta 'backups' junto a la base
+DIR_BACKUPS = os.path.join(DB_DIR, 'backups')
+try:
+	BACKUP_NIVEL_COMPRESION = min(9, max(1, int(os.environ.get('SISTEMA_ESCOLAR_NIVEL_BACKUP', '6'))))
+except ValueError:
+	BACKUP_NIVEL_COMPRESION = 6
+# Cuántos backups conservar: los N más recientes y, además, el último de cada una
+# de las últimas N horas, días y semanas
+RETENCION_BACKUPS = {'recientes': 10, 'hora': 24, 'dia': 7, 'semana': 8}
+
+
+def _hash_archivo(ruta: str) -> str:
+	sha = hashlib.sha256()
+	with open(ruta, 'rb') as f:
+		for bloque in iter(lambda: f.read(1 << 20), b''):
+			sha.update(bloque)
+	return sha.hexdigest()
+
+
+class AlmacenBackups:
+	"""Backups comprimidos con gzip, sin duplicados y con política de retención.
+
+	Cada backup es un archivo `institucion_<fecha>_<hash>.db.gz`. Un manifiesto JSON
+	guarda fecha, tipo, tamaños y hash SHA-256 del contenido sin comprimir, de modo
+	que listar no requiere recorrer los archivos. Si el manifiesto falta o está
+	dañado se reconstruye a partir de los nombres de archivo.
+	"""
+
+	MANIFIESTO = 'manifiesto.json'
+
+	def __init__(self, directorio: str, nivel: int = BACKUP_NIVEL_COMPRESION,
+				 retencion: Optional[Dict[str, int]] = None):
+		self.directorio = directorio
+		self.nivel = nivel
+		self.retencion = RETENCION_BACKUPS if retencion is None else retencion
+		self._lock = threading.Lock()
+
+	def _ruta(self, archivo: str) -> str:
+		return os.path.join(self.directorio, archivo)
+
+	def _leer_manifiesto(self) -> List[dict]:
+		try:
+			with open(self._ruta(self.MANIFIESTO), encoding='utf-8') as f:
+				return json.load(f)['backups']
+		except FileNotFoundError:
+			return self._reconstruir_manifiesto()
+		except (ValueError, KeyError, TypeError):
+			logger.warning('Manifiesto de backups dañado; se reconstruye')
+			return self._reconstruir_manifiesto()
+
+	def _reconstruir_manifiesto(self) -> List[dict]:
+		entradas = []
+		if not os.path.isdir(self.directorio):
+			return entradas
+		for archivo in os.listdir(self.directorio):
+			partes = archivo[:-len('.db.gz')].split('_') if archivo.endswith('.db.gz') else []
+			if len(partes) != 4 or partes[0] != 'institucion':
+				continue
+			try:
+				fecha = datetime.strptime(partes[1] + partes[2], '%Y%m%d%H%M%S')
+			except ValueError:
+				continue
+			entradas.append({
+				'archivo': archivo,
+				'fecha': fecha.strftime('%Y-%m-%d %H:%M:%S'),
+				'tipo': 'manual',
+				'sha256': partes[3],
+				'tamaño': os.path.getsize(self._ruta(archivo)),
+				'tamaño_original': None,
+				'cambio': None,
+			})
+		entradas.sort(key=lambda e: e['fecha'])
+		self._guardar_manifiesto(entradas)
+		return entradas
+
+	def _guardar_manifiesto(self, entradas: List[dict]):
+		os.makedirs(self.directorio, exist_ok=True)
+		temporal = self._ruta(self.MANIFIESTO + '.tmp')
+		with open(temporal, 'w', encoding='utf-8') as f:
+			json.dump({'version': 1, 'backups': entradas}, f, ensure_ascii=False, indent=1)
+		os.replace(temporal, self._ruta(self.MANIFIESTO))
+
+	def listar(self) -> List[dict]:
+		"""Backups del manifiesto, del más antiguo al más reciente."""
+		with self._lock:
+			return [dict(e) for e in self._leer_manifiesto()]
+
+	def guardar(self, origen: str, tipo: str = 'manual') -> dict:
+		"""Incorpora la base `origen` (una copia ya verificada) al almacén.
+
+		Si su contenido coincide con el del último backup no se escribe nada y se
+		devuelve esa entrada con 'duplicado': True. Luego aplica la retención.
+		"""
+		sha = _hash_archivo(origen)
+		with self._lock:
+			entradas = self._leer_manifiesto()
+			if entradas and entradas[-1]['sha256'] == sha:
+				return dict(entradas[-1], duplicado=True)
+			ahora = datetime.now()
+			archivo = f"institucion_{ahora.strftime('%Y%m%d_%H%M%S')}_{sha[:12]}.db.gz"
+			destino = self._ruta(archivo)
+			os.makedirs(self.directorio, exist_ok=True)
+			with open(origen, 'rb') as f, gzip.open(destino + '.tmp', 'wb', compresslevel=self.nivel) as gz:
+				shutil.copyfileobj(f, gz, 1 << 20)
+			os.replace(destino + '.tmp', destino)
+			entrada = {
+				'archivo': archivo,
+				'fecha': ahora.strftime('%Y-%m-%d %H:%M:%S'),
+				'tipo': tipo,
+				'sha256': sha,
+				'tamaño': os.path.getsize(destino),
+				'tamaño_original': os.path.getsize(origen),
+				'cambio': _ultimo_cambio_de(origen),
+			}
+			entradas.append(entrada)
+			self._aplicar_retencion(entradas)
+			return dict(entrada, duplicado=False)
+
+	def _aplicar_retencion(self, entradas: List[dict]):
+		"""Conserva los últimos backups y el más reciente de cada hora/día/semana."""
+		claves = {
+			'recientes': lambda e, f: e['archivo'],
+			'hora': lambda e, f: f.strftime('%Y%m%d%H'),
+			'dia': lambda e, f: f.strftime('%Y%m%d'),
+			'semana': lambda e, f: f.isocalendar()[:2],
+		}
+		conservar = {entradas[-1]['archivo']} if entradas else set()
+		for periodo, limite in self.retencion.items():
+			vistos = set()
+			for entrada in reversed(entradas):
+				clave = claves[periodo](entrada, datetime.strptime(entrada['fecha'], '%Y-%m-%d %H:%M:%S'))
+				if clave in vistos:
+					continue
+				if len(vistos) >= limite:
+					break
+				vistos.add(clave)
+				conservar.add(entrada['archivo'])
+		for entrada in [e for e in entradas if e['archivo'] not in conservar]:
+			self._borrar_archivo(entrada['archivo'])
+		entradas[:] = [e for e in entradas if e['archivo'] in conservar]
+		self._guardar_manifiesto(entradas)
+
+	def _borrar_archivo(self, archivo: str):
+		try:
+			os.remove(self._ruta(archivo))
+		except FileNotFoundError:
+			pass
+
+	def extraer(self, archivo: str, destino: str) -> str:
+		"""Descomprime un backup del almacén en `destino`."""
+		with gzip.open(self._ruta(archivo), 'rb') as gz, open(destino, 'wb') as f:
+			shutil.copyfileobj(gz, f, 1 << 20)
+		return destino
+
+	def eliminar(self, archivo: str) -> bool:
+		"""Quita un backup del almacén. Devuelve False si no estaba en el manifiesto."""
+		with self._lock:
+			entradas = self._leer_manifiesto()
+			restantes = [e for e in entradas if e['archivo'] != archivo]
+			if len(restantes) == len(entradas):
+				return False
+			self._borrar_archivo(archivo)
+			self._guardar_manifiesto(restantes)
+			return True
+
+
+_almacen_backups = AlmacenBackups(DIR_BACKUPS)
+
+
+def _ultimo_cambio_de(ruta: str) -> Optional[int]:
+	"""Última transacción del registro de cambios incluida en la base `ruta`."""
+	conn = sqlite3.connect(ruta)
+	try:
+		return conn.execute('SELECT ultimo FROM registro_cambios WHERE id = 1').fetchone()[0]
+	except (sqlite3.Error, TypeError):
+		return None
+	finally:
+		conn.close()
+
+
+def _a_json(valor):
+	if isinstance(valor, (bytes, bytearray, memoryview)):
+		return {'bytes': bytes(valor).hex()}
+	raise TypeError(f'Valor no serializable en el registro de cambios: {type(valor).__name__}')
+
+
+def _de_json(valor):
+	if isinstance(valor, dict) and list(valor) == ['bytes']:
+		return bytes.fromhex(valor['bytes'])
+	return valor
+
+
+class RegistroCambios:
+	"""Registro de escrituras entre backups completos (un JSON por línea).
+
+	Cada transacción confirmada agrega `{"n", "t", "v", "s"}`: número correlativo,
+	fecha, versión del esquema y sentencias con sus parámetros. El número sale de la
+	tabla registro_cambios, por lo que cada backup sabe qué transacciones contiene y
+	la reconstrucción sólo reaplica las posteriores. Si el COMMIT falla después de
+	anotar se agrega `{"anular": n}`; si el proceso termina antes del COMMIT, el
+	contador vuelve atrás y la próxima transacción repite el número.
+	"""
+
+	def __init__(self, ruta: str):
+		self.ruta = ruta
+		self._lock = threading.Lock()
+
+	def _agregar(self, registro: dict):
+		linea = json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=_a_json)
+		with self._lock:
+			os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+			with open(self.ruta, 'a', encoding='utf-8') as f:
+				f.write(linea + '\n')
+				f.flush()
+
+	def anotar(self, conn, sentencias: list) -> int:
+		"""Numera la transacción en curso de `conn` y la agrega al registro."""
+		conn.execute('UPDATE registro_cambios SET ultimo = ultimo + 1 WHERE id = 1')
+		numero = conn.execute('SELECT ultimo FROM registro_cambios WHERE id = 1').fetchone()[0]
+		version = conn.execute('PRAGMA user_version').fetchone()[0]
+		self._agregar({'n': numero, 't': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+					   'v': version, 's': sentencias})
+		return numero
+
+	def marcar_restauracion(self, conn, origen: str) -> int:
+		"""Anota que la base se reemplazó por `origen` dentro de la transacción de `conn`.
+
+		La numeración sigue después de todo lo ya registrado, y la reconstrucción no
+		pasa de esta marca: lo anterior pertenece a la base que se descartó.
+		"""
+		# El contador se actualiza a mano: esta escritura no es una transacción del usuario
+		conn.registro = None
+		registrados = [r['n'] for r in self.leer()]
+		actual = conn.execute('SELECT ultimo FROM registro_cambios WHERE id = 1').fetchone()[0]
+		numero = max(registrados + [actual]) + 1
+		conn.execute('UPDATE registro_cambios SET ultimo = ? WHERE id = 1', (numero,))
+		version = conn.execute('PRAGMA user_version').fetchone()[0]
+		self._agregar({'n': numero, 't': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+					   'v': version, 's': [], 'restauracion': origen})
+		return numero
+
+	def anular(self, numero: int):
+		try:
+			self._agregar({'anular': numero})
+		except OSError as e:
+			logger.warning('No se pudo anular la transacción %d del registro: %s', numero, e)
+
+	def leer(self) -> List[dict]:
+		"""Transacciones vigentes en orden; ignora anuladas y una última línea truncada.
+
+		Un número repetido reemplaza a las líneas anteriores desde ese número: éstas
+		se anotaron antes de un COMMIT que nunca llegó.
+		"""
+		registros = []
+		try:
+			with open(self.ruta, encoding='utf-8') as f:
+				for linea in f:
+					try:
+						registro = json.loads(linea)
+					except ValueError:
+						break
+					if 'anular' in registro:
+						if registros and registros[-1]['n'] == registro['anular']:
+							registros.pop()
+					else:
+						while registros and registros[-1]['n'] >= registro['n']:
+							logger.warning('Transacción %d del registro sin confirmar: se descarta', registros.pop()['n'])
+						registros.append(registro)
+		except FileNotFoundError:
+			pass
+		return registros
+
+	def compactar(self, hasta: int):
+		"""Descarta las transacciones ya incluidas en todos los backups (n <= hasta).
+
+		Se llama con el bloqueo de escritura de la base tomado, para que ninguna
+		instancia agregue líneas mientras se reescribe el archivo.
+		"""
+		with self._lock:
+			if not os.path.exists(self.ruta):
+				return
+			temporal = self.ruta + '.tmp'
+			with open(self.ruta, encoding='utf-8') as f, open(temporal, 'w', encoding='utf-8') as salida:
+				for linea in f:
+					try:
+						registro = json.loads(linea)
+					except ValueError:
+						break
+					if registro.get('n', registro.get('anular', 0)) > hasta:
+						salida.write(linea)
+			os.replace(temporal, self.ruta)
+
+
+_registro_cambios = RegistroCambios(os.path.join(DIR_BACKUPS, 'cambios.log'))
+
+
+def compactar_registro_cambios():
+	"""Recorta el registro hasta el backup más antiguo que se conserva."""
+	# Los backups previos al registro no tienen número y no sirven de base para reaplicarlo
+	cambios = [e['cambio'] for e in _almacen_backups.listar() if e.get('cambio') is not None]
+	if not cambios:
+		return
+	with transaccion():
+		_registro_cambios.compactar(min(cambios))
+
+
+def reconstruir_base(destino: str, hasta: Optional[str] = None) -> dict:
+	"""Reconstruye la base en `destino` a partir del último backup y el registro de cambios.
+
+	Args:
+		destino: Archivo donde se escribe la base reconstruida (no la base en uso).
+		hasta: Fecha 'AAAA-MM-DD HH:MM:SS' para restaurar a ese momento; None para
+			llegar a la última transacción registrada.
+
+	Returns:
+		Dict con 'backup' (archivo de partida), 'aplicadas', 'ultimo' (número de la
+		última transacción aplicada), 'fecha' y 'aviso' (motivo si la reaplicación se
+		detuvo antes de tiempo, o None).
+	"""
+	candidatos = [e for e in _almacen_backups.listar() if e.get('cambio') is not None
+				  and (hasta is None or e['fecha'] <= hasta)]
+	if not candidatos:
+		raise Exception('No hay un backup del almacén anterior a esa fecha con registro de cambios.')
+	base = candidatos[-1]
+	temporal = destino + '.tmp'
+	_almacen_backups.extraer(base['archivo'], temporal)
+	resultado = {'backup': base['archivo'], 'aplicadas': 0, 'ultimo': base['cambio'],
+				 'fecha': base['fecha'], 'aviso': None}
+	conn = sqlite3.connect(temporal, isolation_level=None)
+	try:
+		conn.execute('PRAGMA journal_mode = DELETE')
+		conn.execute('PRAGMA foreign_keys = ON')
+		version = conn.execute('PRAGMA user_version').fetchone()[0]
+		for registro in _registro_cambios.leer():
+			if registro['n'] <= resultado['ultimo']:
+				continue
+			if hasta is not None and registro['t'] > hasta:
+				break
+			if 'restauracion' in registro:
+				resultado['aviso'] = (f"La base se restauró desde {registro['restauracion']} el {registro['t']}; "
+									  'para llegar más allá use un backup posterior.')
+				break
+			if registro['n'] != resultado['ultimo'] + 1:
+				resultado['aviso'] = f"Faltan transacciones en el registro a partir de la {resultado['ultimo'] + 1}."
+				break
+			if registro['v'] != version:
+				resultado['aviso'] = (f"La transacción {registro['n']} es de otra versión del esquema; "
+									  'use un backup posterior a la actualización.')
+				break
+			conn.execute('BEGIN')
+			try:
+				for sentencia in registro['s']:
+					if len(sentencia) == 3:
+						conn.executemany(sentencia[0], [[_de_json(v) for v in p] if isinstance(p, list) else p
+														for p in sentencia[1]])
+					else:
+						parametros = sentencia[1]
+						if isinstance(parametros, list):
+							parametros = [_de_json(v) for v in parametros]
+						conn.execute(sentencia[0], parametros)
+				conn.execute('UPDATE registro_cambios SET ultimo = ? WHERE id = 1', (registro['n'],))
+				conn.execute('COMMIT')
+			except sqlite3.Error as e:
+				conn.execute('ROLLBACK')
+				resultado['aviso'] = f"La transacción {registro['n']} no pudo reaplicarse: {e}"
+				break
+			resultado['aplicadas'] += 1
+			resultado['ultimo'] = registro['n']
+			resultado['fecha'] = registro['t']
+		conn.close()
+		verificar_backup(temporal)
+		os.replace(temporal, destino)
+	except BaseException:
+		conn.close()
+		if os.path.exists(temporal):
+			os.remove(temporal)
+		raise
+	return resultado
+
+
+def crear_backup_db(manual=False, progreso=None) -> dict:
+	"""
+	Crea una copia de seguridad de la base de datos en el almacén de backups.
 	
 	Args:
-		manual: Si es True, crea un backup con timestamp detallado.
-				Si es False, crea/sobreescribe el backup automático.
+		manual: True para un backup pedido por el usuario, False para el automático.
+		progreso: Función opcional `progreso(copiadas, total)` con el avance en páginas.
 	
 	Returns:
-		Ruta del archivo de backup creado
+		Entrada del backup (ver listar_backups). Si la base no cambió desde el último
+		backup no se crea uno nuevo y la entrada trae 'duplicado': True.
 	"""
 	if not os.path.exists(DB_NAME):
 		raise Exception('La base de datos no existe.')
 	
-	if manual:
-		# Backup manual con timestamp completo
-		timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-		backup_name = f'institucion_backup_{timestamp}.bak'
-	else:
-		# Backup automático - siempre sobrescribe el mismo archivo
-		backup_name = 'institucion.bak'
-	
-	backup_path = os.path.join(DB_DIR, backup_name)
+	os.makedirs(DIR_BACKUPS, exist_ok=True)
+	copia = os.path.join(DIR_BACKUPS, f'copia_{os.getpid()}_{threading.get_ident()}.db')
 	
 	try:
-		shutil.copy2(DB_NAME, backup_path)
-		return backup_path
+		copiar_base_en_linea(copia, progreso)
+		entrada = _almacen_backups.guardar(copia, 'manual' if manual else 'automatico')
+	except Exception as e:
+		raise Exception(f'Error al crear backup: {str(e)}')
+	finally:
+		if os.path.exists(copia):
+			os.remove(copia)
+	try:
+		compactar_registro_cambios()
 	except Exception as e:
-		raise Exception(f'Error al crear backup: {str(e)}')
+		logger.warning('No se pudo compactar el registro de cambios: %s', e)
+	return _entrada_backup(entrada)
+
+def _entrada_backup(entrada: dict) -> dict:
+	return dict(entrada,
+				nombre=entrada['archivo'],
+				ruta=os.path.join(DIR_BACKUPS, entrada['archivo']))
 
 def listar_backups() -> list:
-	"""Lista todos los archivos de backup en el directorio de la base de datos"""
-	backups = []
+	"""Lista los backups del almacén (según su manifiesto) y los .bak de versiones anteriores"""
+	backups = [_entrada_backup(e) for e in _almacen_backups.listar()]
+	# Backups sueltos creados antes del almacén comprimido
 	if os.path.exists(DB_DIR):
 		for filename in os.listdir(DB_DIR):
 			if filename.endswith('.bak'):
@@ -1221,12 +3825,125 @@ def listar_backups() -> list:
 					'nombre': filename,
 					'ruta': filepath,
 					'tamaño': stat.st_size,
-					'fecha': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')
+					'fecha': datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S'),
+					'tipo': 'anterior',
 				})
 	# Ordenar por fecha, más reciente primero
 	backups.sort(key=lambda x: x['fecha'], reverse=True)
 	return backups
 
+def eliminar_backup(ruta: str):
+	"""Elimina un backup del almacén o un .bak suelto"""
+	if os.path.dirname(ruta) == DIR_BACKUPS and _almacen_backups.eliminar(os.path.basename(ruta)):
+		return
+	if not os.path.exists(ruta):
+		raise Exception('El archivo de backup no existe.')
+	os.remove(ruta)
+
+def validar_backup_para_restaurar(ruta: str) -> int:
+	"""Abre el backup en sólo lectura y comprueba integridad y versión de esquema.
+
+	Devuelve su `user_version`. Falla si el archivo está dañado, no es una base del
+	sistema o fue creado por una versión más nueva del programa.
+	"""
+	uri = 'file:' + urllib.request.pathname2url(os.path.abspath(ruta)) + '?mode=ro'
+	try:
+		conn = sqlite3.connect(uri, uri=True)
+	except sqlite3.Error as e:
+		raise Exception(f'No se pudo abrir el backup: {e}')
+	try:
+		resultado = [r[0] for r in conn.execute('PRAGMA quick_check')]
+		if resultado != ['ok']:
+			raise Exception('El backup está dañado: ' + '; '.join(resultado[:5]))
+		tablas = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+		version = conn.execute('PRAGMA user_version').fetchone()[0]
+	except sqlite3.Error as e:
+		raise Exception(f'El archivo no es una base de datos válida: {e}')
+	finally:
+		conn.close()
+	faltantes = {'usuarios', 'horario', 'materia', 'profesor'} - tablas
+	if faltantes:
+		raise Exception('El archivo no es una base del sistema (faltan tablas: ' + ', '.join(sorted(faltantes)) + ').')
+	if version > MIGRACIONES[-1][0]:
+		raise Exception('El backup fue creado por una versión más nueva del programa.')
+	return version
+
+def restaurar_backup(ruta: Optional[str] = None, hasta: Optional[str] = None, progreso=None) -> dict:
+	"""Reemplaza la base en uso por un backup sin reiniciar la aplicación.
+
+	Args:
+		ruta: Backup a restaurar (del almacén o un .bak suelto). Si es None se
+			reconstruye con el registro de cambios hasta la fecha `hasta`.
+		hasta: Fecha 'AAAA-MM-DD HH:MM:SS' para la restauración a un momento dado.
+		progreso: Función opcional `progreso(copiadas, total)` durante el reemplazo.
+
+	El backup se valida antes de tocar la base; luego se guarda un backup del estado
+	actual y el contenido se copia con la API de backup de SQLite hacia la base en
+	uso, en una única transacción: los demás lectores ven la base anterior o la
+	restaurada, nunca una mezcla. Al terminar se reabren las conexiones, se aplican
+	las migraciones que falten y se vacían las cachés.
+
+	Returns:
+		Dict con 'origen', 'previo' (backup del estado anterior o None) y 'aviso'.
+	"""
+	if _gestor_conexiones.en_transaccion:
+		raise Exception('No se puede restaurar con una transacción abierta.')
+	os.makedirs(DIR_BACKUPS, exist_ok=True)
+	temporal = os.path.join(DIR_BACKUPS, f'restaurar_{os.getpid()}_{threading.get_ident()}.db')
+	aviso = None
+	try:
+		if ruta is None:
+			reconstruida = reconstruir_base(temporal, hasta)
+			origen, aviso = f"{reconstruida['backup']} + registro hasta {reconstruida['fecha']}", reconstruida['aviso']
+			candidato = temporal
+		elif ruta.endswith('.gz'):
+			origen = os.path.basename(ruta)
+			candidato = _almacen_backups.extraer(origen, temporal)
+		else:
+			origen = os.path.basename(ruta)
+			candidato = ruta
+		validar_backup_para_restaurar(candidato)
+
+		try:
+			previo = crear_backup_db(manual=True)['nombre']
+		except Exception as e:
+			# Una base actual dañada no debe impedir recuperarla
+			logger.warning('Restauración sin backup previo: %s', e)
+			previo = None
+
+		uri = 'file:' + urllib.request.pathname2url(os.path.abspath(candidato)) + '?mode=ro'
+		fuente = sqlite3.connect(uri, uri=True)
+		# El reemplazo no pasa por execute(): no hay nada que anotar en el registro
+		_gestor_conexiones.registro_cambios = None
+		try:
+			def avance(_estado, restantes, total):
+				if progreso:
+					progreso(total - restantes, total)
+			fuente.backup(_gestor_conexiones.conexion(), pages=BACKUP_PAGINAS_POR_PASO, progress=avance)
+		except sqlite3.Error as e:
+			raise Exception(f'No se pudo reemplazar la base: {e}')
+		finally:
+			fuente.close()
+			_gestor_conexiones.reiniciar()
+			init_db()
+	finally:
+		if os.path.exists(temporal):
+			os.remove(temporal)
+
+	with transaccion() as conn:
+		_registro_cambios.marcar_restauracion(conn, origen)
+	_catalogo_referencia.invalidar()
+	_indice_materias.invalidar()
+	_indice_profesores.invalidar()
+	_indice_ocupacion.invalidar()
+	# Nuevo punto de partida para el registro de cambios
+	try:
+		crear_backup_db(manual=False)
+	except Exception as e:
+		logger.warning('No se pudo crear el backup posterior a la restauración: %s', e)
+	logger.info('Base restaurada desde %s', origen)
+	return {'origen': origen, 'previo': previo, 'aviso': aviso}
+
 # ============== FUNCIONES DE GESTION DE USUARIOS ==============
 
 def hash_password(password: str) -> str:
@@ -1235,83 +3952,99 @@ def hash_password(password: str) -> str:
 
 def verificar_usuario(username: str, password: str) -> dict:
 	"""Verifica las credenciales de un usuario y retorna sus datos si son correctas"""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	password_hash = hash_password(password)
 	c.execute('SELECT id, username, es_admin FROM usuarios WHERE username=? AND password=?', 
 			  (username, password_hash))
 	row = c.fetchone()
-	conn.close()
 	if row:
 		return {'id': row[0], 'username': row[1], 'es_admin': bool(row[2])}
 	return None
 
 def crear_usuario(username: str, password: str, es_admin: bool = False):
 	"""Crea un nuevo usuario en el sistema"""
-	conn = get_connection()
-	c = conn.cursor()
 	password_hash = hash_password(password)
 	try:
-		c.execute('INSERT INTO usuarios (username, password, es_admin) VALUES (?, ?, ?)',
-				  (username, password_hash, 1 if es_admin else 0))
-		conn.commit()
+		# Fecha explícita (UTC, como CURRENT_TIMESTAMP) para que el registro de cambios la reproduzca
+		fecha = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
+		with transaccion() as conn:
+			conn.execute('INSERT INTO usuarios (username, password, es_admin, fecha_creacion) VALUES (?, ?, ?, ?)',
+					  (username, password_hash, 1 if es_admin else 0, fecha))
 	except sqlite3.IntegrityError:
-		conn.close()
 		raise Exception('Ya existe un usuario con ese nombre.')
-	conn.close()
 
 def obtener_usuarios() -> list:
 	"""Obtiene la lista de todos los usuarios (sin contraseñas)"""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('SELECT id, username, es_admin, fecha_creacion FROM usuarios')
 	rows = c.fetchall()
-	conn.close()
 	return [{'id': r[0], 'username': r[1], 'es_admin': bool(r[2]), 'fecha_creacion': r[3]} for r in rows]
 
 def eliminar_usuario(user_id: int):
 	"""Elimina un usuario del sistema"""
-	conn = get_connection()
-	c = conn.cursor()
-	# No permitir eliminar si es el único admin
-	c.execute('SELECT COUNT(*) FROM usuarios WHERE es_admin=1')
-	admin_count = c.fetchone()[0]
-	c.execute('SELECT es_admin FROM usuarios WHERE id=?', (user_id,))
-	row = c.fetchone()
-	if row and row[0] == 1 and admin_count <= 1:
-		conn.close()
-		raise Exception('No se puede eliminar el único administrador del sistema.')
-	c.execute('DELETE FROM usuarios WHERE id=?', (user_id,))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		# No permitir eliminar si es el único admin
+		c.execute('SELECT COUNT(*) FROM usuarios WHERE es_admin=1')
+		admin_count = c.fetchone()[0]
+		c.execute('SELECT es_admin FROM usuarios WHERE id=?', (user_id,))
+		row = c.fetchone()
+		if row and row[0] == 1 and admin_count <= 1:
+			raise Exception('No se puede eliminar el único administrador del sistema.')
+		c.execute('DELETE FROM usuarios WHERE id=?', (user_id,))
 
 def hay_usuarios() -> bool:
 	"""Verifica si existen usuarios en el sistema"""
-	conn = get_connection()
+	conn = get_connection_lectura()
 	c = conn.cursor()
 	c.execute('SELECT COUNT(*) FROM usuarios')
 	count = c.fetchone()[0]
-	conn.close()
 	return count > 0
 
 def cambiar_password(user_id: int, nueva_password: str):
 	"""Cambia la contraseña de un usuario"""
-	conn = get_connection()
-	c = conn.cursor()
-	password_hash = hash_password(nueva_password)
-	c.execute('UPDATE usuarios SET password=? WHERE id=?', (password_hash, user_id))
-	conn.commit()
-	conn.close()
+	with transaccion() as conn:
+		c = conn.cursor()
+		password_hash = hash_password(nueva_password)
+		c.execute('UPDATE usuarios SET password=? WHERE id=?', (password_hash, user_id))
 
-# Inicializar la base de datos al importar el módulo
-init_db()
+# ============== ARRANQUE ==============
+# Importar el módulo no toca la base: App prepara el esquema y el backup automático
+# en segundo plano. Quien use las funciones sin la interfaz debe llamar init_db().
+
+# Duración en segundos de cada fase del último arranque
+TIEMPOS_INICIO: Dict[str, float] = {}
+
+
+def registrar_fase_inicio(fase: str, inicio: float) -> float:
+	"""Guarda la duración de una fase de arranque medida desde `inicio` (perf_counter)."""
+	duracion = time.perf_counter() - inicio
+	TIEMPOS_INICIO[fase] = duracion
+	logger.info('Arranque: %s en %.3f s', fase, duracion)
+	return duracion
 
-# Crear backup automático al inicio (si existe la base de datos)
-try:
-	if os.path.exists(DB_NAME):
-		crear_backup_db(manual=False)
-except Exception:
-	pass  # Si falla el backup automático, continuar igualmente
+
+def preparar_base_datos():
+	"""Aplica las migraciones pendientes midiendo la fase 'esquema'."""
+	inicio = time.perf_counter()
+	init_db()
+	registrar_fase_inicio('esquema', inicio)
+
+
+def crear_backup_automatico() -> Optional[str]:
+	"""Backup automático del arranque. Un fallo se registra pero no detiene la aplicación."""
+	if not os.path.exists(DB_NAME):
+		return None
+	inicio = time.perf_counter()
+	try:
+		entrada = crear_backup_db(manual=False)
+	except Exception as e:
+		logger.warning('No se pudo crear el backup automático: %s', e)
+		return None
+	registrar_fase_inicio('backup_automatico', inicio)
+	return entrada['ruta']
 
 # ================= INTERFAZ GRAFICA BASE ===================
 
@@ -1343,7 +4076,112 @@ class ToolTip:
 		if self.tip_window:
 			self.tip_window.destroy()
 			self.tip_window = None
-	
+
+# === Grilla persistente de horarios ===
+def quitar_bind(widget, secuencia, funcid):
+	"""Quita sólo el bind `funcid` de `secuencia`.
+
+	widget.unbind(secuencia, funcid) borra todos los binds de la secuencia (incluidos
+	los agregados con add='+') hasta Python 3.13.
+	"""
+	script = widget.bind(secuencia)
+	if script:
+		restantes = '\n'.join(linea for linea in script.split('\n') if funcid not in linea)
+		widget.bind(secuencia, restantes if restantes.strip() else '')
+	widget.deletecommand(funcid)
+
+
+class GrillaHorario:
+	"""Grilla días × espacios que conserva sus celdas entre redibujos.
+
+	Los encabezados y botones se crean una sola vez; actualizar() compara el texto
+	nuevo de cada celda con el que ya está pintado y reconfigura solo las que cambiaron.
+	Los eventos <Configure> se agrupan en una pasada de ajuste cada REAJUSTE_MS.
+	"""
+	REAJUSTE_MS = 60
+
+	def __init__(self, frame, dias, espacios, al_click, ancho_columna=120, ancho_indice=50):
+		self.frame = frame
+		self.dias = list(dias)
+		self.espacios = espacios
+		self.clave = None
+		self._textos = {}
+		self.botones = {}
+		self._anchos = {}
+		self._reajuste_pendiente = None
+
+		# Columna de índices sin expandir, columnas de días con el mismo weight
+		frame.grid_columnconfigure(0, weight=0, minsize=ancho_indice)
+		ttk.Label(frame, text='', font=('Segoe UI', 10, 'bold'), background='#f4f6fa').grid(row=0, column=0, padx=(0,0), pady=2, sticky='nsew')
+		for col, dia in enumerate(self.dias, start=1):
+			frame.grid_columnconfigure(col, weight=1, minsize=ancho_columna)
+			ttk.Label(frame, text=dia, font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a').grid(row=0, column=col, padx=(0,0), pady=2, sticky='nsew')
+
+		for esp in range(1, espacios + 1):
+			frame.grid_rowconfigure(esp, weight=1, minsize=38)
+			ttk.Label(frame, text=f"{esp}ª", font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a', anchor='center').grid(row=esp, column=0, padx=(0,0), pady=2, sticky='nsew')
+			for col, dia in enumerate(self.dias, start=1):
+				btn = tk.Button(frame, text='', wraplength=100, anchor='w', justify='left',
+								bg='#ffffff', relief='ridge', bd=1,
+								command=lambda d=dia, e=esp: al_click(d, e))
+				btn.grid(row=esp, column=col, padx=1, pady=1, sticky='nsew')
+				self.botones[(dia, esp)] = btn
+
+		# add='+' conserva el ajuste de scrollregion que ya tenga el frame; destruir() lo quita
+		self._bind_configure = frame.bind('<Configure>', self._programar_reajuste, add='+')
+
+	def vigente(self, frame, dias, espacios):
+		"""Indica si la grilla sigue montada sobre el mismo frame y con las mismas dimensiones"""
+		return (self.frame is frame and self.frame.winfo_exists()
+				and self.dias == list(dias) and self.espacios == espacios)
+
+	def actualizar(self, textos, clave=None):
+		"""Aplica los textos {(dia, espacio): texto} y devuelve cuántas celdas cambiaron"""
+		self.clave = clave
+		cambios = 0
+		for celda, btn in self.botones.items():
+			texto = textos.get(celda, '')
+			if self._textos.get(celda, '') != texto:
+				btn.config(text=texto)
+				cambios += 1
+			self._textos[celda] = texto
+		return cambios
+
+	def limpiar(self):
+		self.actualizar({})
+
+	def destruir(self):
+		if self._reajuste_pendiente is not None:
+			self.frame.after_cancel(self._reajuste_pendiente)
+			self._reajuste_pendiente = None
+		if self._bind_configure is not None:
+			quitar_bind(self.frame, '<Configure>', self._bind_configure)
+			self._bind_configure = None
+		for widget in self.frame.winfo_children():
+			widget.destroy()
+		self.botones = {}
+		self._textos = {}
+		self._anchos = {}
+
+	def _programar_reajuste(self, event=None):
+		# Una ráfaga de eventos (arrastrar el borde de la ventana) produce una sola pasada
+		if self._reajuste_pendiente is None:
+			self._reajuste_pendiente = self.frame.after(self.REAJUSTE_MS, self._ajustar_wraplength)
+
+	def _ajustar_wraplength(self):
+		# Un grid_bbox por columna; solo se reconfiguran las columnas cuyo ancho cambió
+		self._reajuste_pendiente = None
+		if not self.botones or not self.frame.winfo_exists():
+			return
+		for col, dia in enumerate(self.dias, start=1):
+			width = self.frame.grid_bbox(col, 1)[2]
+			if self._anchos.get(col) == width:
+				continue
+			self._anchos[col] = width
+			wraplength = max(width-8, 60)
+			for esp in range(1, self.espacios + 1):
+				self.botones[(dia, esp)].config(wraplength=wraplength)
+
 def aplicar_estilos_ttk():
 	"""Configura estilos base para todos los widgets ttk."""
 	style = ttk.Style()
@@ -1402,14 +4240,202 @@ def crear_treeview(parent, columnas, headings, height=3, column_config=None):
 	parent.grid_columnconfigure(0, weight=1)
 	return tree
 
+def sincronizar_treeview(tree, filas) -> int:
+	"""Lleva el Treeview a `filas` [(iid, valores), ...] aplicando solo las diferencias.
+
+	Elimina en un solo llamado las filas que ya no están, inserta las nuevas, actualiza
+	las que cambiaron de valores y, si el orden difiere, lo reordena con un único
+	set_children. Las filas conservadas mantienen su selección. Devuelve la cantidad
+	de filas insertadas, actualizadas o eliminadas.
+	"""
+	mostradas = getattr(tree, '_filas_mostradas', None)
+	if mostradas is None:
+		mostradas = tree._filas_mostradas = {}
+	nuevas = {}
+	for iid, valores in filas:
+		nuevas.setdefault(str(iid), tuple(valores))
+	actuales = tree.get_children('')
+	eliminar = [iid for iid in actuales if iid not in nuevas]
+	if eliminar:
+		tree.delete(*eliminar)
+		for iid in eliminar:
+			mostradas.pop(iid, None)
+	orden_resultante = [iid for iid in actuales if iid in nuevas]
+	conservadas = set(orden_resultante)
+	cambios = len(eliminar)
+	for iid, valores in nuevas.items():
+		if iid in conservadas:
+			if mostradas.get(iid) != valores:
+				tree.item(iid, values=valores)
+				cambios += 1
+		else:
+			tree.insert('', 'end', iid=iid, values=valores)
+			orden_resultante.append(iid)
+			cambios += 1
+		mostradas[iid] = valores
+	orden = list(nuevas)
+	if orden_resultante != orden:
+		tree.set_children('', *orden)
+	return cambios
+
+def actualizar_fila_treeview(tree, iid, valores):
+	"""Cambia los valores de una fila manteniendo al día el estado de sincronizar_treeview()."""
+	valores = tuple(valores)
+	tree.item(iid, values=valores)
+	mostradas = getattr(tree, '_filas_mostradas', None)
+	if mostradas is not None:
+		mostradas[str(iid)] = valores
+
 def recargar_treeview(tree, datos, campos):
-	for row in tree.get_children():
-		tree.delete(row)
-	for d in datos:
-		tree.insert('', 'end', iid=d['id'], values=tuple(d[c] for c in campos))
+	filas = ((d['id'], tuple(d[c] for c in campos)) for d in datos)
+	tabla = getattr(tree, '_tabla_virtual', None)
+	if tabla is not None:
+		tabla.cargar(filas)
+	else:
+		sincronizar_treeview(tree, filas)
+
+class TablaVirtual:
+	"""Tabla con ventana de filas para catálogos grandes.
+
+	Las filas se guardan en memoria y el Treeview solo contiene las que entran en
+	pantalla; al desplazarse se sincroniza la ventana visible con sincronizar_treeview().
+	La barra vertical recorre el almacén completo. La selección hecha por el usuario
+	se conserva aunque la fila salga de la ventana; tree.selection() devuelve solo
+	las filas visibles. La tabla es dueña de <<TreeviewSelect>>: `al_seleccionar`
+	sólo se llama cuando cambia la selección del usuario, no al redibujar la ventana.
+	"""
+	def __init__(self, parent, columnas, headings, height=3, column_config=None, al_seleccionar=None):
+		tree = ttk.Treeview(parent, columns=columnas, show='headings', height=height)
+		for col, head in zip(columnas, headings):
+			tree.heading(col, text=head)
+		if column_config:
+			for col_name, config in column_config.items():
+				if col_name in ['#0'] + list(columnas):
+					tree.column(col_name, **config)
+		self.tree = tree
+		tree._tabla_virtual = self
+
+		# La barra vertical no mueve el Treeview: desplaza la ventana sobre el almacén
+		self._vsb = ttk.Scrollbar(parent, orient='vertical', command=self._desplazar)
+		hsb = ttk.Scrollbar(parent, orient='horizontal', command=tree.xview)
+		tree.configure(xscroll=hsb.set)
+		tree.grid(row=0, column=0, sticky='nsew')
+		self._vsb.grid(row=0, column=1, sticky='ns')
+		hsb.grid(row=1, column=0, sticky='ew')
+		parent.grid_rowconfigure(0, weight=1)
+		parent.grid_columnconfigure(0, weight=1)
+
+		self._filas = []
+		self._posicion = {}
+		self._seleccion = set()
+		self._inicio = 0
+		self._visibles = max(height, 1)
+		self.al_seleccionar = al_seleccionar
+
+		tree.bind('<Configure>', self._al_redimensionar, add='+')
+		tree.bind('<<TreeviewSelect>>', self._al_seleccionar, add='+')
+		tree.bind('<MouseWheel>', self._al_rueda)
+		tree.bind('<Button-4>', lambda e: self._desplazar('scroll', -1, 'units') or 'break')
+		tree.bind('<Button-5>', lambda e: self._desplazar('scroll', 1, 'units') or 'break')
+		tree.bind('<Down>', lambda e: self._al_flecha(1))
+		tree.bind('<Up>', lambda e: self._al_flecha(-1))
+		tree.bind('<Next>', lambda e: self._desplazar('scroll', 1, 'pages') or 'break')
+		tree.bind('<Prior>', lambda e: self._desplazar('scroll', -1, 'pages') or 'break')
+
+	def cargar(self, filas):
+		"""Reemplaza el almacén de filas [(iid, valores), ...] y redibuja la ventana."""
+		self._filas = [(str(iid), tuple(valores)) for iid, valores in filas]
+		self._posicion = {iid: i for i, (iid, _) in enumerate(self._filas)}
+		self._seleccion &= self._posicion.keys()
+		self._fijar_inicio(self._inicio)
+
+	def ver(self, iid):
+		"""Desplaza la ventana hasta que la fila `iid` quede visible."""
+		posicion = self._posicion.get(str(iid))
+		if posicion is None:
+			return
+		if posicion < self._inicio:
+			self._fijar_inicio(posicion)
+		elif posicion >= self._inicio + self._visibles:
+			self._fijar_inicio(posicion - self._visibles + 1)
+
+	def _fijar_inicio(self, inicio):
+		self._inicio = max(0, min(int(inicio), len(self._filas) - self._visibles))
+		self._renderizar()
+
+	def _renderizar(self):
+		total = len(self._filas)
+		fin = min(self._inicio + self._visibles, total)
+		ventana = self._filas[self._inicio:fin]
+		sincronizar_treeview(self.tree, ventana)
+		seleccion = [iid for iid, _ in ventana if iid in self._seleccion]
+		if set(self.tree.selection()) != set(seleccion):
+			self.tree.selection_set(seleccion)
+		if total:
+			self._vsb.set(self._inicio / total, fin / total)
+		else:
+			self._vsb.set(0, 1)
+
+	def _desplazar(self, accion, cantidad=None, unidad=None):
+		# Protocolo de la barra de desplazamiento: moveto <fracción> / scroll <n> units|pages
+		if accion == 'moveto':
+			self._fijar_inicio(float(cantidad) * len(self._filas))
+		elif accion == 'scroll':
+			paso = self._visibles if unidad == 'pages' else 1
+			self._fijar_inicio(self._inicio + int(cantidad) * paso)
+
+	def _al_rueda(self, event):
+		pasos = -int(event.delta / 120) or (-1 if event.delta > 0 else 1)
+		self._desplazar('scroll', pasos * 3, 'units')
+		return 'break'
+
+	def _al_flecha(self, direccion):
+		# En el borde de la ventana, desplazar en lugar de dejar que el foco se pierda
+		foco = self.tree.focus()
+		hijos = self.tree.get_children('')
+		if not foco or not hijos:
+			return None
+		borde = hijos[-1] if direccion > 0 else hijos[0]
+		if foco != borde:
+			return None
+		posicion = self._posicion[foco] + direccion
+		if not 0 <= posicion < len(self._filas):
+			return 'break'
+		siguiente = self._filas[posicion][0]
+		self.ver(siguiente)
+		self.tree.focus(siguiente)
+		self.tree.selection_set(siguiente)
+		return 'break'
+
+	def _al_seleccionar(self, event=None):
+		actual = set(self.tree.selection())
+		if actual != self._seleccion & set(self.tree.get_children('')):
+			# Cambio hecho por el usuario (no por el redibujo de la ventana)
+			self._seleccion = actual
+			if self.al_seleccionar:
+				self.al_seleccionar(event)
+
+	def _al_redimensionar(self, event):
+		alto_fila = int(ttk.Style().lookup('Treeview', 'rowheight') or 20)
+		hijos = self.tree.get_children('')
+		bbox = self.tree.bbox(hijos[0]) if hijos else ''
+		cabecera = bbox[1] if bbox else alto_fila
+		visibles = max(1, (event.height - cabecera) // alto_fila)
+		if visibles != self._visibles:
+			self._visibles = visibles
+			self._fijar_inicio(self._inicio)
+
+def crear_tabla_virtual(parent, columnas, headings, height=3, column_config=None, al_seleccionar=None):
+	"""Igual que crear_treeview(), pero con filas virtualizadas (ver TablaVirtual).
+
+	Devuelve el Treeview; recargar_treeview() carga los datos en el almacén de la tabla.
+	La selección se atiende con `al_seleccionar`, no con un bind propio de <<TreeviewSelect>>.
+	"""
+	return TablaVirtual(parent, columnas, headings, height, column_config, al_seleccionar).tree
 
 class App(tk.Tk):
 	def __init__(self):
+		self._inicio_arranque = time.perf_counter()
 		super().__init__()
 		aplicar_estilos_ttk()
 		self.title('Gestión de Horarios Escolares - Login')
@@ -1418,12 +4444,83 @@ class App(tk.Tk):
 		
 		# Datos del usuario logueado
 		self.usuario_actual = None
-		
+		# Llamadas demoradas pendientes por clave (ver _demorar)
+		self._demoras_pendientes = {}
+		
+		# La ventana se pinta ya; el esquema se revisa en segundo plano
+		self._aviso_inicio = ttk.Label(self, text='Preparando base de datos…',
+									   font=('Arial', 12), background='#f4f6fa')
+		self._aviso_inicio.pack(expand=True)
+		registrar_fase_inicio('ventana', self._inicio_arranque)
+		self._ejecutar_en_segundo_plano(preparar_base_datos,
+										al_terminar=self._base_datos_lista,
+										al_fallar=self._fallo_base_datos)
+
+		self.after(CHECKPOINT_INTERVALO_MS, self._checkpoint_periodico)
+
+	def _base_datos_lista(self, _resultado=None):
+		"""Con el esquema al día muestra el login y lanza el backup automático."""
+		self._aviso_inicio.destroy()
 		# Verificar si es el primer inicio (no hay usuarios)
 		if not hay_usuarios():
 			self._configurar_admin_inicial()
 		else:
 			self._mostrar_login()
+		registrar_fase_inicio('login', self._inicio_arranque)
+		# El backup no bloquea el login; sus errores sólo quedan en el log
+		self._ejecutar_en_segundo_plano(crear_backup_automatico, al_fallar=lambda e: None)
+
+	def _fallo_base_datos(self, error):
+		messagebox.showerror('Error', f'No se pudo preparar la base de datos:\n{error}')
+		self.destroy()
+
+	def _checkpoint_periodico(self):
+		"""Vuelca el WAL a la base cuando no hubo escrituras recientes."""
+		_gestor_conexiones.checkpoint_si_inactivo()
+		self.after(CHECKPOINT_INTERVALO_MS, self._checkpoint_periodico)
+
+	def _demorar(self, clave: str, funcion, demora_ms: int = FILTRO_DEMORA_MS):
+		"""Ejecuta `funcion` cuando pasan `demora_ms` sin nuevas llamadas con la misma clave."""
+		pendientes = self._demoras_pendientes
+		if clave in pendientes:
+			self.after_cancel(pendientes.pop(clave))
+		def ejecutar():
+			pendientes.pop(clave, None)
+			funcion()
+		pendientes[clave] = self.after(demora_ms, ejecutar)
+
+	def _ejecutar_en_segundo_plano(self, tarea, al_terminar=None, al_fallar=None, intervalo_ms: int = 50):
+		"""Ejecuta `tarea()` en un hilo aparte y entrega el resultado en el hilo de Tk.
+
+		`al_terminar(resultado)` o `al_fallar(error)` se invocan desde el bucle de
+		eventos (consultando una cola con after), nunca desde el hilo de trabajo.
+		"""
+		resultados = queue.Queue()
+
+		def trabajar():
+			try:
+				resultados.put((True, tarea()))
+			except Exception as e:
+				resultados.put((False, e))
+			finally:
+				_gestor_conexiones.cerrar_hilo()
+
+		def revisar():
+			try:
+				ok, valor = resultados.get_nowait()
+			except queue.Empty:
+				self.after(intervalo_ms, revisar)
+				return
+			if ok:
+				if al_terminar:
+					al_terminar(valor)
+			elif al_fallar:
+				al_fallar(valor)
+			else:
+				messagebox.showerror('Error', str(valor))
+
+		threading.Thread(target=trabajar, daemon=True).start()
+		self.after(intervalo_ms, revisar)
 
 	def _configurar_admin_inicial(self):
 		"""Configuración inicial del administrador en el primer inicio"""
@@ -1659,14 +4756,16 @@ class App(tk.Tk):
 		# Tabla de obligaciones usando helper
 		frame_tabla = ttk.Frame(self.frame_principal)
 		frame_tabla.pack(pady=10, fill='both', expand=True)
-		self.tree_materias = crear_treeview(frame_tabla, ('Nombre', 'Horas'), ('Nombre', 'Horas asignadas'))
+		self.tree_materias = crear_tabla_virtual(frame_tabla, ('Nombre', 'Horas'), ('Nombre', 'Horas asignadas'),
+												  al_seleccionar=self._on_select_materia)
 		self._recargar_materias_tree()
 
-		def filtrar_materias(*args):
-			filtro = self.filtro_materia.get().lower()
-			materias_filtradas = [m for m in obtener_materias() if filtro in m['nombre'].lower()]
+		def filtrar_materias():
+			if not self.tree_materias.winfo_exists():
+				return
+			materias_filtradas = buscar_materias(self.filtro_materia.get())
 			recargar_treeview(self.tree_materias, materias_filtradas, ['nombre', 'horas_semanales'])
-		self.filtro_materia.trace_add('write', filtrar_materias)
+		self.filtro_materia.trace_add('write', lambda *args: self._demorar('filtro_materias', filtrar_materias))
 
 		# Formulario de alta/edición
 		form = ttk.Frame(self.frame_principal)
@@ -1683,8 +4782,7 @@ class App(tk.Tk):
 		ttk.Button(btns, text='Eliminar', command=self._eliminar_materia).grid(row=0, column=2, padx=5)
 		ttk.Button(btns, text='Asignar a Plan de Estudio', command=self._asignar_materias_a_plan).grid(row=0, column=3, padx=5)
 
-		# Selección en tabla
-		self.tree_materias.bind('<<TreeviewSelect>>', self._on_select_materia)
+		# Selección en tabla (la atiende la TablaVirtual)
 		self.materia_seleccionada_id = None
 
 	def _recargar_materias_tree(self):
@@ -1997,28 +5095,25 @@ class App(tk.Tk):
 		# Tabla de profesores
 		frame_tabla = ttk.Frame(content)
 		frame_tabla.pack(pady=10, fill='both', expand=True)
-		self.tree_profesores = crear_treeview(frame_tabla, ('Nombre',), ('Nombre',))
+		self.tree_profesores = crear_tabla_virtual(frame_tabla, ('Nombre',), ('Nombre',),
+													al_seleccionar=self._on_select_profesor)
 		self._recargar_profesores_tree()
 		
 		# Eventos de filtrado
 		def filtrar_profesores(*args):
-			filtro = self.filtro_profesor.get().lower()
+			if not self.tree_profesores.winfo_exists():
+				return
 			turno_nombre = self.cb_turno_profesor.get()
-			if turno_nombre == 'Todos':
-				profesores = obtener_profesores()
-			else:
-				turno_id = self.turnos_dict_prof[turno_nombre]
-				profesores = obtener_profesores_por_turno(turno_id)
-			profesores_filtrados = [p for p in profesores if filtro in p['nombre'].lower()]
+			turno_id = None if turno_nombre == 'Todos' else self.turnos_dict_prof[turno_nombre]
+			profesores_filtrados = buscar_profesores(self.filtro_profesor.get(), turno_id)
 			recargar_treeview(self.tree_profesores, profesores_filtrados, ['nombre'])
 			self.label_total_profesores.config(text=f'Total de agentes: {len(profesores_filtrados)}')
 		
-		self.filtro_profesor.trace_add('write', filtrar_profesores)
+		self.filtro_profesor.trace_add('write', lambda *args: self._demorar('filtro_profesores', filtrar_profesores))
 		self.cb_turno_profesor.bind('<<ComboboxSelected>>', lambda e: filtrar_profesores())
 		self.after(100, filtrar_profesores)
 		
-		# Selección en tabla
-		self.tree_profesores.bind('<<TreeviewSelect>>', self._on_select_profesor)
+		# Selección en tabla (la atiende la TablaVirtual)
 		self.profesor_seleccionado_id = None
 
 	def _crear_tab_ciclos(self, parent):
@@ -2396,21 +5491,19 @@ class App(tk.Tk):
 		# Tabla de profesores usando helper
 		frame_tabla = ttk.Frame(self.frame_principal)
 		frame_tabla.pack(pady=10, fill='both', expand=True)
-		self.tree_profesores = crear_treeview(frame_tabla, ('Nombre',), ('Nombre',))
+		self.tree_profesores = crear_tabla_virtual(frame_tabla, ('Nombre',), ('Nombre',),
+													al_seleccionar=self._on_select_profesor)
 		self._recargar_profesores_tree()
 
 		def filtrar_profesores(*args):
-			filtro = self.filtro_profesor.get().lower()
+			if not self.tree_profesores.winfo_exists():
+				return
 			turno_nombre = self.cb_turno_profesor.get()
-			if turno_nombre == 'Todos':
-				profesores = obtener_profesores()
-			else:
-				turno_id = self.turnos_dict_prof[turno_nombre]
-				profesores = obtener_profesores_por_turno(turno_id)
-			profesores_filtrados = [p for p in profesores if filtro in p['nombre'].lower()]
+			turno_id = None if turno_nombre == 'Todos' else self.turnos_dict_prof[turno_nombre]
+			profesores_filtrados = buscar_profesores(self.filtro_profesor.get(), turno_id)
 			recargar_treeview(self.tree_profesores, profesores_filtrados, ['nombre'])
 			self.label_total_profesores.config(text=f'Total de agentes: {len(profesores_filtrados)}')
-		self.filtro_profesor.trace_add('write', filtrar_profesores)
+		self.filtro_profesor.trace_add('write', lambda *args: self._demorar('filtro_profesores', filtrar_profesores))
 		self.cb_turno_profesor.bind('<<ComboboxSelected>>', lambda e: filtrar_profesores())
 		# Inicializar el total
 		self.after(100, filtrar_profesores)
@@ -2431,8 +5524,7 @@ class App(tk.Tk):
 		ttk.Button(btns, text='Banca de horas', command=self._gestionar_banca_profesor).grid(row=0, column=3, padx=5)
 		ttk.Button(btns, text='Turnos del agente', command=self._gestionar_turnos_profesor).grid(row=0, column=4, padx=5)
 
-		# Selección en tabla
-		self.tree_profesores.bind('<<TreeviewSelect>>', self._on_select_profesor)
+		# Selección en tabla (la atiende la TablaVirtual)
 		self.profesor_seleccionado_id = None
 
 	def _recargar_profesores_tree(self):
@@ -2483,13 +5575,96 @@ class App(tk.Tk):
 			messagebox.showwarning('Atención', 'Seleccione un profesor para eliminar.')
 			return
 		if messagebox.askyesno('Confirmar', '¿Está seguro de eliminar el profesor seleccionado?'):
+			profesor_id = self.profesor_seleccionado_id
+
+			def eliminar():
+				try:
+					eliminar_profesor(profesor_id)
+					self._recargar_profesores_tree()
+					self.entry_nombre_profesor.delete(0, tk.END)
+					self.profesor_seleccionado_id = None
+				except Exception as e:
+					messagebox.showerror('Error', str(e))
+			# Antes de eliminarlo, ofrecer reubicar sus clases en los cursos
+			turnos = [t['id'] for t in obtener_turnos()]
+			self._ofrecer_reparacion_horario(turnos, [profesor_id], al_terminar=eliminar)
+
+	def _ofrecer_reparacion_horario(self, turno_ids, profesores_salientes=(), al_terminar=None, parent=None):
+		"""Si en esos turnos hay clases sin un profesor válido, propone reubicarlas con el generador"""
+		continuar = al_terminar or (lambda: None)
+		afectados = {}
+		for turno_id in turno_ids:
+			cantidad = len(obtener_horarios_a_reparar(turno_id, profesores_salientes))
+			if cantidad:
+				afectados[turno_id] = cantidad
+		if not afectados:
+			continuar()
+			return
+		if not messagebox.askyesno('Reparar horarios',
+								   f'{sum(afectados.values())} horas de clase en cursos quedan sin un profesor válido.\n\n'
+								   '¿Buscar automáticamente otro profesor habilitado para esas horas?\n'
+								   'Sólo se modifican esas horas; se muestran los cambios antes de guardarlos.',
+								   parent=parent or self):
+			continuar()
+			return
+
+		win = tk.Toplevel(self)
+		win.title('Reparar horarios')
+		win.geometry('720x420')
+		win.transient(self)
+		win.grab_set()
+		lbl_estado = ttk.Label(win, text='Buscando reemplazos...')
+		lbl_estado.pack(pady=8)
+		columnas = ('division', 'dia', 'espacio', 'antes', 'despues')
+		tree = ttk.Treeview(win, columns=columnas, show='headings', height=12)
+		for columna, titulo, ancho in zip(columnas, ('División', 'Día', 'Hora', 'Antes', 'Después'), (110, 80, 50, 220, 220)):
+			tree.heading(columna, text=titulo)
+			tree.column(columna, width=ancho, anchor='center' if columna in ('dia', 'espacio') else 'w')
+		tree.pack(fill='both', expand=True, padx=10)
+		frame_btns = ttk.Frame(win)
+		frame_btns.pack(pady=10)
+		reparaciones = []
+
+		def aplicar():
 			try:
-				eliminar_profesor(self.profesor_seleccionado_id)
-				self._recargar_profesores_tree()
-				self.entry_nombre_profesor.delete(0, tk.END)
-				self.profesor_seleccionado_id = None
+				aplicar_reparaciones_horario(reparaciones)
 			except Exception as e:
-				messagebox.showerror('Error', str(e))
+				messagebox.showerror('Error', f'No se pudieron guardar los cambios: {str(e)}', parent=win)
+				return
+			win.destroy()
+			continuar()
+
+		def omitir():
+			win.destroy()
+			continuar()
+		btn_aplicar = ttk.Button(frame_btns, text='Aplicar cambios', command=aplicar, state='disabled')
+		btn_aplicar.grid(row=0, column=0, padx=5)
+		ttk.Button(frame_btns, text='Continuar sin reparar', command=omitir).grid(row=0, column=1, padx=5)
+		ttk.Button(frame_btns, text='Cancelar', command=win.destroy).grid(row=0, column=2, padx=5)
+
+		def terminado(resultado):
+			if not win.winfo_exists():
+				return
+			reparaciones.extend(resultado)
+			for reparacion in reparaciones:
+				for cambio in describir_reparacion_horario(reparacion):
+					tree.insert('', 'end', values=(cambio['division'], cambio['dia'], f"{cambio['espacio']}ª",
+												   cambio['antes'], cambio['despues']))
+			reasignadas = sum(r['reasignadas'] for r in reparaciones)
+			sin_ubicar = sum(r['sin_ubicar'] for r in reparaciones)
+			movidas = sum(r['movidas'] for r in reparaciones)
+			texto = f'Horas reasignadas: {reasignadas} (en otro horario: {movidas})'
+			if sin_ubicar:
+				texto += f' – sin reemplazo, quedan libres: {sin_ubicar}'
+			lbl_estado.configure(text=texto)
+			btn_aplicar.configure(state='normal')
+
+		def fallido(e):
+			if win.winfo_exists():
+				lbl_estado.configure(text=f'No se pudo calcular la reparación: {str(e)}')
+		self._ejecutar_en_segundo_plano(
+			lambda: [proponer_reparacion_horario(turno_id, profesores_salientes) for turno_id in afectados],
+			al_terminar=terminado, al_fallar=fallido)
 
 	def _gestionar_banca_profesor(self):
 		if not self.profesor_seleccionado_id:
@@ -2698,9 +5873,8 @@ class App(tk.Tk):
 
 	def _recargar_divisiones_tree(self):
 		divisiones = obtener_divisiones()
-		turnos_map = {t['id']: t['nombre'] for t in obtener_turnos()}
-		planes_map = {p['id']: p['nombre'] for p in obtener_planes()}
-		ciclos_map = {c['id']: c['nombre'] for c in obtener_ciclos_con_planes()}
+		nombres = _catalogo_referencia.nombres()
+		turnos_map, planes_map, ciclos_map = nombres['turno'], nombres['plan'], nombres['ciclo']
 		turno_nombre = self.cb_turno_division.get() if hasattr(self, 'cb_turno_division') else ''
 		plan_nombre = self.cb_plan_division.get() if hasattr(self, 'cb_plan_division') else ''
 		ciclo_nombre = self.cb_ciclo_division.get() if hasattr(self, 'cb_ciclo_division') else ''
@@ -2831,12 +6005,11 @@ class App(tk.Tk):
 				messagebox.showerror('Error', 'Ciclo inválido.', parent=win)
 				return
 			try:
-				conn = get_connection()
-				c = conn.cursor()
-				c.execute('INSERT INTO division (nombre, turno_id, plan_id, ciclo_id) VALUES (?, ?, ?, ?)', 
-						  (nombre, turno_id, plan_id, ciclo_id))
-				conn.commit()
-				conn.close()
+				with transaccion() as conn:
+					c = conn.cursor()
+					c.execute('INSERT INTO division (nombre, turno_id, plan_id, ciclo_id) VALUES (?, ?, ?, ?)', 
+							  (nombre, turno_id, plan_id, ciclo_id))
+					_catalogo_referencia.marcar_cambio()
 				self._recargar_divisiones_tree()
 				win.destroy()
 			except Exception as e:
@@ -2978,12 +6151,11 @@ class App(tk.Tk):
 				messagebox.showerror('Error', 'Ciclo inválido.', parent=win)
 				return
 			try:
-				conn = get_connection()
-				c = conn.cursor()
-				c.execute('UPDATE division SET nombre=?, turno_id=?, plan_id=?, ciclo_id=? WHERE id=?', 
-						  (nombre, turno_id, plan_id, ciclo_id, self.division_seleccionada_id))
-				conn.commit()
-				conn.close()
+				with transaccion() as conn:
+					c = conn.cursor()
+					c.execute('UPDATE division SET nombre=?, turno_id=?, plan_id=?, ciclo_id=? WHERE id=?', 
+							  (nombre, turno_id, plan_id, ciclo_id, self.division_seleccionada_id))
+					_catalogo_referencia.marcar_cambio()
 				self._recargar_divisiones_tree()
 				win.destroy()
 			except Exception as e:
@@ -3016,6 +6188,114 @@ class App(tk.Tk):
 		timestamp = datetime.now().strftime('%Y%m%d_%H%M')
 		return f"{limpio}_{timestamp}.xls"
 
+	def _encolar_exportacion(self, hojas: List[Dict[str, Any]], ruta: str):
+		"""Envía la exportación al hilo de trabajo y muestra la ventana de progreso."""
+		if getattr(self, '_cola_exportaciones', None) is None:
+			self._cola_exportaciones = ColaExportaciones()
+			self._exportaciones = {}
+		trabajo_id = self._cola_exportaciones.encolar(hojas, ruta)
+		self._exportaciones[trabajo_id] = {
+			'archivo': os.path.basename(_normalizar_ruta_xls(ruta)),
+			'estado': 'En cola',
+			'progreso': f'0/{len(hojas)} hojas',
+		}
+		self._mostrar_ventana_exportaciones()
+		if not getattr(self, '_revisando_exportaciones', False):
+			self._revisando_exportaciones = True
+			self.after(100, self._revisar_exportaciones)
+
+	def _mostrar_ventana_exportaciones(self):
+		"""Ventana no modal con el estado de las exportaciones encoladas."""
+		win = getattr(self, '_win_exportaciones', None)
+		if win is None or not win.winfo_exists():
+			win = tk.Toplevel(self)
+			win.title('Exportaciones')
+			win.geometry('520x260')
+			win.transient(self)
+			frame = ttk.Frame(win, padding=10)
+			frame.pack(fill='both', expand=True)
+			tree = ttk.Treeview(frame, columns=('archivo', 'estado', 'progreso'), show='headings', height=6)
+			tree.heading('archivo', text='Archivo')
+			tree.heading('estado', text='Estado')
+			tree.heading('progreso', text='Progreso')
+			tree.column('archivo', width=230)
+			tree.column('estado', width=110)
+			tree.column('progreso', width=140)
+			tree.pack(fill='both', expand=True)
+			barra = ttk.Progressbar(frame, mode='determinate', maximum=1)
+			barra.pack(fill='x', pady=(8, 0))
+
+			def cancelar_seleccionada():
+				activas = [t for t, d in self._exportaciones.items() if d['estado'] in ('En cola', 'Exportando')]
+				# Sin selección se cancela la exportación activa más antigua
+				seleccion = [int(iid) for iid in tree.selection()] or activas[:1]
+				for trabajo_id in seleccion:
+					if trabajo_id in activas:
+						self._cola_exportaciones.cancelar(trabajo_id)
+						self._exportaciones[trabajo_id]['estado'] = 'Cancelando'
+				self._refrescar_ventana_exportaciones()
+
+			botones = ttk.Frame(frame)
+			botones.pack(fill='x', pady=(8, 0))
+			ttk.Button(botones, text='Cancelar exportación', command=cancelar_seleccionada).pack(side='left')
+			ttk.Button(botones, text='Cerrar', command=win.destroy).pack(side='right')
+			self._win_exportaciones = win
+			self._tree_exportaciones = tree
+			self._barra_exportaciones = barra
+		self._refrescar_ventana_exportaciones()
+		win.deiconify()
+		win.lift()
+
+	def _refrescar_ventana_exportaciones(self, hechas: int = None, total: int = None):
+		win = getattr(self, '_win_exportaciones', None)
+		if win is None or not win.winfo_exists():
+			return
+		tree = self._tree_exportaciones
+		for trabajo_id, datos in self._exportaciones.items():
+			valores = (datos['archivo'], datos['estado'], datos['progreso'])
+			if tree.exists(str(trabajo_id)):
+				tree.item(str(trabajo_id), values=valores)
+			else:
+				tree.insert('', 'end', iid=str(trabajo_id), values=valores)
+		if total:
+			self._barra_exportaciones.config(maximum=total, value=hechas)
+
+	def _revisar_exportaciones(self):
+		"""Procesa los eventos del hilo de exportación (se reprograma mientras haya trabajos)."""
+		cola = self._cola_exportaciones
+		hechas = total = None
+		while True:
+			try:
+				evento = cola.eventos.get_nowait()
+			except queue.Empty:
+				break
+			tipo, trabajo_id = evento[0], evento[1]
+			datos = self._exportaciones.get(trabajo_id)
+			if datos is None:
+				continue
+			if tipo == 'progreso':
+				_, _, hechas, total, descripcion = evento
+				if datos['estado'] != 'Cancelando':
+					datos['estado'] = 'Exportando'
+				datos['progreso'] = f'{hechas}/{total} hojas' if hechas < total else descripcion
+			elif tipo == 'completado':
+				datos['estado'] = 'Completado'
+				datos['progreso'] = 'Listo'
+				hechas = total = 1
+				messagebox.showinfo('Exportación completada', f'Se generó el archivo:\n{evento[2]}', parent=self)
+			elif tipo == 'cancelado':
+				datos['estado'] = 'Cancelado'
+				datos['progreso'] = '-'
+			elif tipo == 'error':
+				datos['estado'] = 'Error'
+				datos['progreso'] = '-'
+				messagebox.showerror('Error al exportar', evento[2], parent=self)
+		self._refrescar_ventana_exportaciones(hechas, total)
+		if cola.pendientes() or not cola.eventos.empty():
+			self.after(100, self._revisar_exportaciones)
+		else:
+			self._revisando_exportaciones = False
+
 	def _solicitar_ruta_exportacion(self, nombre_sugerido: str) -> Optional[str]:
 		return filedialog.asksaveasfilename(
 			parent=self,
@@ -3106,29 +6386,22 @@ class App(tk.Tk):
 		if division_id is None:
 			messagebox.showerror('División inválida', 'La división seleccionada no es válida.', parent=self)
 			return
-		horarios = obtener_horarios(division_id)
 		turno_nombre = self.cb_turno_horario.get() if getattr(self, 'cb_turno_horario', None) else ''
 		hoja_nombre = f"{division_nombre} - {turno_nombre}".strip(' -')
 		ruta = self._solicitar_ruta_exportacion(self._generar_nombre_archivo(division_nombre))
 		if not ruta:
 			return
-		try:
-			destino = exportar_planillas_horario([
-				{'nombre': hoja_nombre, 'horarios': horarios, 'construir_texto': _texto_horario_curso}
-			], ruta)
-		except Exception as exc:
-			messagebox.showerror('Error al exportar', str(exc), parent=self)
-			return
-		messagebox.showinfo('Exportación completada', f'Archivo generado en:\n{destino}', parent=self)
+		self._encolar_exportacion([
+			{'nombre': hoja_nombre, 'division_id': division_id, 'construir_texto': _texto_horario_curso}
+		], ruta)
 
 	def _exportar_multiples_cursos(self):
 		divisiones = obtener_divisiones()
 		if not divisiones:
 			messagebox.showinfo('Sin divisiones', 'No hay divisiones registradas para exportar.', parent=self)
 			return
-		turnos_map = {t['id']: t['nombre'] for t in obtener_turnos()}
-		planes_map = {p['id']: p['nombre'] for p in obtener_planes()}
-		ciclos_map = {c['id']: c['nombre'] for c in obtener_ciclos_con_planes()}
+		nombres = _catalogo_referencia.nombres()
+		turnos_map, planes_map, ciclos_map = nombres['turno'], nombres['plan'], nombres['ciclo']
 		items = []
 		div_lookup = {d['id']: d for d in divisiones}
 		for division in divisiones:
@@ -3145,22 +6418,17 @@ class App(tk.Tk):
 				division = div_lookup.get(division_id)
 				if not division:
 					continue
-				horarios = obtener_horarios(division_id)
 				turno_nombre = turnos_map.get(division['turno_id'], '')
 				hoja_nombre = f"{division['nombre']} - {turno_nombre}".strip(' -')
-				hojas.append({'nombre': hoja_nombre, 'horarios': horarios, 'construir_texto': _texto_horario_curso})
+				# Los horarios se cargan todos juntos al exportar
+				hojas.append({'nombre': hoja_nombre, 'division_id': division_id, 'construir_texto': _texto_horario_curso})
 			if not hojas:
 				messagebox.showwarning('Sin datos', 'Las divisiones seleccionadas no poseen horarios para exportar.', parent=self)
 				return False
 			ruta = self._solicitar_ruta_exportacion(self._generar_nombre_archivo('cursos'))
 			if not ruta:
 				return False
-			try:
-				destino = exportar_planillas_horario(hojas, ruta)
-			except Exception as exc:
-				messagebox.showerror('Error al exportar', str(exc), parent=self)
-				return False
-			messagebox.showinfo('Exportación completada', f'Se generó el archivo:\n{destino}', parent=self)
+			self._encolar_exportacion(hojas, ruta)
 			return True
 
 		self._mostrar_dialogo_seleccion_multiple(
@@ -3184,19 +6452,14 @@ class App(tk.Tk):
 		if profesor_id is None or turno_id is None:
 			messagebox.showerror('Selección inválida', 'La combinación seleccionada no es válida.', parent=self)
 			return
-		horarios = obtener_horarios_profesor(profesor_id, turno_id)
 		hoja_nombre = f"{profesor_nombre} - {turno_nombre}".strip()
 		ruta = self._solicitar_ruta_exportacion(self._generar_nombre_archivo(profesor_nombre))
 		if not ruta:
 			return
-		try:
-			destino = exportar_planillas_horario([
-				{'nombre': hoja_nombre, 'horarios': horarios, 'construir_texto': _texto_horario_profesor}
-			], ruta)
-		except Exception as exc:
-			messagebox.showerror('Error al exportar', str(exc), parent=self)
-			return
-		messagebox.showinfo('Exportación completada', f'Archivo generado en:\n{destino}', parent=self)
+		self._encolar_exportacion([
+			{'nombre': hoja_nombre, 'profesor_id': profesor_id, 'turno_id': turno_id,
+			 'construir_texto': _texto_horario_profesor}
+		], ruta)
 
 	def _exportar_multiples_profesores(self):
 		combinaciones = obtener_profesor_turnos()
@@ -3218,21 +6481,17 @@ class App(tk.Tk):
 				combo = combo_lookup.get(clave_tuple)
 				if not combo:
 					continue
-				horarios = obtener_horarios_profesor(combo['profesor_id'], combo['turno_id'])
 				hoja_nombre = f"{combo['profesor']} - {combo['turno']}"
-				hojas.append({'nombre': hoja_nombre, 'horarios': horarios, 'construir_texto': _texto_horario_profesor})
+				# Los horarios se cargan todos juntos al exportar
+				hojas.append({'nombre': hoja_nombre, 'profesor_id': combo['profesor_id'], 'turno_id': combo['turno_id'],
+							  'construir_texto': _texto_horario_profesor})
 			if not hojas:
 				messagebox.showwarning('Sin datos', 'Los profesores seleccionados no poseen horarios registrados.', parent=self)
 				return False
 			ruta = self._solicitar_ruta_exportacion(self._generar_nombre_archivo('profesores'))
 			if not ruta:
 				return False
-			try:
-				destino = exportar_planillas_horario(hojas, ruta)
-			except Exception as exc:
-				messagebox.showerror('Error al exportar', str(exc), parent=self)
-				return False
-			messagebox.showinfo('Exportación completada', f'Se generó el archivo:\n{destino}', parent=self)
+			self._encolar_exportacion(hojas, ruta)
 			return True
 
 		self._mostrar_dialogo_seleccion_multiple(
@@ -3330,7 +6589,7 @@ class App(tk.Tk):
 				return
 			turno_id = self.turnos_dict_horario[turno_nombre]
 			plan_id = self.planes_dict_horario[plan_nombre]
-			divisiones = [c for c in obtener_divisiones() if c['turno_id'] == turno_id and c['plan_id'] == plan_id and c['ciclo_id'] == ciclo_id]
+			divisiones = obtener_divisiones_de(turno_id, plan_id, ciclo_id)
 			self.divisiones_dict_horario = {c['nombre']: c['id'] for c in divisiones}
 			division_nombres = list(self.divisiones_dict_horario.keys())
 			autocompletar_combobox(self.cb_division_horario, division_nombres, incluir_vacio=False)
@@ -3367,7 +6626,6 @@ class App(tk.Tk):
 		
 		# Actualizar scroll region cuando cambie el tamaño del frame
 		def actualizar_scroll_region(event=None):
-			self.canvas_horario.update_idletasks()
 			self.canvas_horario.configure(scrollregion=(0, 0, self.frame_grilla_horario.winfo_reqwidth(), self.frame_grilla_horario.winfo_reqheight()))
 		self.frame_grilla_horario.bind('<Configure>', actualizar_scroll_region)
 		
@@ -3399,75 +6657,49 @@ class App(tk.Tk):
 		frame_right.pack(side='right')
 		ttk.Button(frame_left, text='Configurar horas por turno', command=self._configurar_horas_por_turno).pack(side='left', padx=5)
 		ttk.Button(frame_left, text='Limpiar horarios vacíos', command=self._limpiar_horarios_vacios_ciclo).pack(side='left', padx=5)
+		ttk.Button(frame_left, text='Generar horario automático', command=self._generar_horario_automatico).pack(side='left', padx=5)
 		ttk.Button(frame_right, text='Exportar horario visible', command=self._exportar_horario_curso_actual).pack(side='left', padx=5)
 		ttk.Button(frame_right, text='Exportar múltiples cursos', command=self._exportar_multiples_cursos).pack(side='left', padx=5)
 		
 		# Enfocar el primer combobox al entrar
 		self.cb_turno_horario.focus_set()
 
+	def _grilla_persistente(self, atributo, frame, espacios, al_click, **opciones):
+		"""Devuelve la GrillaHorario guardada en `atributo`, creándola si la vista se reconstruyó"""
+		dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
+		grilla = getattr(self, atributo, None)
+		if grilla is None or not grilla.vigente(frame, dias, espacios):
+			# destruir() cancela el reajuste pendiente y quita el bind <Configure> de la grilla vieja
+			self._descartar_grilla(atributo)
+			for widget in frame.winfo_children():
+				widget.destroy()
+			grilla = GrillaHorario(frame, dias, espacios, al_click, **opciones)
+			setattr(self, atributo, grilla)
+		return grilla
+
+	def _descartar_grilla(self, atributo):
+		grilla = getattr(self, atributo, None)
+		if grilla is not None and grilla.frame.winfo_exists():
+			grilla.destruir()
+		setattr(self, atributo, None)
+
 	def _dibujar_grilla_horario_ciclo(self):
-		for widget in self.frame_grilla_horario.winfo_children():
-			widget.destroy()
 		division_nombre = getattr(self, 'cb_division_horario', None)
 		if not division_nombre or not self.cb_division_horario.get():
+			self._descartar_grilla('_grilla_ciclo')
 			return
 		division_id = self.divisiones_dict_horario[self.cb_division_horario.get()]
-		dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
 		horarios = obtener_horarios(division_id)
-		matriz = {(h['dia'], h['espacio']): h for h in horarios}
-		
-		# Configurar columnas: la primera (índices) sin weight, las demás con weight igual
-		for col, dia in enumerate([''] + dias):
-			if col == 0:
-				# Primera columna: tamaño fijo, sin expandir
-				self.frame_grilla_horario.grid_columnconfigure(col, weight=0, minsize=50)
-			else:
-				# Columnas de días: mismo weight para ancho uniforme
-				self.frame_grilla_horario.grid_columnconfigure(col, weight=1, minsize=120)
-			
-			if col == 0:
-				ttk.Label(self.frame_grilla_horario, text='', font=('Segoe UI', 10, 'bold'), background='#f4f6fa').grid(row=0, column=col, padx=(0,0), pady=2, sticky='nsew')
-			else:
-				ttk.Label(self.frame_grilla_horario, text=dia, font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a').grid(row=0, column=col, padx=(0,0), pady=2, sticky='nsew')
-
-		# Guardar referencias a los botones para poder actualizar su wraplength dinámicamente
-		self._grilla_botones = []
-		for esp in range(1, self.espacios_por_dia+1):
-			self.frame_grilla_horario.grid_rowconfigure(esp, weight=1, minsize=38)
-			etiqueta = f"{esp}ª"
-			ttk.Label(self.frame_grilla_horario, text=etiqueta, font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a', anchor='center').grid(row=esp, column=0, padx=(0,0), pady=2, sticky='nsew')
-			fila_botones = []
-			for col, dia in enumerate(dias, start=1):
-				h = matriz.get((dia, esp))
-				texto = ''
-				if h:
-					texto = f"{h['materia'] or ''}\n{h['profesor'] or ''}\n{h['hora_inicio'] or ''}-{h['hora_fin'] or ''}"
-				btn = tk.Button(self.frame_grilla_horario, text=texto, wraplength=100, anchor='w', justify='left',
-								bg='#ffffff', relief='ridge', bd=1,
-								command=lambda d=dia, e=esp: self._editar_espacio_horario_ciclo(d, e))
-				btn.grid(row=esp, column=col, padx=1, pady=1, sticky='nsew')
-				fila_botones.append(btn)
-			self._grilla_botones.append(fila_botones)
-
-		# Función para actualizar el wraplength de los botones según el tamaño de la celda
-		def actualizar_wraplength(event=None):
-			for esp, fila in enumerate(self._grilla_botones):
-				for col, btn in enumerate(fila):
-					info = btn.grid_info()
-					col_idx = info['column']
-					# Obtener el ancho real de la celda
-					width = self.frame_grilla_horario.grid_bbox(col_idx, esp+1)[2]
-					# Dejar un pequeño margen
-					btn.config(wraplength=max(width-8, 60))
-		self.frame_grilla_horario.bind('<Configure>', actualizar_wraplength)
-		self.after(100, lambda: self.frame_grilla_horario.event_generate('<Configure>'))
-		
-		# Actualizar la región de scroll después de dibujar la grilla
-		def actualizar_scroll():
-			self.frame_grilla_horario.update_idletasks()
-			self.canvas_horario.configure(scrollregion=(0, 0, self.frame_grilla_horario.winfo_reqwidth(), self.frame_grilla_horario.winfo_reqheight()))
-			self.canvas_horario.yview_moveto(0)  # Resetear scroll a la parte superior
-		self.after(150, actualizar_scroll)
+		textos = {(h['dia'], h['espacio']): f"{h['materia'] or ''}\n{h['profesor'] or ''}\n{h['hora_inicio'] or ''}-{h['hora_fin'] or ''}"
+				  for h in horarios}
+
+		# La grilla se conserva entre redibujos: solo se reconfiguran las celdas que cambiaron
+		grilla = self._grilla_persistente('_grilla_ciclo', self.frame_grilla_horario,
+										  self.espacios_por_dia, self._editar_espacio_horario_ciclo)
+		cambio_division = grilla.clave != division_id
+		grilla.actualizar(textos, clave=division_id)
+		if cambio_division:
+			self.canvas_horario.yview_moveto(0)  # Resetear scroll al cambiar de división
 
 	def _limpiar_horarios_vacios_ciclo(self):
 		"""Elimina horarios que solo tienen hora de inicio y fin, sin materia ni profesor"""
@@ -3482,23 +6714,136 @@ class App(tk.Tk):
 			return
 		
 		try:
-			conn = get_connection()
-			c = conn.cursor()
-			# Eliminar horarios que solo tengan horas pero no materia ni profesor
-			c.execute('''DELETE FROM horario 
-						WHERE division_id = ? 
-						AND (materia_id IS NULL OR materia_id = '') 
-						AND (profesor_id IS NULL OR profesor_id = '')
-						AND (hora_inicio IS NOT NULL OR hora_fin IS NOT NULL)''', (division_id,))
-			eliminados = c.rowcount
-			conn.commit()
-			conn.close()
+			eliminados = limpiar_horarios_vacios_division(division_id)
 			
 			messagebox.showinfo('Éxito', f'Se eliminaron {eliminados} horarios vacíos.')
 			self._dibujar_grilla_horario_ciclo()
 		except Exception as e:
 			messagebox.showerror('Error', f'Error al limpiar horarios: {str(e)}')
 
+	def _generar_horario_automatico(self):
+		"""Completa las horas libres de todas las divisiones de un turno con GeneradorHorario"""
+		win = tk.Toplevel(self)
+		win.configure(bg='#f4f6fa')
+		win.title('Generar horario automático')
+		win.geometry('420x520')
+		win.transient(self)
+		win.grab_set()
+		win.focus_force()
+		frame = ttk.Frame(win)
+		frame.pack(padx=15, pady=10, fill='both', expand=True)
+
+		frame_turno = ttk.Frame(frame)
+		frame_turno.pack(fill='x')
+		ttk.Label(frame_turno, text='Turno:', font=('Segoe UI', 10, 'bold')).pack(side='left', padx=5)
+		turnos_dict = {t['nombre']: t['id'] for t in obtener_turnos()}
+		cb_turno = ttk.Combobox(frame_turno, values=list(turnos_dict.keys()), state='readonly', width=15)
+		cb_turno.pack(side='left', padx=5)
+		ttk.Label(frame, text='Horas semanales por división de cada materia\n(las horas ya cargadas se respetan y se descuentan)',
+				  background='#f4f6fa').pack(pady=6, anchor='w')
+
+		# Lista desplazable de obligaciones con su carga horaria
+		contenedor = ttk.Frame(frame)
+		contenedor.pack(fill='both', expand=True)
+		canvas = tk.Canvas(contenedor, highlightthickness=0, bg='#f4f6fa')
+		scroll = ttk.Scrollbar(contenedor, orient='vertical', command=canvas.yview)
+		tabla = ttk.Frame(canvas)
+		tabla.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
+		canvas.create_window((0, 0), window=tabla, anchor='nw')
+		canvas.configure(yscrollcommand=scroll.set)
+		canvas.pack(side='left', fill='both', expand=True)
+		scroll.pack(side='right', fill='y')
+		horas_vars: Dict[int, tk.StringVar] = {}
+
+		def cargar_obligaciones(event=None):
+			for widget in tabla.winfo_children():
+				widget.destroy()
+			horas_vars.clear()
+			if not cb_turno.get():
+				return
+			for fila, o in enumerate(obtener_obligaciones_turno(turnos_dict[cb_turno.get()])):
+				ttk.Label(tabla, text=o['nombre']).grid(row=fila, column=0, padx=5, pady=2, sticky='w')
+				ttk.Label(tabla, text=f"{o['divisiones']} div.", foreground='gray').grid(row=fila, column=1, padx=5, pady=2)
+				var = tk.StringVar(value=str(o['horas_sugeridas']))
+				ttk.Spinbox(tabla, from_=0, to=40, width=5, textvariable=var).grid(row=fila, column=2, padx=5, pady=2)
+				horas_vars[o['materia_id']] = var
+		cb_turno.bind('<<ComboboxSelected>>', cargar_obligaciones)
+		turno_actual = getattr(self, 'cb_turno_horario', None)
+		if turno_actual is not None and turno_actual.get() in turnos_dict:
+			cb_turno.set(turno_actual.get())
+			cargar_obligaciones()
+
+		frame_tiempo = ttk.Frame(frame)
+		frame_tiempo.pack(fill='x', pady=6)
+		ttk.Label(frame_tiempo, text='Tiempo de búsqueda (segundos):').pack(side='left', padx=5)
+		tiempo_var = tk.StringVar(value=str(int(GENERADOR_TIEMPO_LIMITE)))
+		ttk.Spinbox(frame_tiempo, from_=1, to=300, width=5, textvariable=tiempo_var).pack(side='left', padx=5)
+		lbl_estado = ttk.Label(frame, text='', background='#f4f6fa')
+		lbl_estado.pack(pady=2)
+		barra = ttk.Progressbar(frame, length=300, mode='indeterminate')
+		barra.pack(pady=2)
+		btn_generar = ttk.Button(frame, text='Generar')
+		btn_generar.pack(pady=8)
+
+		def terminado(solucion):
+			barra.stop()
+			if not win.winfo_exists():
+				return
+			btn_generar.configure(state='normal')
+			lbl_estado.configure(text='')
+			if not solucion['horas_pedidas']:
+				messagebox.showinfo('Generar horario', 'No hay horas pendientes de asignar en el turno.', parent=win)
+				return
+			resumen = (f"Horas ubicadas: {solucion['horas_pedidas'] - solucion['sin_ubicar']} de {solucion['horas_pedidas']} "
+					   f"({solucion['completitud']}%)\n")
+			if solucion['sin_profesor']:
+				resumen += f"Horas sin profesor habilitado en el turno: {solucion['sin_profesor']}\n"
+			resumen += (f"Soluciones comparadas: {solucion['arranques']}\n"
+						f"Horas libres intermedias (divisiones): {solucion['huecos_division']}\n"
+						f"Horas libres intermedias (profesores): {solucion['huecos_profesor']}\n"
+						f"Horas de una misma materia por encima del máximo diario: {solucion['repeticiones']}\n"
+						f"Puntaje (menor es mejor): {solucion['costo']}\n\n"
+						'¿Guardar el horario generado?')
+			if not messagebox.askyesno('Generar horario', resumen, parent=win):
+				return
+			try:
+				escritos = aplicar_solucion_horario(solucion)
+			except Exception as e:
+				messagebox.showerror('Error', f'No se pudo guardar el horario: {str(e)}', parent=win)
+				return
+			win.destroy()
+			messagebox.showinfo('Éxito', f'Se asignaron {escritos} horas.')
+			self._dibujar_grilla_horario_ciclo()
+
+		def fallido(e):
+			barra.stop()
+			if not win.winfo_exists():
+				return
+			btn_generar.configure(state='normal')
+			lbl_estado.configure(text='')
+			messagebox.showerror('Error', f'No se pudo generar el horario: {str(e)}', parent=win)
+
+		def generar():
+			if not cb_turno.get():
+				messagebox.showwarning('Advertencia', 'Seleccione un turno.', parent=win)
+				return
+			try:
+				horas = {materia_id: int(var.get()) for materia_id, var in horas_vars.items()}
+				tiempo = float(tiempo_var.get())
+			except ValueError:
+				messagebox.showwarning('Advertencia', 'Las horas y el tiempo deben ser números.', parent=win)
+				return
+			if any(h < 0 for h in horas.values()) or tiempo <= 0:
+				messagebox.showwarning('Advertencia', 'Las horas y el tiempo deben ser positivos.', parent=win)
+				return
+			turno_id = turnos_dict[cb_turno.get()]
+			btn_generar.configure(state='disabled')
+			lbl_estado.configure(text=f'Buscando horario (hasta {tiempo:g} segundos)...')
+			barra.start(15)
+			self._ejecutar_en_segundo_plano(lambda: generar_horario_turno(turno_id, horas, tiempo_limite=tiempo),
+											al_terminar=terminado, al_fallar=fallido)
+		btn_generar.configure(command=generar)
+
 	def _editar_espacio_horario_ciclo(self, dia, espacio):
 		division_nombre = getattr(self, 'cb_division_horario', None)
 		if not division_nombre or not self.cb_division_horario.get():
@@ -3508,7 +6853,7 @@ class App(tk.Tk):
 		win.configure(bg='#f4f6fa')
 		sufijo = 'ª'
 		win.title(f'{dia} - {espacio}{sufijo} hora')
-		win.geometry('330x270')
+		win.geometry('330x295')
 		win.resizable(False, False)
 		win.transient(self)
 		win.grab_set()
@@ -3557,6 +6902,9 @@ class App(tk.Tk):
 		cb_profesor = ttk.Combobox(form, values=[], state='readonly')
 		cb_profesor.grid(row=3, column=1, padx=5, pady=4, sticky='w')
 		cb_profesor.config(state='disabled')
+		# Aviso aparte: el combobox sólo contiene nombres de profesores
+		lbl_aviso_profesor = ttk.Label(form, text='', foreground='#b03a2e', background='#f4f6fa')
+		lbl_aviso_profesor.grid(row=4, column=1, padx=5, sticky='w')
 
 		def get_profesor_ids():
 			return {p['nombre']: p['id'] for p in obtener_profesores()}
@@ -3564,23 +6912,23 @@ class App(tk.Tk):
 
 		def habilitar_profesor(event=None):
 			materia_nombre = cb_materia.get()
+			lbl_aviso_profesor.config(text='')
 			if materia_nombre:
 				materia_id = None
 				for m in obtener_materias():
 					if m['nombre'] == materia_nombre:
 						materia_id = m['id']
 						break
-				if materia_id is not None:
-					conn = get_connection()
-					cur = conn.cursor()
-					cur.execute('''SELECT p.nombre, p.id FROM profesor p JOIN profesor_materia pm ON p.id = pm.profesor_id WHERE pm.materia_id = ?''', (materia_id,))
-					rows = cur.fetchall()
-					nombres_profesores = sorted([row[0] for row in rows], key=lambda n: n.lower())
+				turno_id = self.turnos_dict_horario.get(self.cb_turno_horario.get())
+				if materia_id is not None and turno_id is not None:
+					# Sólo profesores libres en este slot y habilitados, ordenados por conveniencia
+					sugeridos = sugerir_profesores(turno_id, dia, espacio, materia_id, division_id)
 					nonlocal profesor_ids
-					profesor_ids = {row[0]: row[1] for row in rows}
-					conn.close()
+					profesor_ids = {p['nombre']: p['id'] for p in sugeridos}
 					# Autocompletar si solo hay un profesor
-					autocompletar_combobox(cb_profesor, nombres_profesores, incluir_vacio=True)
+					autocompletar_combobox(cb_profesor, [p['nombre'] for p in sugeridos], incluir_vacio=True)
+					if not sugeridos:
+						lbl_aviso_profesor.config(text='Ningún profesor libre')
 				else:
 					cb_profesor['values'] = []
 					cb_profesor.set('')
@@ -3621,12 +6969,14 @@ class App(tk.Tk):
 			if profesor and not materia:
 				messagebox.showerror('Error', 'Si asigna profesor, también seleccione la materia.')
 				return
+			if profesor and profesor not in profesor_ids:
+				messagebox.showerror('Error', 'El profesor seleccionado no está disponible para esta materia y espacio.')
+				return
 			if not hora_inicio or not hora_fin:
-				conn_tmp = get_connection()
+				conn_tmp = get_connection_lectura()
 				cur_tmp = conn_tmp.cursor()
 				cur_tmp.execute('SELECT turno_id FROM division WHERE id=?', (division_id,))
 				row = cur_tmp.fetchone()
-				conn_tmp.close()
 				if row:
 					default_h = obtener_turno_espacio_hora(row[0], espacio)
 					if default_h:
@@ -3779,8 +7129,7 @@ class App(tk.Tk):
 			ajustar_ancho_combobox()
 			self.cb_profesor_horario.focus_set()
 			# Limpiar la grilla
-			for widget in self.frame_grilla_horario_prof.winfo_children():
-				widget.destroy()
+			self._descartar_grilla('_grilla_prof')
 			return 'break'
 
 		self.cb_turno_horario_prof.bind('<<ComboboxSelected>>', on_turno_selected_prof)
@@ -3814,7 +7163,6 @@ class App(tk.Tk):
 		
 		# Actualizar scroll region cuando cambie el tamaño del frame
 		def actualizar_scroll_region_prof(event=None):
-			self.canvas_horario_prof.update_idletasks()
 			self.canvas_horario_prof.configure(scrollregion=(0, 0, self.frame_grilla_horario_prof.winfo_reqwidth(), self.frame_grilla_horario_prof.winfo_reqheight()))
 		self.frame_grilla_horario_prof.bind('<Configure>', actualizar_scroll_region_prof)
 		
@@ -3853,70 +7201,31 @@ class App(tk.Tk):
 		self.cb_turno_horario_prof.focus_set()
 
 	def _dibujar_grilla_horario_profesor(self):
-		for widget in self.frame_grilla_horario_prof.winfo_children():
-			widget.destroy()
 		profesor_nombre = getattr(self, 'cb_profesor_horario', None)
 		if not profesor_nombre or not self.cb_profesor_horario.get():
+			self._descartar_grilla('_grilla_prof')
 			return
 		turno_nombre = self.cb_turno_horario_prof.get()
 		if not turno_nombre:
+			self._descartar_grilla('_grilla_prof')
 			return
 		profesor_id = self.profesores_dict_horario[self.cb_profesor_horario.get()]
 		turno_id = self.turnos_dict_horario_prof[turno_nombre]
 
-		# Obtener horarios del profesor
-		horarios = obtener_horarios_profesor(profesor_id, turno_id)
-
-		dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
-		# Encabezados - igual que en vista por ciclo
-		# Celda vacía en esquina superior izquierda
-		ttk.Label(self.frame_grilla_horario_prof, text='', font=('Segoe UI', 10, 'bold'), background='#f4f6fa').grid(row=0, column=0, padx=(0,0), pady=2, sticky='nsew')
-		# Días de la semana
-		for col, dia in enumerate(dias, start=1):
-			ttk.Label(self.frame_grilla_horario_prof, text=dia, font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a').grid(row=0, column=col, padx=(0,0), pady=2, sticky='nsew')
-
-		# Configuración de columnas igual que en vista por ciclo
-		self.frame_grilla_horario_prof.columnconfigure(0, weight=0, minsize=52)
-		for c in range(1, 6):
-			self.frame_grilla_horario_prof.columnconfigure(c, weight=1, minsize=150)
-
-		self._grilla_botones_prof = []
-		for esp in range(1, self.espacios_por_dia_prof + 1):
-			# Etiqueta igual que en vista por ciclo
-			etiqueta = f"{esp}ª"
-			ttk.Label(self.frame_grilla_horario_prof, text=etiqueta, font=('Segoe UI', 10, 'bold'), background='#e0e7ef', foreground='#2a3a4a', anchor='center').grid(row=esp, column=0, padx=(0,0), pady=2, sticky='nsew')
-			self.frame_grilla_horario_prof.rowconfigure(esp, weight=1, minsize=38)
-
-			fila_botones = []
-			for col, dia in enumerate(dias, start=1):
-				h = next((ho for ho in horarios if ho['dia'] == dia and ho['espacio'] == esp), None)
-				texto = ''
-				if h:
-					texto = f"{h['materia'] or ''}\n{h['division'] or ''}\n{h['hora_inicio'] or ''}-{h['hora_fin'] or ''}"
-				btn = tk.Button(self.frame_grilla_horario_prof, text=texto, wraplength=100, anchor='w', justify='left',
-								bg='#ffffff', relief='ridge', bd=1,
-								command=lambda d=dia, e=esp: self._editar_espacio_horario_profesor(d, e))
-				btn.grid(row=esp, column=col, padx=1, pady=1, sticky='nsew')
-				fila_botones.append(btn)
-			self._grilla_botones_prof.append(fila_botones)
-
-		# Ajustar wraplength dinámicamente
-		def actualizar_wraplength_prof(event=None):
-			for esp, fila in enumerate(self._grilla_botones_prof):
-				for col, btn in enumerate(fila):
-					info = btn.grid_info()
-					col_idx = info['column']
-					width = self.frame_grilla_horario_prof.grid_bbox(col_idx, esp+1)[2]
-					btn.config(wraplength=max(width-8, 60))
-		self.frame_grilla_horario_prof.bind('<Configure>', actualizar_wraplength_prof)
-		self.after(100, lambda: self.frame_grilla_horario_prof.event_generate('<Configure>'))
-		
-		# Actualizar la región de scroll
-		def actualizar_scroll_prof():
-			self.frame_grilla_horario_prof.update_idletasks()
-			self.canvas_horario_prof.configure(scrollregion=(0, 0, self.frame_grilla_horario_prof.winfo_reqwidth(), self.frame_grilla_horario_prof.winfo_reqheight()))
+		# Matriz (dia, espacio) del profesor, la misma que usa el diálogo de edición
+		matriz = obtener_matriz_horario_profesor(profesor_id, turno_id)
+		textos = {celda: f"{h['materia'] or ''}\n{h['division'] or ''}\n{h['hora_inicio'] or ''}-{h['hora_fin'] or ''}"
+				  for celda, h in matriz.items()}
+
+		# Misma grilla persistente que la vista por ciclo, con columnas algo más anchas
+		grilla = self._grilla_persistente('_grilla_prof', self.frame_grilla_horario_prof,
+										  self.espacios_por_dia_prof, self._editar_espacio_horario_profesor,
+										  ancho_columna=150, ancho_indice=52)
+		clave = (profesor_id, turno_id)
+		cambio_profesor = grilla.clave != clave
+		grilla.actualizar(textos, clave=clave)
+		if cambio_profesor:
 			self.canvas_horario_prof.yview_moveto(0)
-		self.after(150, actualizar_scroll_prof)
 
 	def _limpiar_horarios_vacios_profesor(self):
 		"""Elimina horarios de profesor que solo tienen hora de inicio y fin, sin división ni materia"""
@@ -3934,18 +7243,7 @@ class App(tk.Tk):
 			return
 		
 		try:
-			conn = get_connection()
-			c = conn.cursor()
-			# Eliminar horarios que solo tengan horas pero no división ni materia
-			c.execute('''DELETE FROM horario 
-						WHERE profesor_id = ? 
-						AND turno_id = ?
-						AND (division_id IS NULL OR division_id = '') 
-						AND (materia_id IS NULL OR materia_id = '')
-						AND (hora_inicio IS NOT NULL OR hora_fin IS NOT NULL)''', (profesor_id, turno_id))
-			eliminados = c.rowcount
-			conn.commit()
-			conn.close()
+			eliminados = limpiar_horarios_vacios_profesor(profesor_id, turno_id)
 			
 			messagebox.showinfo('Éxito', f'Se eliminaron {eliminados} horarios vacíos.')
 			self._dibujar_grilla_horario_profesor()
@@ -3960,9 +7258,8 @@ class App(tk.Tk):
 		profesor_id = self.profesores_dict_horario[self.cb_profesor_horario.get()]
 		turno_id = self.turnos_dict_horario_prof[self.cb_turno_horario_prof.get()]
 		
-		# Obtener horario existente si hay
-		horarios = obtener_horarios_profesor(profesor_id, turno_id)
-		h_existente = next((h for h in horarios if h['dia'] == dia and h['espacio'] == espacio), None)
+		# Obtener horario existente si hay (matriz compartida con la grilla)
+		h_existente = obtener_matriz_horario_profesor(profesor_id, turno_id).get((dia, espacio))
 		
 		# Ventana de edición - estilo similar a por ciclo
 		win = tk.Toplevel(self)
@@ -4070,11 +7367,11 @@ class App(tk.Tk):
 			plan_id = plan_ids[plan_nombre]
 			
 			# Obtener divisiones del turno, plan y ciclo seleccionados
-			divisiones = obtener_divisiones()
-			divisiones_filtradas = [d for d in divisiones 
-								  if d['turno_id'] == turno_id 
-								  and d['plan_id'] == plan_id
-								  and d['ciclo_id'] == ciclo_id]
+			divisiones_filtradas = obtener_divisiones_de(turno_id, plan_id, ciclo_id)
+			# Sólo las que no tienen clase en ese día/espacio (además de la ya asignada)
+			libres = set(obtener_divisiones_libres(turno_id, dia, espacio, [d['id'] for d in divisiones_filtradas]))
+			division_actual = h_existente['division'] if h_existente else None
+			divisiones_filtradas = [d for d in divisiones_filtradas if d['id'] in libres or d['nombre'] == division_actual]
 			division_nombres = [d['nombre'] for d in divisiones_filtradas]
 			division_ids = {d['nombre']: d['id'] for d in divisiones_filtradas}
 			
@@ -4296,7 +7593,7 @@ class App(tk.Tk):
 				messagebox.showerror('Error', 'Seleccione un turno.')
 				return
 			turno_id = turnos_dict[nombre]
-			# Guardar cada espacio
+			horas = {}
 			for esp in entries:
 				hi = entries[esp][0].get().strip()
 				hf = entries[esp][1].get().strip()
@@ -4305,154 +7602,76 @@ class App(tk.Tk):
 					hi = ''
 				if hf == 'hh:mm':
 					hf = ''
-				set_turno_espacio_hora(turno_id, esp, hi if hi else None, hf if hf else None)
+				horas[esp] = (hi or None, hf or None)
+
+			# Verificar si estamos en la vista de horarios por profesor con un profesor seleccionado
+			# Debemos verificar que exista cb_turno_horario_prof (específico de vista profesor)
+			# y NO solo cb_turno_horario (que es de vista ciclo)
+			en_vista_profesor = (hasattr(self, 'cb_turno_horario_prof') and 
+								hasattr(self, 'cb_profesor_horario') and 
+								hasattr(self, 'profesores_dict_horario') and 
+								self.cb_turno_horario_prof.winfo_exists() and
+								self.cb_profesor_horario.get() and 
+								self.cb_profesor_horario.get() in self.profesores_dict_horario)
 			
-			# Aplicar a horarios existentes si se pidió
-			if apply_actual_var.get() or apply_todos_var.get():
-				conn = get_connection()
-				c = conn.cursor()
-				dias = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes']
-				
-				# Verificar si estamos en la vista de horarios por profesor con un profesor seleccionado
-				# Debemos verificar que exista cb_turno_horario_prof (específico de vista profesor)
-				# y NO solo cb_turno_horario (que es de vista ciclo)
-				en_vista_profesor = (hasattr(self, 'cb_turno_horario_prof') and 
-									hasattr(self, 'cb_profesor_horario') and 
-									hasattr(self, 'profesores_dict_horario') and 
-									self.cb_turno_horario_prof.winfo_exists() and
-									self.cb_profesor_horario.get() and 
-									self.cb_profesor_horario.get() in self.profesores_dict_horario)
-				
-				# Verificar si estamos en la vista de horarios por ciclo con una división seleccionada
-				en_vista_ciclo = (hasattr(self, 'cb_turno_horario') and 
-								hasattr(self, 'cb_division_horario') and 
-								hasattr(self, 'divisiones_dict_horario') and
-								self.cb_turno_horario.winfo_exists() and
-								self.cb_division_horario.get() and 
-								self.cb_division_horario.get() in self.divisiones_dict_horario)
-				
-				if apply_actual_var.get():
-					# Aplicar solo al horario actual (profesor o división seleccionada)
-					if en_vista_profesor:
-						# Aplicar solo al profesor seleccionado
-						profesor_id = self.profesores_dict_horario[self.cb_profesor_horario.get()]
-						for esp in entries:
-							hi = entries[esp][0].get().strip()
-							hf = entries[esp][1].get().strip()
-							# Ignorar placeholders
-							if hi == 'hh:mm':
-								hi = None
-							if hf == 'hh:mm':
-								hf = None
-							if hi is None and hf is None:
-								continue
-							
-							for dia in dias:
-								# Si existe fila para profesor+dia+espacio+turno, actualizar
-								c.execute('SELECT id FROM horario WHERE profesor_id=? AND turno_id=? AND espacio=? AND dia=?', (profesor_id, turno_id, esp, dia))
-								row = c.fetchone()
-								if row:
-									# Sobrescribir las horas existentes con los nuevos valores
-									c.execute('UPDATE horario SET hora_inicio = ?, hora_fin = ? WHERE id=?', (hi, hf, row[0]))
-								else:
-									# Insertar nuevo horario con division y materia NULL
-									c.execute('INSERT INTO horario (profesor_id, turno_id, dia, espacio, hora_inicio, hora_fin, division_id, materia_id) VALUES (?, ?, ?, ?, ?, ?, NULL, NULL)', (profesor_id, turno_id, dia, esp, hi, hf))
-					
-					elif en_vista_ciclo:
-						# Aplicar solo a la división seleccionada
-						division_id = self.divisiones_dict_horario[self.cb_division_horario.get()]
-						for esp in entries:
-							hi = entries[esp][0].get().strip()
-							hf = entries[esp][1].get().strip()
-							# Ignorar placeholders
-							if hi == 'hh:mm':
-								hi = None
-							if hf == 'hh:mm':
-								hf = None
-							if hi is None and hf is None:
-								continue
-							
-							for dia in dias:
-								# Si existe fila para division+dia+espacio, actualizar
-								c.execute('SELECT id FROM horario WHERE division_id=? AND espacio=? AND dia=?', (division_id, esp, dia))
-								row = c.fetchone()
-								if row:
-									# Sobrescribir las horas existentes con los nuevos valores
-									c.execute('UPDATE horario SET hora_inicio = ?, hora_fin = ? WHERE id=?', (hi, hf, row[0]))
-								else:
-									# Insertar nuevo horario con materia y profesor NULL
-									c.execute('INSERT INTO horario (division_id, dia, espacio, hora_inicio, hora_fin, materia_id, profesor_id) VALUES (?, ?, ?, ?, ?, NULL, NULL)', (division_id, dia, esp, hi, hf))
+			# Verificar si estamos en la vista de horarios por ciclo con una división seleccionada
+			en_vista_ciclo = (hasattr(self, 'cb_turno_horario') and 
+							hasattr(self, 'cb_division_horario') and 
+							hasattr(self, 'divisiones_dict_horario') and
+							self.cb_turno_horario.winfo_exists() and
+							self.cb_division_horario.get() and 
+							self.cb_division_horario.get() in self.divisiones_dict_horario)
+
+			# Destino de la aplicación masiva: None = todos los del turno
+			aplicar = None
+			if apply_todos_var.get() or apply_actual_var.get():
+				if en_vista_profesor:
+					ids = None if apply_todos_var.get() else [self.profesores_dict_horario[self.cb_profesor_horario.get()]]
+					aplicar = (aplicar_horas_turno_a_profesores, ids)
+				elif en_vista_ciclo:
+					ids = None if apply_todos_var.get() else [self.divisiones_dict_horario[self.cb_division_horario.get()]]
+					aplicar = (aplicar_horas_turno_a_divisiones, ids)
+
+			def tarea():
+				# Plantilla y aplicación en una sola transacción, fuera del hilo de la interfaz
+				with transaccion():
+					for esp, (hi, hf) in horas.items():
+						set_turno_espacio_hora(turno_id, esp, hi, hf)
+					if aplicar:
+						funcion, ids = aplicar
+						return funcion(turno_id, horas, ids)
+				return 0
+
+			def al_terminar(filas):
+				# Refrescar la grilla dependiendo de la vista activa
+				if hasattr(self, 'cb_profesor_horario') and hasattr(self, 'cb_turno_horario_prof') and self.cb_turno_horario_prof.winfo_exists() and self.cb_profesor_horario.get():
+					self._dibujar_grilla_horario_profesor()
+				elif hasattr(self, 'cb_division_horario') and hasattr(self, 'cb_turno_horario') and self.cb_turno_horario.winfo_exists() and self.cb_division_horario.get():
+					self._dibujar_grilla_horario_ciclo()
 				
-				if apply_todos_var.get():
-					# Aplicar a todos los horarios del turno
-					if en_vista_profesor:
-						# Aplicar a todos los profesores del turno
-						c.execute('SELECT profesor_id FROM profesor_turno WHERE turno_id=?', (turno_id,))
-						profesores_turno = [r[0] for r in c.fetchall()]
-						for prof_id in profesores_turno:
-							for esp in entries:
-								hi = entries[esp][0].get().strip()
-								hf = entries[esp][1].get().strip()
-								# Ignorar placeholders
-								if hi == 'hh:mm':
-									hi = None
-								if hf == 'hh:mm':
-									hf = None
-								if hi is None and hf is None:
-									continue
-								
-								for dia in dias:
-									# Si existe fila para profesor+dia+espacio+turno, actualizar
-									c.execute('SELECT id FROM horario WHERE profesor_id=? AND turno_id=? AND espacio=? AND dia=?', (prof_id, turno_id, esp, dia))
-									row = c.fetchone()
-									if row:
-										# Sobrescribir las horas existentes con los nuevos valores
-										c.execute('UPDATE horario SET hora_inicio = ?, hora_fin = ? WHERE id=?', (hi, hf, row[0]))
-									else:
-										# Insertar nuevo horario con division y materia NULL
-										c.execute('INSERT INTO horario (profesor_id, turno_id, dia, espacio, hora_inicio, hora_fin, division_id, materia_id) VALUES (?, ?, ?, ?, ?, ?, NULL, NULL)', (prof_id, turno_id, dia, esp, hi, hf))
-					elif en_vista_ciclo:
-						# Aplicar a todas las divisiones del turno (vista por ciclo)
-						c.execute('SELECT id FROM division WHERE turno_id=?', (turno_id,))
-						divs = [r[0] for r in c.fetchall()]
-						for div in divs:
-							for esp in entries:
-								hi = entries[esp][0].get().strip()
-								hf = entries[esp][1].get().strip()
-								# Ignorar placeholders
-								if hi == 'hh:mm':
-									hi = None
-								if hf == 'hh:mm':
-									hf = None
-								if hi is None and hf is None:
-									continue
-								
-								for dia in dias:
-									# Si existe fila para division+dia+espacio, actualizar
-									c.execute('SELECT id FROM horario WHERE division_id=? AND espacio=? AND dia=?', (div, esp, dia))
-									row = c.fetchone()
-									if row:
-										# Sobrescribir las horas existentes con los nuevos valores
-										c.execute('UPDATE horario SET hora_inicio = ?, hora_fin = ? WHERE id=?', (hi, hf, row[0]))
-									else:
-										# Insertar nuevo horario con materia y profesor NULL
-										c.execute('INSERT INTO horario (division_id, dia, espacio, hora_inicio, hora_fin, materia_id, profesor_id) VALUES (?, ?, ?, ?, ?, NULL, NULL)', (div, dia, esp, hi, hf))
-				
-				conn.commit()
-				conn.close()
-			
-			# Refrescar la grilla dependiendo de la vista activa
-			if hasattr(self, 'cb_profesor_horario') and hasattr(self, 'cb_turno_horario_prof') and self.cb_turno_horario_prof.winfo_exists() and self.cb_profesor_horario.get():
-				self._dibujar_grilla_horario_profesor()
-			elif hasattr(self, 'cb_division_horario') and hasattr(self, 'cb_turno_horario') and self.cb_turno_horario.winfo_exists() and self.cb_division_horario.get():
-				self._dibujar_grilla_horario_ciclo()
-			
-			messagebox.showinfo('OK', 'Valores guardados.')
-			win.destroy()
+				mensaje = 'Valores guardados.'
+				if aplicar:
+					mensaje += f'\nHorarios actualizados: {filas}.'
+				messagebox.showinfo('OK', mensaje)
+				win.destroy()
+
+			def al_fallar(error):
+				if not win.winfo_exists():
+					# Ventana cerrada durante el guardado: avisar igual, sin tocar sus widgets
+					messagebox.showerror('Error', f'Error al guardar las horas: {error}')
+					return
+				btn_guardar.config(state='normal')
+				win.config(cursor='')
+				messagebox.showerror('Error', f'Error al guardar las horas: {error}', parent=win)
+
+			btn_guardar.config(state='disabled')
+			win.config(cursor='watch')
+			self._ejecutar_en_segundo_plano(tarea, al_terminar, al_fallar)
 
 		btns = ttk.Frame(frame)
 		btns.grid(row=11, column=0, columnspan=5, pady=15)
-		ttk.Button(btns, text='Guardar', command=guardar, width=12).pack(side='left', padx=5)
+		btn_guardar = ttk.Button(btns, text='Guardar', command=guardar, width=12)
+		btn_guardar.pack(side='left', padx=5)
 		ttk.Button(btns, text='Cancelar', command=win.destroy, width=12).pack(side='left', padx=5)
 
 	def mostrar_turnos_planes_materias(self):
@@ -4673,29 +7892,24 @@ class App(tk.Tk):
 		self._recargar_materias_tab()
 
 		# Filtro en tiempo real
-		def filtrar_materias(*args):
-			filtro = self.filtro_materia.get().lower()
-			materias_filtradas = [m for m in obtener_materias() if filtro in m['nombre'].lower()]
-			self._recargar_materias_tab(materias_filtradas)
-		self.filtro_materia.trace_add('write', filtrar_materias)
+		def filtrar_materias():
+			if not self.tree_materias_tab.winfo_exists():
+				return
+			self._recargar_materias_tab(buscar_materias(self.filtro_materia.get()))
+		self.filtro_materia.trace_add('write', lambda *args: self._demorar('filtro_materias', filtrar_materias))
 	
 	def _recargar_materias_tab(self, materias=None):
 		"""Recarga la tabla de materias manteniendo las selecciones"""
 		if materias is None:
 			materias = obtener_materias()
 		
-		# Limpiar tabla
-		for row in self.tree_materias_tab.get_children():
-			self.tree_materias_tab.delete(row)
-		
 		# Ordenar alfabéticamente
 		materias_ordenadas = sorted(materias, key=lambda m: m['nombre'].lower())
 		
-		# Insertar materias con indicador de selección
-		for materia in materias_ordenadas:
-			seleccionado = '☑' if materia['id'] in self.materias_seleccionadas else '☐'
-			self.tree_materias_tab.insert('', 'end', iid=materia['id'], 
-										 values=(seleccionado, materia['nombre'], materia['horas_semanales']))
+		# Sincronizar solo las filas que cambiaron, con indicador de selección
+		sincronizar_treeview(self.tree_materias_tab, (
+			(materia['id'], ('☑' if materia['id'] in self.materias_seleccionadas else '☐', materia['nombre'], materia['horas_semanales']))
+			for materia in materias_ordenadas))
 		
 		# Actualizar heading según el estado
 		self._actualizar_heading_seleccion()
@@ -4731,7 +7945,7 @@ class App(tk.Tk):
 		# Actualizar visualización
 		valores = self.tree_materias_tab.item(item, 'values')
 		nuevo_check = '☑' if materia_id in self.materias_seleccionadas else '☐'
-		self.tree_materias_tab.item(item, values=(nuevo_check, valores[1], valores[2]))
+		actualizar_fila_treeview(self.tree_materias_tab, item, (nuevo_check, valores[1], valores[2]))
 		
 		# Actualizar heading
 		self._actualizar_heading_seleccion()
@@ -5195,11 +8409,10 @@ class App(tk.Tk):
 			try:
 				# Actualizar nombre del plan si cambió
 				if nombre != plan_actual['nombre']:
-					conn = get_connection()
-					c = conn.cursor()
-					c.execute('UPDATE plan_estudio SET nombre=? WHERE id=?', (nombre, self.plan_seleccionado_id))
-					conn.commit()
-					conn.close()
+					with transaccion() as conn:
+						c = conn.cursor()
+						c.execute('UPDATE plan_estudio SET nombre=? WHERE id=?', (nombre, self.plan_seleccionado_id))
+						_catalogo_referencia.marcar_cambio()
 				
 				# Actualizar turnos: quitar los que ya no están, agregar los nuevos
 				turnos_actuales_set = set(turnos_actuales_ids)
@@ -5737,6 +8950,9 @@ class App(tk.Tk):
 				
 				messagebox.showinfo('Éxito', 'Los turnos han sido actualizados correctamente.', parent=win)
 				win.destroy()
+				# Las clases que dictaba en los turnos quitados quedaron inválidas
+				if turnos_a_quitar:
+					self._ofrecer_reparacion_horario(sorted(turnos_a_quitar))
 				
 			except Exception as e:
 				messagebox.showerror('Error', str(e), parent=win)
@@ -6086,14 +9302,117 @@ class App(tk.Tk):
 	
 	def crear_backup_manual(self):
 		"""Crea un backup manual de la base de datos con timestamp"""
-		try:
-			backup_path = crear_backup_db(manual=True)
-			backup_name = os.path.basename(backup_path)
+		self._ejecutar_backup(manual=True)
+	
+	def _tarea_con_progreso(self, titulo: str, texto: str, tarea, al_terminar, al_fallar):
+		"""Corre `tarea(progreso)` en segundo plano con una ventana de avance en páginas"""
+		win = tk.Toplevel(self)
+		win.title(titulo)
+		win.geometry('360x120')
+		win.resizable(False, False)
+		win.transient(self)
+		win.protocol('WM_DELETE_WINDOW', lambda: None)  # No cerrar mientras copia
+		lbl_estado = ttk.Label(win, text=f'{texto}...')
+		lbl_estado.pack(pady=(15, 5))
+		barra = ttk.Progressbar(win, length=300, mode='determinate')
+		barra.pack(pady=5)
+		
+		# El hilo de trabajo sólo escribe aquí; la barra se actualiza desde Tk
+		avance = {'copiadas': 0, 'total': 0}
+		
+		def registrar(copiadas, total):
+			avance['copiadas'] = copiadas
+			avance['total'] = total
+		
+		def refrescar():
+			if not win.winfo_exists():
+				return
+			if avance['total']:
+				barra.configure(maximum=avance['total'], value=avance['copiadas'])
+				lbl_estado.configure(text=f"{texto}: página {avance['copiadas']} de {avance['total']}...")
+			win.after(100, refrescar)
+		
+		def terminado(resultado):
+			win.destroy()
+			al_terminar(resultado)
+		
+		def fallido(e):
+			win.destroy()
+			al_fallar(e)
+		
+		refrescar()
+		self._ejecutar_en_segundo_plano(lambda: tarea(registrar), al_terminar=terminado, al_fallar=fallido)
+	
+	def _ejecutar_backup(self, manual: bool):
+		"""Corre crear_backup_db en segundo plano mostrando el avance"""
+		def terminado(backup):
+			self._recargar_backups_tree()
+			if backup['duplicado']:
+				messagebox.showinfo('Backup',
+								   'La base no cambió desde el último backup; se conserva:\n\n'
+								   f"{backup['nombre']}")
+				return
 			messagebox.showinfo('Éxito', 
-							   f'Backup creado exitosamente:\n\n{backup_name}\n\n'
-							   f'Ubicación:\n{os.path.dirname(backup_path)}')
-		except Exception as e:
-			messagebox.showerror('Error', f'Error al crear backup:\n{str(e)}')
+							   f"Backup creado y verificado:\n\n{backup['nombre']}\n\n"
+							   f"Ubicación:\n{os.path.dirname(backup['ruta'])}")
+		
+		self._tarea_con_progreso('Creando backup', 'Copiando base de datos',
+								 lambda progreso: crear_backup_db(manual=manual, progreso=progreso),
+								 terminado,
+								 lambda e: messagebox.showerror('Error', f'Error al crear backup:\n{str(e)}'))
+	
+	def _restaurar_backup_seleccionado(self):
+		"""Restaura el backup seleccionado sobre la base en uso"""
+		if not self.backup_seleccionado:
+			messagebox.showwarning('Atención', 'Seleccione un backup para restaurar.')
+			return
+		nombre_backup = os.path.basename(self.backup_seleccionado)
+		if not messagebox.askyesno('Confirmar',
+								   f'Se reemplazarán todos los datos actuales por los del backup:\n\n{nombre_backup}\n\n'
+								   'Antes se guardará un backup del estado actual.\n'
+								   'Al terminar deberá iniciar sesión nuevamente.\n\n'
+								   '¿Desea continuar?'):
+			return
+		ruta = self.backup_seleccionado
+		self._ejecutar_restauracion(lambda progreso: restaurar_backup(ruta, progreso=progreso))
+	
+	def _restaurar_a_fecha(self):
+		"""Reconstruye la base al estado de una fecha con los backups y el registro de cambios"""
+		hasta = simpledialog.askstring('Restaurar a una fecha',
+									   'Fecha y hora a recuperar (AAAA-MM-DD HH:MM:SS):',
+									   initialvalue=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+									   parent=self)
+		if not hasta:
+			return
+		try:
+			hasta = datetime.strptime(hasta.strip(), '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+		except ValueError:
+			messagebox.showerror('Error', 'Formato de fecha inválido. Use AAAA-MM-DD HH:MM:SS.')
+			return
+		if not messagebox.askyesno('Confirmar',
+								   f'Se reemplazarán todos los datos actuales por su estado al {hasta}.\n\n'
+								   'Antes se guardará un backup del estado actual.\n'
+								   'Al terminar deberá iniciar sesión nuevamente.\n\n'
+								   '¿Desea continuar?'):
+			return
+		self._ejecutar_restauracion(lambda progreso: restaurar_backup(None, hasta=hasta, progreso=progreso))
+	
+	def _ejecutar_restauracion(self, tarea):
+		def terminado(resultado):
+			mensaje = f"Base restaurada desde:\n{resultado['origen']}"
+			if resultado['previo']:
+				mensaje += f"\n\nEl estado anterior quedó guardado en:\n{resultado['previo']}"
+			if resultado['aviso']:
+				mensaje += f"\n\nAviso: {resultado['aviso']}"
+			messagebox.showinfo('Restauración completa', mensaje)
+			# Los usuarios pueden haber cambiado: volver al login
+			self.usuario_actual = None
+			self.limpiar_frame()
+			self.config(menu=tk.Menu(self))
+			self._mostrar_login()
+		
+		self._tarea_con_progreso('Restaurando backup', 'Restaurando base de datos', tarea, terminado,
+								 lambda e: messagebox.showerror('Error', f'No se pudo restaurar:\n{str(e)}'))
 	
 	def mostrar_lista_backups(self):
 		"""Muestra la lista de backups disponibles"""
@@ -6110,10 +9429,10 @@ class App(tk.Tk):
 		info_frame.pack(pady=5, padx=20, fill='x')
 		
 		ttk.Label(info_frame, 
-				 text='ℹ️  Se crea un backup automático (institucion.bak) cada vez que inicia el programa.',
+				 text='ℹ️  Se crea un backup automático cada vez que inicia el programa (si hubo cambios).',
 				 font=('Segoe UI', 9), foreground='#555').pack(anchor='w')
 		ttk.Label(info_frame,
-				 text='    Los backups manuales incluyen fecha y hora en el nombre.',
+				 text='    Se conservan los más recientes y el último de cada hora, día y semana; los demás se eliminan.',
 				 font=('Segoe UI', 9), foreground='#555').pack(anchor='w')
 		
 		# Frame principal con dos columnas
@@ -6137,6 +9456,10 @@ class App(tk.Tk):
 				  command=self._abrir_ubicacion_backups, width=18).pack(pady=3)
 		ttk.Button(aside, text='Eliminar Backup', 
 				  command=self._eliminar_backup_seleccionado, width=18).pack(pady=3)
+		ttk.Button(aside, text='Restaurar Backup', 
+				  command=self._restaurar_backup_seleccionado, width=18).pack(pady=3)
+		ttk.Button(aside, text='Restaurar a Fecha', 
+				  command=self._restaurar_a_fecha, width=18).pack(pady=3)
 		
 		# Contenido derecho
 		content = ttk.Frame(main_frame)
@@ -6148,13 +9471,14 @@ class App(tk.Tk):
 		
 		column_config = {
 			'Nombre': {'width': 280, 'anchor': 'w'},
+			'Tipo': {'width': 90, 'anchor': 'center'},
 			'Fecha': {'width': 140, 'anchor': 'center'},
 			'Tamaño': {'width': 100, 'anchor': 'center'}
 		}
 		
 		self.tree_backups = crear_treeview(frame_tabla,
-										  ('Nombre', 'Fecha', 'Tamaño'),
-										  ('Nombre del Archivo', 'Fecha de Creación', 'Tamaño'),
+										  ('Nombre', 'Tipo', 'Fecha', 'Tamaño'),
+										  ('Nombre del Archivo', 'Tipo', 'Fecha de Creación', 'Tamaño'),
 										  column_config=column_config)
 		
 		self._recargar_backups_tree()
@@ -6168,17 +9492,16 @@ class App(tk.Tk):
 		if not hasattr(self, 'tree_backups'):
 			return
 		
-		for row in self.tree_backups.get_children():
-			self.tree_backups.delete(row)
-		
 		try:
 			backups = listar_backups()
 			
 			if not backups:
 				# Insertar mensaje si no hay backups
-				self.tree_backups.insert('', 'end', values=('No hay backups disponibles', '', ''))
+				sincronizar_treeview(self.tree_backups, [])
+				self.tree_backups.insert('', 'end', values=('No hay backups disponibles', '', '', ''))
 				return
 			
+			filas = []
 			for backup in backups:
 				# Formatear tamaño
 				tamaño_kb = backup['tamaño'] / 1024
@@ -6187,11 +9510,11 @@ class App(tk.Tk):
 				else:
 					tamaño_mb = tamaño_kb / 1024
 					tamaño_str = f'{tamaño_mb:.2f} MB'
-				
-				# Insertar en el árbol
-				self.tree_backups.insert('', 'end', 
-										iid=backup['ruta'],
-										values=(backup['nombre'], backup['fecha'], tamaño_str))
+				tipo = {'manual': 'Manual', 'automatico': 'Automático'}.get(backup['tipo'], 'Anterior')
+				filas.append((backup['ruta'], (backup['nombre'], tipo, backup['fecha'], tamaño_str)))
+			
+			# Aplicar solo las diferencias con lo que ya muestra el árbol
+			sincronizar_treeview(self.tree_backups, filas)
 		except Exception as e:
 			messagebox.showerror('Error', f'Error al listar backups:\n{str(e)}')
 	
@@ -6206,12 +9529,13 @@ class App(tk.Tk):
 	def _abrir_ubicacion_backups(self):
 		"""Abre el explorador de archivos en la ubicación de los backups"""
 		try:
+			os.makedirs(DIR_BACKUPS, exist_ok=True)
 			if sys.platform == 'win32':
-				os.startfile(DB_DIR)
+				os.startfile(DIR_BACKUPS)
 			elif sys.platform == 'darwin':  # macOS
-				os.system(f'open "{DB_DIR}"')
+				os.system(f'open "{DIR_BACKUPS}"')
 			else:  # Linux
-				os.system(f'xdg-open "{DB_DIR}"')
+				os.system(f'xdg-open "{DIR_BACKUPS}"')
 		except Exception as e:
 			messagebox.showerror('Error', f'Error al abrir ubicación:\n{str(e)}')
 	
@@ -6221,32 +9545,30 @@ class App(tk.Tk):
 			messagebox.showwarning('Atención', 'Seleccione un backup para eliminar.')
 			return
 		
-		# Verificar que no sea el backup automático
 		nombre_backup = os.path.basename(self.backup_seleccionado)
 		
-		if nombre_backup == 'institucion.bak':
-			if not messagebox.askyesno('Confirmar',
-									   'Este es el backup automático.\n'
-									   'Se volverá a crear en el próximo inicio.\n\n'
-									   '¿Está seguro de eliminarlo?'):
-				return
-		else:
-			if not messagebox.askyesno('Confirmar', 
-									   f'¿Está seguro de eliminar el backup:\n\n{nombre_backup}?'):
-				return
+		if not messagebox.askyesno('Confirmar', 
+								   f'¿Está seguro de eliminar el backup:\n\n{nombre_backup}?'):
+			return
 		
 		try:
-			if os.path.exists(self.backup_seleccionado):
-				os.remove(self.backup_seleccionado)
-				messagebox.showinfo('Éxito', 'Backup eliminado correctamente.')
-				self._recargar_backups_tree()
-				self.backup_seleccionado = None
-			else:
-				messagebox.showerror('Error', 'El archivo de backup no existe.')
+			eliminar_backup(self.backup_seleccionado)
+			messagebox.showinfo('Éxito', 'Backup eliminado correctamente.')
+			self._recargar_backups_tree()
+			self.backup_seleccionado = None
 		except Exception as e:
 			messagebox.showerror('Error', f'Error al eliminar backup:\n{str(e)}')
 
 if __name__ == "__main__":
-	init_db()
+	# Necesario para los procesos del generador de horarios en el ejecutable de PyInstaller
+	multiprocessing.freeze_support()
+	# Reconstrucción sin interfaz: --reconstruir DESTINO ["AAAA-MM-DD HH:MM:SS"]
+	if len(sys.argv) in (3, 4) and sys.argv[1] == '--reconstruir':
+		resultado = reconstruir_base(sys.argv[2], sys.argv[3] if len(sys.argv) == 4 else None)
+		print(f"Base reconstruida en {sys.argv[2]} desde {resultado['backup']}: "
+			  f"{resultado['aplicadas']} transacciones aplicadas, hasta {resultado['fecha']}.")
+		if resultado['aviso']:
+			print('Aviso:', resultado['aviso'])
+		sys.exit(0)
 	app = App()
 	app.mainloop()
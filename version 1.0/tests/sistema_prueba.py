@@ -0,0 +1,71 @@
+"""Utilidades de las pruebas: cada prueba usa una copia de SistemaEscolar_v1 con su propia base."""
+import importlib.util
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_numeros = itertools.count(1)
+
+
+def cargar_sistema(directorio: str):
+	"""Importa una copia del módulo en `directorio` (la base y los backups quedan ahí) e inicializa la base."""
+	ruta = os.path.join(directorio, 'SistemaEscolar_v1.py')
+	shutil.copy(os.path.join(RAIZ, 'SistemaEscolar_v1.py'), ruta)
+	spec = importlib.util.spec_from_file_location(f'sistema_prueba_{next(_numeros)}', ruta)
+	modulo = importlib.util.module_from_spec(spec)
+	spec.loader.exec_module(modulo)
+	modulo.init_db()
+	return modulo
+
+
+class PruebaSistema(unittest.TestCase):
+	"""Caso base: `self.s` es el módulo aislado; `cargar_escuela()` arma un turno de ejemplo."""
+
+	def setUp(self):
+		self._directorio = tempfile.TemporaryDirectory()
+		self.s = cargar_sistema(self._directorio.name)
+
+	def tearDown(self):
+		self.s._gestor_conexiones.cerrar_todas()
+		self._directorio.cleanup()
+
+	@property
+	def directorio(self) -> str:
+		return self._directorio.name
+
+	def filas(self, sql: str, parametros=()) -> list:
+		return self.s.get_connection_lectura().execute(sql, parametros).fetchall()
+
+	def cargar_escuela(self):
+		"""Turno 1 con espacios 1..4 y dos divisiones (ciclo 1, plan 1).
+
+		Materias: 1 y 2. Profesores: 1 (materia 1), 2 (materias 1 y 2) y 3 (materia 1),
+		pero sólo 1 y 2 tienen el turno.
+		"""
+		with self.s.transaccion() as conn:
+			conn.execute("INSERT INTO turno (id, nombre) VALUES (1, 'Mañana')")
+			conn.execute("INSERT INTO plan_estudio (id, nombre) VALUES (1, 'Plan')")
+			conn.execute("INSERT INTO ciclo (id, nombre) VALUES (1, 'Primero')")
+			conn.execute('INSERT INTO plan_ciclo (plan_id, ciclo_id) VALUES (1, 1)')
+			conn.execute('INSERT INTO turno_plan (turno_id, plan_id) VALUES (1, 1)')
+			for espacio in range(1, 5):
+				conn.execute('INSERT INTO turno_espacio_hora (turno_id, espacio, hora_inicio, hora_fin) VALUES (1, ?, ?, ?)',
+							 (espacio, f'0{7 + espacio}:00', f'0{7 + espacio}:40'))
+			for materia_id in (1, 2):
+				conn.execute('INSERT INTO materia (id, nombre, horas_semanales) VALUES (?, ?, 0)', (materia_id, f'Materia {materia_id}'))
+				conn.execute('INSERT INTO plan_materia (plan_id, materia_id) VALUES (1, ?)', (materia_id,))
+				conn.execute('INSERT INTO ciclo_materia (ciclo_id, materia_id) VALUES (1, ?)', (materia_id,))
+			for division_id in (1, 2):
+				conn.execute("INSERT INTO division (id, nombre, turno_id, plan_id, ciclo_id) VALUES (?, ?, 1, 1, 1)",
+							 (division_id, f'División {division_id}'))
+			for profesor_id in (1, 2, 3):
+				conn.execute('INSERT INTO profesor (id, nombre) VALUES (?, ?)', (profesor_id, f'Profesor {profesor_id}'))
+			for profesor_id in (1, 2):
+				conn.execute('INSERT INTO profesor_turno (profesor_id, turno_id) VALUES (?, 1)', (profesor_id,))
+			for profesor_id, materia_id in ((1, 1), (2, 1), (2, 2), (3, 1)):
+				conn.execute('INSERT INTO profesor_materia (profesor_id, materia_id, banca_horas) VALUES (?, ?, 0)',
+							 (profesor_id, materia_id))
+		self.s._indice_ocupacion.invalidar()
@@ -0,0 +1,14 @@
+from sistema_prueba import PruebaSistema
+
+
+class TestGeneradorParalelo(PruebaSistema):
+
+	def test_pool_inutilizable_resuelve_en_el_proceso(self):
+		# El módulo de prueba se importa con otro nombre: el pool no puede serializar el trabajo
+		self.cargar_escuela()
+		problema = self.s.cargar_problema_horario(1, {1: 3, 2: 2})
+		with self.assertLogs('SistemaEscolar', level='WARNING'):
+			resultado = self.s.resolver_horario_en_paralelo(problema, tiempo_limite=0.2, arranques=4,
+															  procesos=2, semilla=1)
+		self.assertEqual(resultado['arranques'], 1)
+		self.assertEqual(resultado['sin_ubicar'], 0)
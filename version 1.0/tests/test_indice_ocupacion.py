@@ -0,0 +1,42 @@
+from sistema_prueba import PruebaSistema
+
+
+class TestIndiceOcupacion(PruebaSistema):
+
+	def setUp(self):
+		super().setUp()
+		self.cargar_escuela()
+		self.indice = self.s._indice_ocupacion
+		self.reconstrucciones = 0
+		reconstruir = self.indice._reconstruir
+
+		def contar(*args):
+			self.reconstrucciones += 1
+			return reconstruir(*args)
+		self.indice._reconstruir = contar
+
+	def libres(self) -> list:
+		return sorted(p['id'] for p in self.s.sugerir_profesores(1, 'Lunes', 1, 1, 1))
+
+	def test_slots_solos_no_obligan_a_reconstruir(self):
+		self.indice.asegurar()
+		self.s.crear_horario(1, 'Lunes', 1, None, None, 1, 1, 1)
+		self.s.eliminar_horario(self.filas('SELECT id FROM horario')[0][0])
+		self.indice.asegurar()
+		self.assertEqual(self.reconstrucciones, 1)
+
+	def test_otras_escrituras_en_la_transaccion_invalidan_el_indice(self):
+		self.assertEqual(self.libres(), [1, 2])
+		with self.s.transaccion() as conn:
+			self.s._upsert_horario(conn, 2, 'Martes', 1, None, None, 1, 1, 1)
+			# El profesor 3 (materia 1) pasa al turno en la misma transacción
+			conn.execute('INSERT INTO profesor_turno (profesor_id, turno_id) VALUES (3, 1)')
+		self.assertEqual(self.libres(), [1, 2, 3])
+
+	def test_cada_conexion_conserva_su_version(self):
+		escritura = self.s.get_connection()
+		lectura = self.s.get_connection_lectura()
+		for _ in range(3):
+			self.indice.asegurar(escritura)
+			self.indice.asegurar(lectura)
+		self.assertEqual(self.reconstrucciones, 2)
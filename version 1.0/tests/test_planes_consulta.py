@@ -0,0 +1,52 @@
+import unittest
+
+from sistema_prueba import PruebaSistema
+
+
+class TestPlanesConsulta(PruebaSistema):
+	def test_consultas_criticas_usan_indices(self):
+		conn = self.s.get_connection()
+		self.assertEqual(self.s.verificar_planes_consulta(conn), [])
+
+	def ejecutadas(self, accion) -> set:
+		"""SQL de las sentencias que ejecuta `accion()` por las conexiones del sistema."""
+		sentencias = set()
+		clases = (self.s.ConexionSQLite, self.s.CursorSQLite)
+		originales = [(clase, clase.execute, clase.executemany) for clase in clases]
+
+		def espiar(metodo):
+			def envoltura(objeto, sql, *args, **kwargs):
+				sentencias.add(sql)
+				return metodo(objeto, sql, *args, **kwargs)
+			return envoltura
+		for clase, execute, executemany in originales:
+			clase.execute = espiar(execute)
+			clase.executemany = espiar(executemany)
+		try:
+			accion()
+		finally:
+			for clase, execute, executemany in originales:
+				clase.execute = execute
+				clase.executemany = executemany
+		return sentencias
+
+	def test_las_consultas_verificadas_son_las_que_se_ejecutan(self):
+		self.cargar_escuela()
+		self.s.crear_horario(1, 'Lunes', 1, '07:30', '08:10', 1, 1, 1)
+		self.s.crear_horario(1, 'Lunes', 2, '08:10', '08:50', None, None, 1)
+
+		def caminos():
+			self.s.obtener_horarios(1)
+			self.s.obtener_horarios_profesor(1, 1)
+			self.s.sugerir_profesores(1, 'Lunes', 1, 1, 1)
+			self.s.cargar_problema_horario(1, {1: 1})
+			self.s.obtener_horarios_a_reparar(1, [1])
+			self.assertEqual(self.s.limpiar_horarios_vacios_division(1), 1)
+			self.s.limpiar_horarios_vacios_profesor(1, 1)
+			self.s.eliminar_ciclo(1, cascade=True)
+		ejecutadas = self.ejecutadas(caminos)
+		for descripcion, sql, _ in self.s.CONSULTAS_CRITICAS:
+			self.assertIn(sql, ejecutadas, descripcion)
+
+if __name__ == '__main__':
+	unittest.main()
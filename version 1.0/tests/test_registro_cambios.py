@@ -0,0 +1,52 @@
+import os
+
+from sistema_prueba import PruebaSistema
+
+TABLAS = ('horario', 'materia', 'profesor_materia', 'turno_espacio_hora', 'division', 'profesor_turno')
+
+
+class TestReconstruccion(PruebaSistema):
+
+	def volcado(self, ruta=None):
+		import sqlite3
+		conn = sqlite3.connect(ruta) if ruta else self.s.get_connection_lectura()
+		try:
+			return {tabla: conn.execute(f'SELECT * FROM {tabla} ORDER BY id').fetchall() for tabla in TABLAS}
+		finally:
+			if ruta:
+				conn.close()
+
+	def test_reconstruccion_igual_a_la_base(self):
+		self.cargar_escuela()
+		self.s.crear_backup_db(manual=True)
+		self.s.crear_horario(1, 'Lunes', 1, '08:00', '08:40', 1, 1, 1)
+		horas = {1: ('07:30', '08:10'), 2: ('08:10', '08:50')}
+		# Las operaciones masivas empiezan con una CTE (WITH ...)
+		self.assertGreater(self.s.aplicar_horas_turno_a_divisiones(1, horas), 0)
+		self.assertGreater(self.s.aplicar_horas_turno_a_profesores(1, horas), 0)
+		self.s.crear_horario(2, 'Martes', 3, None, None, 2, 2, 1)
+		self.s.eliminar_horario(self.filas('SELECT id FROM horario WHERE division_id=2 AND dia=? AND espacio=1', ('Lunes',))[0][0])
+
+		destino = os.path.join(self.directorio, 'reconstruida.db')
+		resultado = self.s.reconstruir_base(destino)
+		self.assertIsNone(resultado['aviso'])
+		self.assertEqual(self.volcado(destino), self.volcado())
+
+	def test_numero_repetido_reemplaza_a_la_transaccion_sin_confirmar(self):
+		self.cargar_escuela()
+		self.s.crear_backup_db(manual=True)
+		self.s.crear_horario(1, 'Lunes', 1, '08:00', '08:40', 1, 1, 1)
+		# Línea anotada antes de un COMMIT que no llegó: el contador no avanzó
+		siguiente = self.filas('SELECT ultimo FROM registro_cambios WHERE id = 1')[0][0] + 1
+		self.s._registro_cambios._agregar({'n': siguiente, 't': '2000-01-01 00:00:00',
+										   'v': self.filas('PRAGMA user_version')[0][0],
+										   's': [['DELETE FROM horario', []]]})
+		self.s.crear_horario(2, 'Martes', 3, None, None, 2, 2, 1)
+		registros = self.s._registro_cambios.leer()
+		self.assertEqual([r['n'] for r in registros][-1], siguiente)
+		self.assertNotIn([['DELETE FROM horario', []]], [r['s'] for r in registros])
+
+		destino = os.path.join(self.directorio, 'reconstruida.db')
+		resultado = self.s.reconstruir_base(destino)
+		self.assertIsNone(resultado['aviso'])
+		self.assertEqual(self.volcado(destino), self.volcado())
@@ -0,0 +1,46 @@
+import copy
+
+from sistema_prueba import PruebaSistema
+
+
+class TestReparacionHorario(PruebaSistema):
+
+	def setUp(self):
+		super().setUp()
+		self.cargar_escuela()
+		self.s.crear_horario(1, 'Lunes', 1, None, None, 1, 1, 1)
+		self.s.crear_horario(1, 'Lunes', 2, None, None, 2, 2, 1)
+		self.s.crear_horario(2, 'Lunes', 1, None, None, 1, 2, 1)
+		self.s.crear_horario(2, 'Martes', 3, None, None, 2, 2, 1)
+
+	def asignaciones(self) -> dict:
+		return {(d, dia, e): (m, p) for d, dia, e, m, p in self.filas(
+			'SELECT division_id, dia, espacio, materia_id, profesor_id FROM horario WHERE division_id IS NOT NULL')
+			if m is not None or p is not None}
+
+	def test_solo_cambian_las_clases_del_profesor_saliente(self):
+		antes = self.asignaciones()
+		reparacion = self.s.proponer_reparacion_horario(1, [1], tiempo_limite=0.2, semilla=1)
+		self.assertEqual(reparacion['liberadas'], 1)
+		self.assertEqual(reparacion['reasignadas'], 1)
+		# El profesor 2 ya dicta el lunes 1ª en la división 2: la clase tiene que moverse
+		self.assertEqual(reparacion['movidas'], 1)
+		self.s.aplicar_reparacion_horario(reparacion)
+
+		despues = self.asignaciones()
+		tocados = {(c['division_id'], c['dia'], c['espacio']) for c in reparacion['cambios']}
+		for slot, valor in antes.items():
+			if slot not in tocados:
+				self.assertEqual(despues.get(slot), valor)
+		self.assertNotIn(1, {p for _, p in despues.values()})
+		self.assertEqual(sorted(m for (d, _, _), (m, _) in despues.items() if d == 1), [1, 2])
+		self.assertEqual(self.filas('SELECT banca_horas FROM profesor_materia WHERE profesor_id=1 AND materia_id=1'), [(0,)])
+
+	def test_varias_reparaciones_se_aplican_todas_o_ninguna(self):
+		antes = self.asignaciones()
+		reparacion = self.s.proponer_reparacion_horario(1, [1], tiempo_limite=0.2, semilla=1)
+		vencida = copy.deepcopy(reparacion)
+		vencida['cambios'][0]['antes'] = (2, 2)
+		with self.assertRaises(Exception):
+			self.s.aplicar_reparaciones_horario([reparacion, vencida])
+		self.assertEqual(self.asignaciones(), antes)
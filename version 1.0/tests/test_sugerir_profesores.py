@@ -0,0 +1,34 @@
+import unittest
+
+from sistema_prueba import PruebaSistema
+
+
+class TestSugerirProfesores(PruebaSistema):
+	def setUp(self):
+		super().setUp()
+		self.cargar_escuela()
+
+	def ids(self, *args, **kwargs) -> list:
+		return [p['id'] for p in self.s.sugerir_profesores(*args, **kwargs)]
+
+	def test_excluye_profesores_sin_la_materia_o_sin_el_turno(self):
+		# Profesor 1 no tiene la materia 2; profesor 3 tiene la materia 1 pero no el turno
+		self.assertEqual(self.ids(1, 'Lunes', 1, 2, 1), [2])
+		self.assertEqual(sorted(self.ids(1, 'Lunes', 1, 1, 1)), [1, 2])
+
+	def test_excluye_profesores_ocupados_en_el_slot(self):
+		self.s.crear_horario(2, 'Lunes', 1, '08:00', '08:40', 1, 2, 1)
+		self.assertEqual(self.ids(1, 'Lunes', 1, 1, 1), [1])
+		self.assertEqual(self.ids(1, 'Lunes', 1, 2, 1), [])
+		# En otro espacio vuelve a estar libre
+		self.assertIn(2, self.ids(1, 'Lunes', 2, 2, 1))
+
+	def test_el_ocupante_del_slot_de_la_division_cuenta_como_libre(self):
+		self.s.crear_horario(1, 'Lunes', 1, '08:00', '08:40', 1, 2, 1)
+		# El profesor 2 ya dicta la materia en la división: va primero
+		self.assertEqual(self.ids(1, 'Lunes', 1, 1, 1), [2, 1])
+		self.assertEqual(self.ids(1, 'Lunes', 1, 1, 2), [1])
+
+
+if __name__ == '__main__':
+	unittest.main()
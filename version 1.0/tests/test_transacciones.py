@@ -0,0 +1,33 @@
+import os
+import sqlite3
+
+from sistema_prueba import PruebaSistema
+
+
+class TestTransacciones(PruebaSistema):
+
+	def test_commit_fallido_no_deja_la_conexion_dentro_de_la_transaccion(self):
+		ruta = os.path.join(self.directorio, 'commit.db')
+		gestor = self.s.GestorConexiones(ruta, timeout=0.05, perfil='compatible')
+		with gestor.transaccion() as conn:
+			conn.execute('CREATE TABLE t (x INTEGER)')
+		avisos = []
+		# Un lector con la transacción abierta impide tomar el bloqueo exclusivo del COMMIT
+		lector = sqlite3.connect(ruta, isolation_level=None)
+		lector.execute('BEGIN')
+		lector.execute('SELECT COUNT(*) FROM t').fetchone()
+		try:
+			with self.assertRaises(sqlite3.OperationalError):
+				with gestor.transaccion() as conn:
+					gestor.al_finalizar(lambda confirmada, previa, nueva: avisos.append(confirmada))
+					conn.execute('INSERT INTO t VALUES (1)')
+		finally:
+			lector.rollback()
+			lector.close()
+		self.assertEqual(avisos, [False])
+		self.assertFalse(gestor.conexion().in_transaction)
+		# La conexión del hilo sigue sirviendo para la próxima transacción
+		with gestor.transaccion() as conn:
+			conn.execute('INSERT INTO t VALUES (2)')
+		self.assertEqual(gestor.conexion().execute('SELECT x FROM t').fetchall(), [(2,)])
+		gestor.cerrar_todas()